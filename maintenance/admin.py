@@ -1,7 +1,10 @@
 from django.contrib import admin
+from django.utils import timezone
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from .models import (User, Direction, Bureau, CategorieEquipement, Equipement,
-                     DemandeMaintenance, Intervention, PieceRechange, FichierIntervention, LogAction)
+                     DemandeMaintenance, Intervention, PieceRechange, FichierIntervention, LogAction,
+                     ImportJob, ImportJobErreur, ExportJob, ArchiveJournal, EmailSortant, Notification)
+from .journal import vider_journal
 
 
 @admin.register(User)
@@ -28,16 +31,41 @@ class LogActionAdmin(admin.ModelAdmin):
     """Administration des logs d'actions"""
     list_display = ['date_action', 'utilisateur', 'action', 'type_objet', 'objet_id', 'adresse_ip']
     list_filter = ['action', 'date_action', 'utilisateur']
+    list_select_related = ['utilisateur']
     search_fields = ['utilisateur__username', 'details', 'adresse_ip']
     readonly_fields = ['utilisateur', 'action', 'type_objet', 'objet_id', 'details', 'date_action', 'adresse_ip']
     date_hierarchy = 'date_action'
+    show_full_result_count = False  # Pas de COUNT(*) sur toute la table à chaque filtre
     
     def has_add_permission(self, request):
         return False  # Pas de création manuelle de logs
     
     def has_delete_permission(self, request, obj=None):
         return request.user.is_superuser  # Seul superuser peut supprimer
+
+    def get_queryset(self, request):
+        """Écrit d'abord les actions encore en file dans ce processus (comme la page des logs)
+
+        La liste n'est pas vidée pour les autres processus : leurs actions peuvent y manquer
+        jusqu'à JOURNAL_DELAI_MS, le temps que leur thread les écrive. Leurs fichiers de
+        reprise ne sont pas relus ici, leurs threads les écriraient une seconde fois
+        (rejouer_reprises est réservé au démarrage, serveurs arrêtés).
+        """
+        vider_journal()
+        return super().get_queryset(request)
     
+@admin.register(ArchiveJournal)
+class ArchiveJournalAdmin(admin.ModelAdmin):
+    """Mois du journal archivés (manage.py archiver_journal)"""
+    list_display = ['mois', 'nb_entrees', 'taille', 'fichier', 'date_archivage']
+    readonly_fields = ['mois', 'fichier', 'nb_entrees', 'taille', 'date_archivage']
+
+    def has_add_permission(self, request):
+        return False  # Créées uniquement par l'archivage
+
+    def has_delete_permission(self, request, obj=None):
+        return request.user.is_superuser
+
 @admin.register(Direction)
 class DirectionAdmin(admin.ModelAdmin):
     """Administration des directions"""
@@ -103,7 +131,7 @@ class FichierInterventionInline(admin.TabularInline):
 @admin.register(Intervention)
 class InterventionAdmin(admin.ModelAdmin):
     """Administration des interventions"""
-    list_display = ['id', 'demande', 'type_reparation', 'date_intervention', 'cout_total_pieces', 'nb_fichiers']
+    list_display = ['id', 'demande', 'type_reparation', 'date_intervention', 'cout_total', 'nb_fichiers']
     list_filter = ['type_reparation', 'date_intervention']
     search_fields = ['demande__id', 'details']
     date_hierarchy = 'date_intervention'
@@ -118,18 +146,18 @@ class InterventionAdmin(admin.ModelAdmin):
         }),
     )
     
-    def nb_fichiers(self, obj):
-        return obj.fichiers.count()
-    nb_fichiers.short_description = 'Fichiers'
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('demande__equipement')
 
 
 @admin.register(FichierIntervention)
 class FichierInterventionAdmin(admin.ModelAdmin):
     """Administration des fichiers d'intervention"""
-    list_display = ['id', 'intervention', 'type_fichier', 'fichier', 'taille_lisible', 'ajoute_par', 'date_ajout']
-    list_filter = ['type_fichier', 'date_ajout']
+    list_display = ['id', 'intervention', 'type_fichier', 'fichier', 'taille_lisible', 'derives_statut', 'ajoute_par',
+                    'date_ajout']
+    list_filter = ['type_fichier', 'derives_statut', 'date_ajout']
     search_fields = ['intervention__demande__id', 'description']
-    readonly_fields = ['taille', 'date_ajout', 'ajoute_par']
+    readonly_fields = ['taille', 'date_ajout', 'ajoute_par', 'derives_statut', 'miniature', 'apercu']
     date_hierarchy = 'date_ajout'
     
     fieldsets = (
@@ -139,6 +167,9 @@ class FichierInterventionAdmin(admin.ModelAdmin):
         ('Détails', {
             'fields': ('description', 'taille', 'ajoute_par', 'date_ajout')
         }),
+        ('Miniatures', {
+            'fields': ('derives_statut', 'miniature', 'apercu')
+        }),
     )
 
 
@@ -184,6 +215,69 @@ class PieceRechangeAdmin(admin.ModelAdmin):
         return qs.select_related('intervention', 'intervention__demande')
 
 
+class ImportJobErreurInline(admin.TabularInline):
+    """Inline pour les lignes rejetées d'un import"""
+    model = ImportJobErreur
+    extra = 0
+    fields = ['ligne', 'niveau', 'message']
+    readonly_fields = ['ligne', 'niveau', 'message']
+    can_delete = False
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(ImportJob)
+class ImportJobAdmin(admin.ModelAdmin):
+    """Administration des imports CSV"""
+    list_display = ['id', 'nom_fichier', 'simulation', 'statut', 'cree_par', 'date_creation', 'lignes_traitees',
+                    'lignes_total', 'nb_crees', 'nb_mis_a_jour', 'nb_inchanges', 'nb_erreurs']
+    list_filter = ['statut', 'simulation', 'date_creation']
+    search_fields = ['nom_fichier', 'cree_par__username']
+    readonly_fields = ['date_creation', 'date_debut', 'date_fin', 'date_maj', 'lignes_total', 'lignes_traitees',
+                       'nb_crees', 'nb_mis_a_jour', 'nb_inchanges', 'nb_erreurs', 'nb_avertissements', 'message']
+    date_hierarchy = 'date_creation'
+    inlines = [ImportJobErreurInline]
+
+
+@admin.register(ExportJob)
+class ExportJobAdmin(admin.ModelAdmin):
+    """Administration des exports en arrière-plan"""
+    list_display = ['id', 'type_export', 'statut', 'demande_par', 'date_creation', 'date_fin']
+    list_filter = ['type_export', 'statut', 'date_creation']
+    search_fields = ['demande_par__username']
+    readonly_fields = ['date_creation', 'date_debut', 'date_fin', 'message']
+    date_hierarchy = 'date_creation'
+
+
+@admin.register(EmailSortant)
+class EmailSortantAdmin(admin.ModelAdmin):
+    """Administration de la file d'envoi des emails"""
+    list_display = ['id', 'sujet', 'statut', 'tentatives', 'prochain_essai', 'date_creation', 'date_envoi']
+    list_filter = ['statut', 'date_creation']
+    search_fields = ['sujet']
+    readonly_fields = ['demande', 'tentatives', 'jeton', 'date_reservation', 'derniere_erreur', 'date_creation',
+                       'date_envoi']
+    date_hierarchy = 'date_creation'
+    actions = ['remettre_en_file']
+
+    @admin.action(description="Remettre en file les emails en échec")
+    def remettre_en_file(self, request, queryset):
+        nb = queryset.filter(statut='ECHEC').update(statut='EN_ATTENTE', tentatives=0, prochain_essai=timezone.now())
+        self.message_user(request, f"{nb} email(s) remis en file.")
+
+
+@admin.register(Notification)
+class NotificationAdmin(admin.ModelAdmin):
+    """Administration des notifications (en attente tant qu'aucun email ne les a signalées)"""
+    list_display = ['id', 'evenement', 'demande', 'destinataire', 'date_creation', 'email']
+    list_filter = ['evenement', 'date_creation']
+    list_select_related = ['destinataire', 'email']
+    search_fields = ['destinataire__username']
+    raw_id_fields = ['demande', 'destinataire', 'email']
+    date_hierarchy = 'date_creation'
+
+
 # Configuration du site admin
 admin.site.site_header = "EP Mostaganem - Gestion Maintenance"
 admin.site.site_title = "Gestion Maintenance"
@@ -1,7 +1,10 @@
 from django import forms
 from django.contrib.auth.forms import UserCreationForm
+from django.db.models import OuterRef, Subquery
+from django.urls import reverse_lazy
 from .models import (User, Direction, Bureau, CategorieEquipement, Equipement,
-                     DemandeMaintenance, Intervention, PieceRechange, FichierIntervention, LogAction)
+                     DemandeMaintenance, Intervention, PieceRechange, FichierIntervention, LogAction,
+                     ArchiveJournal)
 from django.forms import inlineformset_factory
 
 
@@ -61,7 +64,10 @@ class DemandeMaintenanceForm(forms.ModelForm):
         widget=forms.TextInput(attrs={
             'class': 'form-control form-control-lg',
             'placeholder': 'Saisissez le code-barres par exemple: PC-001',
-            'autofocus': True
+            'autofocus': True,
+            'autocomplete': 'off',
+            'list': 'codes-equipement',
+            'data-autocompletion': reverse_lazy('autocompletion_equipements'),
         }),
         label='Code-barres de l\'équipement'
     )
@@ -85,42 +91,47 @@ class DemandeMaintenanceForm(forms.ModelForm):
         
     def clean_code_equipement(self):
         code = self.cleaned_data.get('code_equipement')
-        
+
+        # Équipement, bureau, direction et demande active éventuelle en une seule requête
+        demandes_actives = DemandeMaintenance.objects.filter(
+            equipement=OuterRef('pk'),
+            statut__in=DemandeMaintenance.STATUTS_ACTIFS
+        ).order_by('-date_creation')
+        if self.instance.pk:
+            demandes_actives = demandes_actives.exclude(pk=self.instance.pk)
+        equipement = Equipement.objects.select_related('bureau__direction').annotate(
+            demande_active_id=Subquery(demandes_actives.values('pk')[:1]),
+            demande_active_statut=Subquery(demandes_actives.values('statut')[:1]),
+        ).filter(code_equipement=code).first()
+
         # Vérifier si l'équipement existe
-        try:
-            equipement = Equipement.objects.get(code_equipement=code)
-        except Equipement.DoesNotExist:
+        if equipement is None:
             raise forms.ValidationError(
                 f"Aucun équipement trouvé avec le code '{code}'. Veuillez vérifier le code-barres."
             )
         
         # Vérifier si l'employé est dans la même direction que l'équipement
-        if self.user and self.user.direction:
-            if equipement.bureau and equipement.bureau.direction != self.user.direction:
+        if self.user and self.user.direction_id:
+            if equipement.bureau and equipement.bureau.direction_id != self.user.direction_id:
                 raise forms.ValidationError(
                     f"Équipement hors de votre direction. Cet équipement appartient à la direction '{equipement.bureau.direction.nom}'."
                 )
         
         # Vérifier si l'équipement est déjà en maintenance
-        demandes_en_cours = DemandeMaintenance.objects.filter(
-            equipement=equipement,
-            statut__in=['EN_ATTENTE', 'ASSIGNEE', 'EN_COURS', 'TERMINEE']
-        ).exclude(pk=self.instance.pk if self.instance else None)
-
-        if demandes_en_cours.exists():
-            demande_active = demandes_en_cours.first()
+        if equipement.demande_active_id:
+            statut = dict(DemandeMaintenance.STATUT_CHOICES)[equipement.demande_active_statut]
             raise forms.ValidationError(
-                f"Cet équipement est déjà en maintenance (Demande #{demande_active.pk} - {demande_active.get_statut_display()}). "
+                f"Cet équipement est déjà en maintenance (Demande #{equipement.demande_active_id} - {statut}). "
                 f"Veuillez attendre la fin de la réparation en cours."
             )
 
-        
+        # Réutilisé par save() sans nouvelle requête
+        self.equipement = equipement
         return code
     
     def save(self, commit=True):
         instance = super().save(commit=False)
-        code = self.cleaned_data.get('code_equipement')
-        instance.equipement = Equipement.objects.get(code_equipement=code)
+        instance.equipement = self.equipement
         if commit:
             instance.save()
         return instance
@@ -373,6 +384,12 @@ class FiltreLogForm(forms.Form):
         required=False,
         widget=forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'Rechercher dans les détails...'})
     )
+    archive = forms.ModelChoiceField(
+        queryset=ArchiveJournal.objects.all(),
+        required=False,
+        empty_label='Journal courant',
+        widget=forms.Select(attrs={'class': 'form-select'})
+    )
 
 class FiltreInterventionForm(forms.Form):
     """Formulaire de filtrage des interventions"""
@@ -398,4 +415,23 @@ class FiltreInterventionForm(forms.Form):
     date_fin = forms.DateField(
         required=False,
         widget=forms.DateInput(attrs={'class': 'form-control', 'type': 'date'})
+    )
+    cout_min = forms.DecimalField(
+        required=False,
+        min_value=0,
+        widget=forms.NumberInput(attrs={'class': 'form-control', 'placeholder': 'Min (DA)', 'step': '0.01'})
+    )
+    cout_max = forms.DecimalField(
+        required=False,
+        min_value=0,
+        widget=forms.NumberInput(attrs={'class': 'form-control', 'placeholder': 'Max (DA)', 'step': '0.01'})
+    )
+    tri = forms.ChoiceField(
+        choices=[
+            ('', 'Plus récentes d\'abord'),
+            ('-cout_total', 'Coût décroissant'),
+            ('cout_total', 'Coût croissant'),
+        ],
+        required=False,
+        widget=forms.Select(attrs={'class': 'form-select'})
     )
\ No newline at end of file
@@ -0,0 +1,119 @@
+import os
+from datetime import timedelta
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db.models import Q
+from django.utils import timezone
+from PIL import Image, ImageOps, features
+
+from .models import FichierIntervention
+
+
+# ============= MINIATURES DES IMAGES =============
+# Les photos des techniciens (4-5 Mo) ne sont plus affichées telles quelles : une miniature
+# (listes) et un aperçu moyen (ouvert au clic) sont générés hors requête par
+# `manage.py traiter_images`, orientés selon l'EXIF puis enregistrés sans métadonnées.
+# L'original reste téléchargeable.
+
+# Plus grand côté, en pixels
+MINIATURE_TAILLE = getattr(settings, 'MINIATURE_TAILLE', 320)
+APERCU_TAILLE = getattr(settings, 'APERCU_TAILLE', 1280)
+# WEBP (plus léger), ou JPEG ; JPEG si Pillow n'a pas été compilé avec WebP
+DERIVES_FORMAT = getattr(settings, 'DERIVES_FORMAT', 'WEBP')
+DERIVES_QUALITE = getattr(settings, 'DERIVES_QUALITE', 80)
+
+# Image réservée par un worker arrêté avant de la traiter : reprise après ce délai
+DELAI_ABANDON = timedelta(minutes=10)
+
+
+def format_derives():
+    return 'WEBP' if DERIVES_FORMAT == 'WEBP' and features.check('webp') else 'JPEG'
+
+
+def image_orientee(source):
+    """Image décodée, tournée selon son orientation EXIF, en RGB (ou RGBA pour le WebP)"""
+    image = Image.open(source)
+    # JPEG : décodage directement à l'échelle 1/2, 1/4 ou 1/8 la plus proche de l'aperçu
+    image.draft('RGB', (APERCU_TAILLE, APERCU_TAILLE))
+    image = ImageOps.exif_transpose(image)
+    transparente = image.has_transparency_data and format_derives() == 'WEBP'
+    return image.convert('RGBA' if transparente else 'RGB')
+
+
+def version_reduite(image, taille):
+    """Contenu encodé de l'image réduite à taille pixels (plus grand côté) ; sans EXIF ni ICC"""
+    copie = image.copy()
+    copie.thumbnail((taille, taille), Image.LANCZOS, reducing_gap=3.0)
+    sortie = BytesIO()
+    copie.save(sortie, format_derives(), quality=DERIVES_QUALITE)
+    return sortie.getvalue()
+
+
+def generer_derives(fichier):
+    """Génère et enregistre la miniature et l'aperçu d'un FichierIntervention image"""
+    with fichier.fichier.open('rb') as source:
+        image = image_orientee(source)
+    base = os.path.splitext(os.path.basename(fichier.fichier.name))[0]
+    extension = '.webp' if format_derives() == 'WEBP' else '.jpg'
+    for champ, taille, suffixe in ((fichier.miniature, MINIATURE_TAILLE, 'miniature'),
+                                   (fichier.apercu, APERCU_TAILLE, 'apercu')):
+        if champ:
+            champ.delete(save=False)
+        champ.save(f"{base}_{suffixe}{extension}", ContentFile(version_reduite(image, taille)), save=False)
+
+
+def prochaine_image():
+    """Réserve la prochaine image à traiter (en attente, ou abandonnée par un worker arrêté)"""
+    limite = timezone.now() - DELAI_ABANDON
+    candidats = FichierIntervention.objects.filter(
+        Q(derives_statut='EN_ATTENTE') | Q(derives_statut='EN_COURS', derives_date__lt=limite)
+    ).order_by('pk')
+
+    for fichier in candidats[:10]:
+        # Réservation atomique : un seul worker gagne
+        reserve = FichierIntervention.objects.filter(
+            pk=fichier.pk, derives_statut=fichier.derives_statut, derives_date=fichier.derives_date
+        ).update(derives_statut='EN_COURS', derives_date=timezone.now())
+        if reserve:
+            fichier.refresh_from_db()
+            return fichier
+    return None
+
+
+def traiter_image(fichier):
+    """Génère les versions réduites d'une image réservée ; retourne True si elles ont été générées"""
+    try:
+        generer_derives(fichier)
+    except Exception:
+        # Fichier absent, illisible ou pas une image : l'original reste affiché
+        fichier.derives_statut = 'ECHEC'
+    else:
+        fichier.derives_statut = 'TERMINE'
+    # update() : ne réécrit pas la ligne (ni la taille, ni les totaux de l'intervention par signal)
+    FichierIntervention.objects.filter(pk=fichier.pk).update(
+        miniature=fichier.miniature.name, apercu=fichier.apercu.name,
+        derives_statut=fichier.derives_statut, derives_date=timezone.now(),
+    )
+    return fichier.derives_statut == 'TERMINE'
+
+
+def traiter_images():
+    """Traite toutes les images en attente ; retourne (générées, échecs)"""
+    generees = echecs = 0
+    while (fichier := prochaine_image()) is not None:
+        if traiter_image(fichier):
+            generees += 1
+        else:
+            echecs += 1
+    return generees, echecs
+
+
+def mettre_en_attente_images(toutes=False):
+    """Rattrapage : met en attente les images sans miniatures (toutes avec toutes=True)"""
+    regex = r'\.(' + '|'.join(FichierIntervention.EXTENSIONS_IMAGES) + r')$'
+    images = FichierIntervention.objects.filter(fichier__iregex=regex)
+    if not toutes:
+        images = images.filter(derives_statut__in=['AUCUN', 'ECHEC'])
+    return images.exclude(derives_statut='EN_COURS').update(derives_statut='EN_ATTENTE', derives_date=None)
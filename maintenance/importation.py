@@ -0,0 +1,475 @@
+import codecs
+import csv
+from datetime import timedelta
+from itertools import islice
+
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import (Direction, Bureau, CategorieEquipement, Equipement,
+                     ImportJob, ImportJobErreur, empreinte_equipement, squelette_code)
+from .statistiques import reconstruire_statistiques
+from .recherche import indexer
+from .journal import ecrire_entrees, nouvelle_entree
+
+
+# Champs mis à jour lors de l'import d'un équipement existant
+CHAMPS_EQUIPEMENT = ['nom', 'marque', 'date_acquisition', 'description_technique', 'bureau', 'categorie', 'empreinte']
+
+# Colonnes sans lesquelles une ligne est rejetée
+CHAMPS_OBLIGATOIRES = ['code_equipement', 'nom', 'marque', 'date_acquisition']
+
+TAILLE_LOT = 1000
+
+# Taille du premier bloc lu pour détecter l'encodage et le séparateur
+TAILLE_ECHANTILLON = 64 * 1024
+SEPARATEURS = [',', ';', '\t']
+
+# Un import EN_COURS sans point de reprise depuis ce délai est considéré comme abandonné
+DELAI_ABANDON = timedelta(minutes=5)
+
+
+# ============= LECTURE DU FICHIER =============
+
+def detecter_format(fichier):
+    """Détecte l'encodage et le séparateur à partir du premier bloc du fichier
+
+    Les exports des anciens postes Excel arrivent en cp1252 avec des
+    points-virgules ; tout ce qui n'est pas de l'UTF-8 valide est lu en cp1252.
+    """
+    fichier.seek(0)
+    echantillon = fichier.read(TAILLE_ECHANTILLON)
+    fichier.seek(0)
+
+    if echantillon.startswith(codecs.BOM_UTF8):
+        encodage = 'utf-8-sig'
+    else:
+        try:
+            # final=False : un caractère coupé en fin de bloc n'est pas une erreur
+            codecs.getincrementaldecoder('utf-8')().decode(echantillon)
+            encodage = 'utf-8'
+        except UnicodeDecodeError:
+            encodage = 'cp1252'
+
+    texte = codecs.getincrementaldecoder(encodage)(errors='replace').decode(echantillon)
+    entete = texte.split('\n', 1)[0]
+    separateur = max(SEPARATEURS, key=entete.count)
+    return encodage, separateur
+
+
+def lire_lignes(fichier, encodage):
+    """Décode le fichier bloc par bloc et produit ses lignes une à une"""
+    decodeur = codecs.getincrementaldecoder(encodage)()
+    reste = ''
+    for bloc in fichier.chunks():
+        morceaux = (reste + decodeur.decode(bloc)).split('\n')
+        reste = morceaux.pop()
+        for morceau in morceaux:
+            yield morceau + '\n'
+    reste += decodeur.decode(b'', final=True)
+    if reste:
+        yield reste
+
+
+def lire_csv(fichier):
+    """Produit les lignes (numero_ligne, row) d'un fichier CSV uploadé, sans le charger en mémoire"""
+    encodage, separateur = detecter_format(fichier)
+    reader = csv.DictReader(lire_lignes(fichier, encodage), delimiter=separateur)
+    for row in reader:
+        yield reader.line_num, row
+
+
+def par_lots(lignes, taille):
+    """Regroupe un itérable en listes de taille fixe"""
+    lot = []
+    for ligne in lignes:
+        lot.append(ligne)
+        if len(lot) >= taille:
+            yield lot
+            lot = []
+    if lot:
+        yield lot
+
+
+# ============= MOTEUR D'IMPORT =============
+
+
+class ImportateurEquipements:
+    """Moteur d'import d'équipements par lots (requêtes ensemblistes)
+
+    Les directions, bureaux et catégories déjà rencontrés sont gardés en
+    mémoire ; les manquants sont créés en masse, puis les équipements du lot
+    sont insérés ou mis à jour avec bulk_create / bulk_update. Une ligne dont
+    l'empreinte est identique à celle de l'équipement en base n'est pas réécrite.
+    """
+
+    def __init__(self, taille_lot=TAILLE_LOT):
+        self.taille_lot = taille_lot
+        self.directions = {}    # nom -> Direction
+        self.bureaux = {}       # (nom, direction_id) -> Bureau
+        self.categories = {}    # nom -> CategorieEquipement
+        self.count_created = 0
+        self.count_updated = 0
+        self.count_unchanged = 0
+        self.errors = []        # [(numero_ligne, message), ...]
+        self.warnings = []      # [(numero_ligne, message), ...]
+
+    # ---------- Référentiels ----------
+
+    def _charger_directions(self, noms):
+        manquants = set(noms) - set(self.directions)
+        if not manquants:
+            return
+        existantes = {d.nom: d for d in Direction.objects.filter(nom__in=manquants)}
+        a_creer = manquants - set(existantes)
+        if a_creer:
+            Direction.objects.bulk_create([Direction(nom=nom) for nom in a_creer], ignore_conflicts=True)
+            existantes.update({d.nom: d for d in Direction.objects.filter(nom__in=a_creer)})
+        self.directions.update(existantes)
+
+    def _charger_bureaux(self, couples):
+        """couples : ensemble de (nom_bureau, direction_id)"""
+        manquants = set(couples) - set(self.bureaux)
+        if not manquants:
+            return
+
+        def rechercher(cles):
+            bureaux = Bureau.objects.filter(
+                nom__in={nom for nom, _ in cles},
+                direction_id__in={direction_id for _, direction_id in cles},
+            )
+            return {(b.nom, b.direction_id): b for b in bureaux if (b.nom, b.direction_id) in cles}
+
+        existants = rechercher(manquants)
+        a_creer = manquants - set(existants)
+        if a_creer:
+            Bureau.objects.bulk_create(
+                [Bureau(nom=nom, direction_id=direction_id) for nom, direction_id in a_creer],
+                ignore_conflicts=True,
+            )
+            existants.update(rechercher(a_creer))
+        self.bureaux.update(existants)
+
+    def _charger_categories(self, noms):
+        manquants = set(noms) - set(self.categories)
+        if not manquants:
+            return
+        existantes = {c.nom: c for c in CategorieEquipement.objects.filter(nom__in=manquants)}
+        a_creer = manquants - set(existantes)
+        if a_creer:
+            CategorieEquipement.objects.bulk_create(
+                [CategorieEquipement(nom=nom) for nom in a_creer], ignore_conflicts=True
+            )
+            existantes.update({c.nom: c for c in CategorieEquipement.objects.filter(nom__in=a_creer)})
+        self.categories.update(existantes)
+
+    # ---------- Lignes ----------
+
+    def _preparer_ligne(self, row):
+        """Valide une ligne CSV et retourne les valeurs à enregistrer.
+
+        Lève les mêmes exceptions que l'ancien update_or_create ligne par ligne
+        (KeyError pour une colonne manquante, ValidationError pour une date invalide).
+        """
+        for champ in CHAMPS_OBLIGATOIRES:
+            if row[champ] is None:
+                # Ligne plus courte que l'en-tête
+                raise ValueError(f"Champ obligatoire manquant : {champ}")
+        date_field = Equipement._meta.get_field('date_acquisition')
+        return {
+            'code_equipement': row['code_equipement'],
+            'nom': row['nom'],
+            'marque': row['marque'],
+            'date_acquisition': date_field.to_python(row['date_acquisition']),
+            'description_technique': row.get('description_technique', ''),
+            'bureau': (row['bureau'], row['direction']) if row.get('bureau') and row.get('direction') else None,
+            'categorie': row.get('categorie') or None,
+        }
+
+    def traiter_lot(self, lignes):
+        """Importe un lot de lignes [(numero_ligne, row), ...]"""
+        valides = []
+        for numero, row in lignes:
+            try:
+                valides.append((numero, self._preparer_ligne(row)))
+            except Exception as e:
+                self.errors.append((numero, str(e)))
+        if not valides:
+            return
+
+        # Référentiels : une requête par table et par lot au lieu d'une par ligne
+        self._charger_directions({v['bureau'][1] for _, v in valides if v['bureau']})
+        self._charger_bureaux({
+            (v['bureau'][0], self.directions[v['bureau'][1]].pk) for _, v in valides if v['bureau']
+        })
+        self._charger_categories({v['categorie'] for _, v in valides if v['categorie']})
+
+        # Équipements : une seule recherche par clé pour tout le lot (empreintes seulement)
+        codes = {v['code_equipement'] for _, v in valides}
+        existants = Equipement.objects.only('empreinte').in_bulk(codes)
+        nouveaux = {}
+        modifies = {}
+
+        for numero, v in valides:
+            bureau = None
+            if v['bureau']:
+                nom_bureau, nom_direction = v['bureau']
+                bureau = self.bureaux[(nom_bureau, self.directions[nom_direction].pk)]
+            categorie = self.categories[v['categorie']] if v['categorie'] else None
+            empreinte = empreinte_equipement(
+                v['nom'], v['marque'], v['date_acquisition'], v['description_technique'],
+                bureau.pk if bureau else None, categorie.pk if categorie else None,
+            )
+
+            code = v['code_equipement']
+            equipement = existants.get(code) or nouveaux.get(code)
+            if equipement is None:
+                equipement = Equipement(code_equipement=code, code_squelette=squelette_code(code))
+                nouveaux[code] = equipement
+                self.count_created += 1
+            elif equipement.empreinte == empreinte:
+                self.count_unchanged += 1
+                continue
+            else:
+                if code in existants:
+                    modifies[code] = equipement
+                self.count_updated += 1
+
+            equipement.nom = v['nom']
+            equipement.marque = v['marque']
+            equipement.date_acquisition = v['date_acquisition']
+            equipement.description_technique = v['description_technique']
+            equipement.bureau = bureau
+            equipement.categorie = categorie
+            equipement.empreinte = empreinte
+
+        if nouveaux:
+            if connection.features.supports_update_conflicts_with_target:
+                # Protège contre une insertion concurrente du même code
+                Equipement.objects.bulk_create(
+                    nouveaux.values(),
+                    batch_size=self.taille_lot,
+                    update_conflicts=True,
+                    unique_fields=['code_equipement'],
+                    update_fields=CHAMPS_EQUIPEMENT,
+                )
+            else:
+                Equipement.objects.bulk_create(nouveaux.values(), batch_size=self.taille_lot)
+        if modifies:
+            Equipement.objects.bulk_update(modifies.values(), CHAMPS_EQUIPEMENT, batch_size=self.taille_lot)
+        if nouveaux or modifies:
+            # Sans signaux en masse : index de recherche mis à jour dans la transaction du lot
+            indexer('EQUIPEMENT', [*nouveaux.values(), *modifies.values()])
+
+    def reprendre(self, lignes):
+        """Passe les lignes déjà importées avant un arrêt (elles sont en base, rien à reconstituer)"""
+        for _ in lignes:
+            pass
+
+    def importer(self, lignes):
+        """Importe toutes les lignes (numero_ligne, row) produites par lire_csv, lot par lot"""
+        for lot in par_lots(lignes, self.taille_lot):
+            self.traiter_lot(lot)
+
+
+class ValidateurEquipements(ImportateurEquipements):
+    """Simulation d'import : valide toutes les lignes et calcule le différentiel sans rien écrire
+
+    Chaque lot est validé d'un bloc : une recherche par clé pour les
+    empreintes des équipements existants, une requête par nouvelle direction
+    pour les bureaux connus. Les codes déjà vus restent en mémoire pour
+    détecter les doublons sur tout le fichier.
+    """
+
+    def __init__(self, taille_lot=TAILLE_LOT):
+        super().__init__(taille_lot)
+        self.codes_vus = {}                 # code -> numéro de sa première ligne
+        self.couples_connus = {}            # (bureau, direction) -> bureau_id
+        self.couples_signales = set()
+        self.directions_chargees = set()
+        self.categories_connues = {}        # nom -> categorie_id
+        self.categories_chargees = set()
+        self.entete_verifiee = False
+        self.entete_invalide = False
+
+    def _verifier_entete(self, row):
+        self.entete_verifiee = True
+        manquantes = [champ for champ in CHAMPS_OBLIGATOIRES if champ not in row]
+        if manquantes:
+            self.entete_invalide = True
+            self.errors.append((1, f"Colonnes obligatoires absentes : {', '.join(manquantes)}"))
+
+    def reprendre(self, lignes):
+        """Reconstitue l'état en mémoire des lignes validées avant un arrêt, sans les signaler à nouveau
+
+        Leurs erreurs sont déjà enregistrées ; il faut seulement connaître leurs codes
+        (doublons des lignes suivantes), l'en-tête et les bureaux déjà signalés.
+        """
+        for numero, row in lignes:
+            if not self.entete_verifiee:
+                self.entete_verifiee = True
+                self.entete_invalide = any(champ not in row for champ in CHAMPS_OBLIGATOIRES)
+            if self.entete_invalide:
+                continue
+            try:
+                v = self._preparer_ligne(row)
+            except Exception:
+                continue
+            self.codes_vus.setdefault(v['code_equipement'], numero)
+            if v['bureau']:
+                self.couples_signales.add(v['bureau'])
+
+    def traiter_lot(self, lignes):
+        if not self.entete_verifiee and lignes:
+            self._verifier_entete(lignes[0][1])
+        if self.entete_invalide:
+            return
+
+        valides = []
+        for numero, row in lignes:
+            try:
+                v = self._preparer_ligne(row)
+            except Exception as e:
+                self.errors.append((numero, str(e)))
+                continue
+            code = v['code_equipement']
+            if code in self.codes_vus:
+                self.errors.append((numero, f"Code {code} en double dans le fichier (déjà ligne {self.codes_vus[code]})"))
+                continue
+            self.codes_vus[code] = numero
+            valides.append((numero, v))
+        if not valides:
+            return
+
+        # Couples direction/bureau inconnus : chargés une fois par direction
+        directions = {v['bureau'][1] for _, v in valides if v['bureau']} - self.directions_chargees
+        if directions:
+            self.couples_connus.update(
+                ((nom, direction), pk) for nom, direction, pk in
+                Bureau.objects.filter(direction__nom__in=directions).values_list('nom', 'direction__nom', 'pk')
+            )
+            self.directions_chargees |= directions
+        for numero, v in valides:
+            if v['bureau'] and v['bureau'] not in self.couples_connus and v['bureau'] not in self.couples_signales:
+                nom_bureau, nom_direction = v['bureau']
+                self.warnings.append(
+                    (numero, f"Bureau « {nom_bureau} » inconnu dans la direction « {nom_direction} » (sera créé)")
+                )
+                self.couples_signales.add(v['bureau'])  # Signalé une seule fois
+
+        categories = {v['categorie'] for _, v in valides if v['categorie']} - self.categories_chargees
+        if categories:
+            self.categories_connues.update(
+                CategorieEquipement.objects.filter(nom__in=categories).values_list('nom', 'pk')
+            )
+            self.categories_chargees |= categories
+
+        # Différentiel avec la table Equipement : une recherche par clé pour le lot
+        actuelles = dict(
+            Equipement.objects.filter(pk__in=[v['code_equipement'] for _, v in valides])
+            .values_list('code_equipement', 'empreinte')
+        )
+        for _, v in valides:
+            code = v['code_equipement']
+            if code not in actuelles:
+                self.count_created += 1
+                continue
+            bureau_id = self.couples_connus.get(v['bureau']) if v['bureau'] else None
+            categorie_id = self.categories_connues.get(v['categorie']) if v['categorie'] else None
+            if (v['bureau'] and bureau_id is None) or (v['categorie'] and categorie_id is None):
+                # Bureau ou catégorie à créer : l'équipement change forcément
+                self.count_updated += 1
+                continue
+            empreinte = empreinte_equipement(
+                v['nom'], v['marque'], v['date_acquisition'], v['description_technique'], bureau_id, categorie_id
+            )
+            if actuelles[code] == empreinte:
+                self.count_unchanged += 1
+            else:
+                self.count_updated += 1
+
+
+# ============= IMPORTS EN ARRIÈRE-PLAN =============
+
+def prochain_import():
+    """Réserve le prochain import à traiter (en attente, ou abandonné par un worker arrêté)"""
+    limite = timezone.now() - DELAI_ABANDON
+    candidats = ImportJob.objects.filter(
+        Q(statut='EN_ATTENTE') | Q(statut='EN_COURS', date_maj__lt=limite)
+    ).order_by('date_creation')
+
+    for job in candidats[:10]:
+        # Réservation atomique : un seul worker gagne
+        reserve = ImportJob.objects.filter(
+            pk=job.pk, statut=job.statut, date_maj=job.date_maj
+        ).update(statut='EN_COURS', date_maj=timezone.now())
+        if reserve:
+            job.refresh_from_db()
+            return job
+    return None
+
+
+def executer_import(job, taille_lot=TAILLE_LOT):
+    """Exécute un import en validant chaque lot avec son point de reprise.
+
+    Après un arrêt brutal, l'import reprend à job.lignes_traitees : le lot
+    interrompu a été annulé avec son point de reprise, il est donc rejoué. Les lignes
+    déjà traitées sont relues par reprendre() (la simulation y retrouve ses codes vus).
+    """
+    if not job.date_debut:
+        job.date_debut = timezone.now()
+
+    classe = ValidateurEquipements if job.simulation else ImportateurEquipements
+    importateur = classe(taille_lot)
+    try:
+        with job.fichier.open('rb') as fichier:
+            if not job.lignes_total:
+                job.lignes_total = sum(1 for _ in lire_csv(fichier))
+                job.save(update_fields=['date_debut', 'lignes_total', 'date_maj'])
+
+            lignes = lire_csv(fichier)
+            if job.lignes_traitees:
+                importateur.reprendre(islice(lignes, job.lignes_traitees))
+            for lot in par_lots(lignes, taille_lot):
+                with transaction.atomic():
+                    importateur.traiter_lot(lot)
+                    ImportJobErreur.objects.bulk_create([
+                        ImportJobErreur(job=job, ligne=numero, niveau=niveau, message=message)
+                        for niveau, messages in [('ERREUR', importateur.errors), ('AVERTISSEMENT', importateur.warnings)]
+                        for numero, message in messages
+                    ])
+                    job.lignes_traitees += len(lot)
+                    job.nb_crees += importateur.count_created
+                    job.nb_mis_a_jour += importateur.count_updated
+                    job.nb_inchanges += importateur.count_unchanged
+                    job.nb_erreurs += len(importateur.errors)
+                    job.nb_avertissements += len(importateur.warnings)
+                    job.save()
+                importateur.count_created = importateur.count_updated = importateur.count_unchanged = 0
+                importateur.errors = []
+                importateur.warnings = []
+    except Exception as e:
+        job.statut = 'ECHEC'
+        job.message = f"Erreur lors de l'import: {str(e)}"
+        job.date_fin = timezone.now()
+        job.save()
+        if not job.simulation and (job.nb_crees or job.nb_mis_a_jour):
+            reconstruire_statistiques()
+        return job
+
+    # bulk_create / bulk_update ne déclenchent pas les signaux des compteurs
+    if not job.simulation and (job.nb_crees or job.nb_mis_a_jour):
+        reconstruire_statistiques()
+
+    job.statut = 'TERMINE'
+    job.date_fin = timezone.now()
+    job.save()
+    if job.simulation:
+        details = (f"Simulation import CSV: {job.nb_crees} à créer, {job.nb_mis_a_jour} à mettre à jour, "
+                   f"{job.nb_inchanges} inchangés, {job.nb_erreurs} erreurs")
+    else:
+        details = f"Import CSV: {job.nb_crees} créés, {job.nb_mis_a_jour} mis à jour, {job.nb_inchanges} inchangés"
+    # Écrit tout de suite (processus de travail), mais comme le journal différé : index et activité
+    ecrire_entrees([nouvelle_entree(job.cree_par_id, 'IMPORT_CSV', 'ImportJob', job.pk, details)])
+    return job
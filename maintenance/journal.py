@@ -0,0 +1,347 @@
+import atexit
+import glob
+import gzip
+import json
+import logging
+import os
+import threading
+from collections import deque
+from datetime import datetime, timedelta
+from uuid import uuid4
+
+from django.conf import settings
+from django.db import close_old_connections, connection, models, transaction
+from django.db.models.functions import Cast
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import User, LogAction, ArchiveJournal, EntreeRecherche, ActiviteJournal
+from .recherche import indexer
+from .statistiques import CHAMPS_ACTIVITE, calculer_activite, cles_activite, compter_activite
+
+
+logger = logging.getLogger(__name__)
+
+
+# ============= JOURNAL DES ACTIONS =============
+# log_action() n'écrit plus LogAction dans la requête : l'entrée est ajoutée à une file
+# en mémoire (après le commit de la transaction en cours) et à un fichier de reprise,
+# puis un thread l'écrit en base par lots (bulk_create) tous les JOURNAL_TAILLE_LOT
+# entrées ou toutes les JOURNAL_DELAI_MS millisecondes.
+# Le fichier de reprise (un par démarrage de processus) garde les entrées pas encore
+# écrites ; après un arrêt brutal, `manage.py rejouer_journal` les insère (au moins une fois).
+# Les lectures du journal côté admin appellent d'abord vider_journal() : les actions du
+# processus qui lit sont toutes visibles, celles des autres processus le sont dès que leur
+# thread les écrit, soit au plus JOURNAL_DELAI_MS après (tant que la base les accepte).
+
+JOURNAL_ASYNCHRONE = getattr(settings, 'JOURNAL_ASYNCHRONE', True)
+JOURNAL_TAILLE_LOT = getattr(settings, 'JOURNAL_TAILLE_LOT', 100)
+JOURNAL_DELAI_MS = getattr(settings, 'JOURNAL_DELAI_MS', 500)
+JOURNAL_DOSSIER_REPRISE = getattr(settings, 'JOURNAL_DOSSIER_REPRISE', os.path.join(settings.BASE_DIR, 'journal'))
+JOURNAL_CONSERVATION_JOURS = getattr(settings, 'JOURNAL_CONSERVATION_JOURS', 180)
+JOURNAL_DOSSIER_ARCHIVES = getattr(settings, 'JOURNAL_DOSSIER_ARCHIVES',
+                                   os.path.join(settings.BASE_DIR, 'archives_journal'))
+
+CHAMPS_ENTREE = ('utilisateur_id', 'action', 'type_objet', 'objet_id', 'details', 'adresse_ip')
+
+
+def nouvelle_entree(utilisateur_id, action, type_objet='', objet_id=None, details='', adresse_ip=None):
+    """Entrée du journal sérialisable (JSON), horodatée au moment de l'action"""
+    return {
+        'utilisateur_id': utilisateur_id,
+        'action': action,
+        'type_objet': type_objet,
+        'objet_id': objet_id,
+        'details': details,
+        'adresse_ip': adresse_ip,
+        'date_action': timezone.now().isoformat(),
+    }
+
+
+def ecrire_entrees(entrees):
+    """Insère les entrées en une requête, les indexe pour la recherche et les compte dans ActiviteJournal"""
+    logs = [
+        LogAction(date_action=parse_datetime(entree['date_action']),
+                  **{champ: entree[champ] for champ in CHAMPS_ENTREE})
+        for entree in entrees
+    ]
+    with transaction.atomic():
+        logs = LogAction.objects.bulk_create(logs)
+        indexer('LOG', logs, nouveaux=True)
+        compter_activite(logs)
+    return logs
+
+
+class JournalActions:
+    """File d'entrées en attente, fichier de reprise et thread d'écriture d'un processus"""
+
+    def __init__(self, dossier, taille_lot=JOURNAL_TAILLE_LOT, delai_ms=JOURNAL_DELAI_MS):
+        self.dossier = dossier
+        self.taille_lot = taille_lot
+        self.delai = delai_ms / 1000
+        self._initialiser()
+
+    def _initialiser(self):
+        # Aussi appelé après un fork : le thread et le fichier du parent ne sont pas hérités
+        self._pid = os.getpid()
+        self._jeton = uuid4().hex  # Un PID réutilisé ne doit pas reprendre le fichier d'un processus arrêté
+        self._condition = threading.Condition()
+        self._ecriture = threading.Lock()  # un seul écrivain à la fois (thread ou vider())
+        self._attente = deque()
+        self._numero = 0
+        self._fichier = None
+        self._thread = None
+
+    @property
+    def chemin_reprise(self):
+        return os.path.join(self.dossier, f'journal-{self._pid}-{self._jeton}.jsonl')
+
+    def ajouter(self, entree):
+        """Met une entrée en file et dans le fichier de reprise ; démarre le thread au besoin"""
+        if os.getpid() != self._pid:
+            self._initialiser()
+        with self._condition:
+            self._numero += 1
+            entree = dict(entree, numero=self._numero)
+            if self._fichier is None:
+                os.makedirs(self.dossier, exist_ok=True)
+                self._fichier = open(self.chemin_reprise, 'x', encoding='utf-8')
+            # flush() suffit contre l'arrêt du processus ; fsync() coûterait autant que l'INSERT
+            self._fichier.write(json.dumps(entree) + '\n')
+            self._fichier.flush()
+            self._attente.append(entree)
+            if len(self._attente) >= self.taille_lot:
+                self._condition.notify()
+            if self._thread is None:
+                self.demarrer()
+
+    def demarrer(self):
+        """Démarre le thread d'écriture ; ce qui reste en file est écrit à la sortie du processus"""
+        self._thread = threading.Thread(target=self._boucle, name='journal-actions', daemon=True)
+        self._thread.start()
+        atexit.register(self.vider)
+
+    def _boucle(self):
+        while True:
+            with self._condition:
+                self._condition.wait(timeout=self.delai)
+            close_old_connections()
+            self.vider()
+
+    def vider(self):
+        """Écrit toutes les entrées en attente ; False si la base a refusé un lot (réessayé plus tard)"""
+        with self._ecriture:
+            while True:
+                with self._condition:
+                    lot = [self._attente.popleft() for _ in range(min(self.taille_lot, len(self._attente)))]
+                if not lot:
+                    return True
+                try:
+                    ecrire_entrees(lot)
+                except Exception:
+                    logger.exception("Écriture du journal des actions impossible (%d entrée(s) en attente)", len(lot))
+                    with self._condition:
+                        self._attente.extendleft(reversed(lot))
+                    return False
+                self._marquer_ecrit(lot[-1]['numero'])
+
+    def _marquer_ecrit(self, numero):
+        """Note dans le fichier de reprise que les entrées jusqu'à numero sont en base"""
+        with self._condition:
+            if self._attente:
+                self._fichier.write(json.dumps({'ecrit': numero}) + '\n')
+            else:
+                # Tout est écrit : le fichier repart de zéro
+                self._fichier.seek(0)
+                self._fichier.truncate()
+            self._fichier.flush()
+
+
+def lire_reprise(chemin):
+    """Entrées d'un fichier de reprise qui n'ont pas été écrites en base"""
+    entrees, ecrit = [], 0
+    with open(chemin, encoding='utf-8') as fichier:
+        for ligne in fichier:
+            try:
+                donnees = json.loads(ligne)
+            except ValueError:
+                continue  # Dernière ligne tronquée par l'arrêt du processus
+            if 'ecrit' in donnees:
+                ecrit = max(ecrit, donnees['ecrit'])
+            else:
+                entrees.append(donnees)
+    return [entree for entree in entrees if entree['numero'] > ecrit]
+
+
+def rejouer_reprises(dossier=JOURNAL_DOSSIER_REPRISE, taille_lot=JOURNAL_TAILLE_LOT):
+    """Insère les entrées laissées par des processus arrêtés, puis supprime leurs fichiers
+
+    À lancer quand aucun serveur ne tourne (au démarrage) : le fichier d'un processus
+    actif serait aussi rejoué. Retourne le nombre d'entrées insérées.
+    """
+    total = 0
+    for chemin in sorted(glob.glob(os.path.join(dossier, 'journal-*.jsonl'))):
+        entrees = lire_reprise(chemin)
+        for debut in range(0, len(entrees), taille_lot):
+            ecrire_entrees(entrees[debut:debut + taille_lot])
+        total += len(entrees)
+        os.remove(chemin)
+    return total
+
+
+journal = JournalActions(JOURNAL_DOSSIER_REPRISE)
+
+
+def journaliser(utilisateur_id, action, type_objet='', objet_id=None, details='', adresse_ip=None):
+    """Ajoute une action au journal, une fois la transaction en cours validée
+
+    Écrit immédiatement (comme avant) si JOURNAL_ASYNCHRONE est désactivé.
+    """
+    entree = nouvelle_entree(utilisateur_id, action, type_objet, objet_id, details, adresse_ip)
+    if not JOURNAL_ASYNCHRONE:
+        ecrire_entrees([entree])
+        return
+    transaction.on_commit(lambda: journal.ajouter(entree))
+
+
+def vider_journal():
+    """À appeler avant de lire LogAction : écrit les entrées encore en file dans ce processus
+
+    Celles des autres processus ne sont pas touchées (leur thread les écrit au plus
+    JOURNAL_DELAI_MS après) : relire leurs fichiers de reprise les insérerait deux fois.
+    """
+    return journal.vider()
+
+
+# ============= ARCHIVAGE =============
+# `manage.py archiver_journal` retire de LogAction les mois entiers plus anciens que
+# JOURNAL_CONSERVATION_JOURS : un fichier JSON Lines compressé par mois, recensé par
+# ArchiveJournal. La page des logs relit un mois archivé à la demande (logs_archives).
+# Les fichiers sont hors de MEDIA_ROOT : le journal contient les adresses IP.
+
+CHAMPS_ARCHIVE = ('id', 'date_action') + CHAMPS_ENTREE
+
+
+def debut_mois(date):
+    """Premier instant (heure locale) du mois contenant date"""
+    return timezone.localtime(date).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def mois_suivant(debut):
+    return debut_mois(debut + timedelta(days=32))
+
+
+def archiver_journal(jours=JOURNAL_CONSERVATION_JOURS, dossier=None):
+    """Archive les mois entièrement antérieurs à now - jours ; retourne les ArchiveJournal écrites"""
+    limite = debut_mois(timezone.now() - timedelta(days=jours))
+    archives = []
+    while True:
+        plus_ancienne = LogAction.objects.filter(date_action__lt=limite).order_by(
+            'date_action').values_list('date_action', flat=True).first()
+        if plus_ancienne is None:
+            return archives
+        archives.append(archiver_mois(debut_mois(plus_ancienne), dossier))
+
+
+def archiver_mois(debut, dossier=None):
+    """Déplace les logs d'un mois dans son fichier d'archive (fusionné avec l'archive existante)
+
+    Le nouveau fichier est écrit sous un autre nom, puis ArchiveJournal est basculée et les
+    logs supprimés dans une même transaction : un arrêt en cours de route laisse au pire un
+    fichier orphelin, jamais une action perdue ou archivée deux fois.
+    """
+    dossier = dossier or JOURNAL_DOSSIER_ARCHIVES
+    fin = mois_suivant(debut)
+    precedente = ArchiveJournal.objects.filter(mois=debut.date()).first()
+    logs = LogAction.objects.filter(date_action__gte=debut, date_action__lt=fin)
+
+    os.makedirs(dossier, exist_ok=True)
+    nom = f"journal-{debut:%Y-%m}-{timezone.now():%Y%m%d%H%M%S%f}.jsonl.gz"
+    chemin = os.path.join(dossier, nom)
+    nb_entrees, dernier_id = 0, 0
+    with gzip.open(chemin, 'wt', encoding='utf-8') as fichier:
+        if precedente:
+            for ligne in lire_archive(precedente, dossier):
+                fichier.write(json.dumps(ligne) + '\n')
+                nb_entrees += 1
+        for ligne in logs.order_by('date_action', 'pk').values(*CHAMPS_ARCHIVE).iterator(chunk_size=2000):
+            ligne['date_action'] = ligne['date_action'].isoformat()
+            fichier.write(json.dumps(ligne) + '\n')
+            nb_entrees += 1
+            dernier_id = max(dernier_id, ligne['id'])
+
+    # Les logs arrivés pendant l'écriture du fichier restent pour le prochain passage
+    archives = logs.filter(pk__lte=dernier_id)
+    with transaction.atomic():
+        EntreeRecherche.objects.filter(
+            type_objet='LOG', objet_id__in=archives.annotate(cle=Cast('pk', models.CharField())).values('cle')
+        ).delete()
+        # DELETE direct : delete() chargerait chaque log pour le signal de désindexation
+        # (aucune clé étrangère ne pointe vers LogAction)
+        with connection.cursor() as curseur:
+            curseur.execute(
+                f"DELETE FROM {connection.ops.quote_name(LogAction._meta.db_table)} "
+                "WHERE date_action >= %s AND date_action < %s AND id <= %s",
+                [connection.ops.adapt_datetimefield_value(debut), connection.ops.adapt_datetimefield_value(fin),
+                 dernier_id],
+            )
+        archive, _ = ArchiveJournal.objects.update_or_create(mois=debut.date(), defaults={
+            'fichier': nom,
+            'nb_entrees': nb_entrees,
+            'taille': os.path.getsize(chemin),
+        })
+    if precedente:
+        os.remove(os.path.join(dossier, precedente.fichier))
+    return archive
+
+
+def lire_archive(archive, dossier=None):
+    """Lignes (dict) d'un mois archivé, décompressées au fil de la lecture"""
+    with gzip.open(os.path.join(dossier or JOURNAL_DOSSIER_ARCHIVES, archive.fichier), 'rt', encoding='utf-8') as fichier:
+        for ligne in fichier:
+            yield json.loads(ligne)
+
+
+def lignes_archive(archive, dossier=None):
+    """Lignes d'un mois archivé (dates converties), de la plus récente à la plus ancienne"""
+    lignes = []
+    for ligne in lire_archive(archive, dossier):
+        ligne['date_action'] = datetime.fromisoformat(ligne['date_action'])
+        lignes.append(ligne)
+    lignes.sort(key=lambda ligne: (ligne['date_action'], ligne['id']), reverse=True)
+    return lignes
+
+
+def logs_archives(lignes):
+    """LogAction (non enregistrés) pour des lignes d'archive, avec leur utilisateur
+
+    Créer une instance coûte plus que lire la ligne : filtrer et paginer les lignes
+    d'abord, puis ne convertir que celles affichées.
+    """
+    utilisateurs = User.objects.in_bulk({ligne['utilisateur_id'] for ligne in lignes if ligne['utilisateur_id']})
+    logs = []
+    for ligne in lignes:
+        log = LogAction(**ligne)
+        # Utilisateur supprimé depuis : affiché comme "Système", comme SET_NULL dans LogAction
+        log.utilisateur = utilisateurs.get(log.utilisateur_id)
+        logs.append(log)
+    return logs
+
+
+def reconstruire_activite(dossier=None):
+    """Recalcule entièrement ActiviteJournal depuis LogAction et les mois archivés
+
+    Les actions archivées sont comptées avec le rôle actuel de leur utilisateur.
+    """
+    activite = calculer_activite(LogAction.objects.all())
+    roles = dict(User.objects.values_list('pk', 'role'))
+    for archive in ArchiveJournal.objects.all():
+        for ligne in lire_archive(archive, dossier):
+            activite.update(cles_activite(datetime.fromisoformat(ligne['date_action']), ligne['action'],
+                                          ligne['utilisateur_id'], roles.get(ligne['utilisateur_id'])))
+    with transaction.atomic():
+        ActiviteJournal.objects.all().delete()
+        ActiviteJournal.objects.bulk_create([
+            ActiviteJournal(nombre=nombre, **dict(zip(CHAMPS_ACTIVITE, cle))) for cle, nombre in activite.items()
+        ], batch_size=2000)
+    return len(activite)
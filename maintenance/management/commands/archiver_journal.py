@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from maintenance.journal import JOURNAL_CONSERVATION_JOURS, archiver_journal
+
+
+class Command(BaseCommand):
+    help = "Déplace les mois anciens du journal des actions dans des archives compressées"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--jours', type=int, default=JOURNAL_CONSERVATION_JOURS,
+                            help=f"Jours gardés en base, arrondis au mois entier (défaut : {JOURNAL_CONSERVATION_JOURS})")
+
+    def handle(self, *args, **options):
+        archives = archiver_journal(options['jours'])
+        for archive in archives:
+            self.stdout.write(f"{archive} : {archive.fichier} ({archive.taille // 1024} Ko)")
+        self.stdout.write(self.style.SUCCESS(f"{len(archives)} mois archivé(s)"))
@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from maintenance.notifications import traiter_emails
+
+
+class Command(BaseCommand):
+    help = "Worker des emails : envoie les emails en file, retente les échecs avec un délai croissant"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--une-fois', action='store_true',
+                            help="Envoyer les emails dus puis s'arrêter")
+        parser.add_argument('--intervalle', type=float, default=5,
+                            help="Secondes d'attente quand la file est vide (défaut : 5)")
+
+    def handle(self, *args, **options):
+        while True:
+            envoyes, echecs = traiter_emails()
+            if envoyes or echecs:
+                self.stdout.write(f"{envoyes} email(s) envoyé(s), {echecs} échec(s)")
+            if options['une_fois']:
+                break
+            time.sleep(options['intervalle'])
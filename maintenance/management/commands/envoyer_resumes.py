@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from maintenance.notifications import envoyer_resumes, NOTIFICATIONS_FENETRE_HEURES
+
+
+class Command(BaseCommand):
+    help = ("Mode résumé (NOTIFICATIONS_RESUME) : met en file un email par destinataire regroupant ses "
+            "notifications en attente ; à planifier (cron), par exemple toutes les heures")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fenetre', type=float, default=NOTIFICATIONS_FENETRE_HEURES,
+                            help="Heures minimum entre deux résumés d'un même destinataire "
+                                 f"(défaut : {NOTIFICATIONS_FENETRE_HEURES})")
+        parser.add_argument('--tous', action='store_true',
+                            help="Envoyer toutes les notifications en attente, sans attendre la fin de la fenêtre")
+
+    def handle(self, *args, **options):
+        nb = envoyer_resumes(options['fenetre'], tous=options['tous'])
+        self.stdout.write(self.style.SUCCESS(f"{nb} résumé(s) mis en file (envoyés par envoyer_emails)"))
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from maintenance.images import mettre_en_attente_images, traiter_images
+
+
+class Command(BaseCommand):
+    help = "Génère les miniatures des images jointes avant leur mise en place (ou en échec)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--toutes', action='store_true',
+                            help="Régénérer aussi les miniatures existantes (après changement de taille ou de format)")
+        parser.add_argument('--en-file', action='store_true',
+                            help="Seulement mettre les images en file pour le worker traiter_images")
+
+    def handle(self, *args, **options):
+        nb = mettre_en_attente_images(options['toutes'])
+        self.stdout.write(f"{nb} image(s) en file")
+        if not options['en_file']:
+            generees, echecs = traiter_images()
+            self.stdout.write(self.style.SUCCESS(f"{generees} image(s) traitée(s), {echecs} illisible(s)"))
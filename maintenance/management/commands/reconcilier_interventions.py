@@ -0,0 +1,32 @@
+from django.db.models import F, Q
+from django.core.management.base import BaseCommand
+
+from maintenance.models import Intervention
+
+
+class Command(BaseCommand):
+    help = "Compare les totaux stockés des interventions (coût des pièces, fichiers) à un recalcul et les corrige"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verifier', action='store_true',
+                            help="Signaler les écarts sans les corriger")
+
+    def handle(self, *args, **options):
+        ecarts = Intervention.objects.avec_totaux_calcules().filter(
+            ~Q(cout_total=F('cout_total_calcule')) | ~Q(nb_fichiers=F('nb_fichiers_calcule'))
+        ).order_by('pk')
+
+        lignes = list(ecarts.values_list('pk', 'cout_total', 'cout_total_calcule', 'nb_fichiers', 'nb_fichiers_calcule'))
+        for pk, cout_total, cout_calcule, nb_fichiers, nb_calcule in lignes:
+            self.stdout.write(
+                f"Intervention #{pk} : coût {cout_total} (attendu {cout_calcule}), "
+                f"fichiers {nb_fichiers} (attendu {nb_calcule})"
+            )
+
+        if not lignes:
+            self.stdout.write(self.style.SUCCESS("Aucun écart"))
+        elif options['verifier']:
+            self.stdout.write(self.style.WARNING(f"{len(lignes)} intervention(s) en écart"))
+        else:
+            Intervention.objects.filter(pk__in=[ligne[0] for ligne in lignes]).recalculer_totaux()
+            self.stdout.write(self.style.SUCCESS(f"{len(lignes)} intervention(s) corrigée(s)"))
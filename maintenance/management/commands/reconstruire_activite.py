@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from maintenance.journal import reconstruire_activite
+
+
+class Command(BaseCommand):
+    help = "Recalcule l'activité du journal (par heure et par jour) depuis les logs et leurs archives"
+
+    def handle(self, *args, **options):
+        nb_lignes = reconstruire_activite()
+        self.stdout.write(self.style.SUCCESS(f"{nb_lignes} lignes d'activité recalculées"))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from maintenance.recherche import reconstruire_index
+
+
+class Command(BaseCommand):
+    help = "Réindexe entièrement la recherche plein texte (logs, demandes, interventions, équipements)"
+
+    def handle(self, *args, **options):
+        nb_entrees = reconstruire_index()
+        self.stdout.write(self.style.SUCCESS(f"{nb_entrees} objets indexés"))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from maintenance.statistiques import reconstruire_statistiques
+
+
+class Command(BaseCommand):
+    help = "Recalcule entièrement les compteurs matérialisés du tableau de bord"
+
+    def handle(self, *args, **options):
+        nb_compteurs = reconstruire_statistiques()
+        self.stdout.write(self.style.SUCCESS(f"{nb_compteurs} compteurs recalculés"))
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from maintenance.journal import rejouer_reprises
+
+
+class Command(BaseCommand):
+    help = ("Insère les actions du journal restées dans les fichiers de reprise après un arrêt brutal "
+            "(à lancer avant de démarrer le serveur)")
+
+    def handle(self, *args, **options):
+        nb_entrees = rejouer_reprises()
+        self.stdout.write(self.style.SUCCESS(f"{nb_entrees} action(s) du journal rejouée(s)"))
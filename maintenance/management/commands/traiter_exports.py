@@ -0,0 +1,68 @@
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+import django
+from django.core.management.base import BaseCommand
+
+from maintenance.models import ExportJob
+from maintenance.rapports import prochain_export, executer_export_par_id, purger_exports
+
+
+# Secondes entre deux purges des exports expirés
+INTERVALLE_PURGE = 3600
+
+
+class Command(BaseCommand):
+    help = "Worker des exports : génère les rapports mis en file d'attente dans un pool de processus"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--une-fois', action='store_true',
+                            help="Traiter les exports en attente puis s'arrêter")
+        parser.add_argument('--intervalle', type=float, default=5,
+                            help="Secondes d'attente quand la file est vide (défaut : 5)")
+        parser.add_argument('--processus', type=int, default=2,
+                            help="Nombre de rapports générés en parallèle (défaut : 2)")
+
+    def handle(self, *args, **options):
+        nb_processus = max(1, options['processus'])
+        prochaine_purge = 0
+
+        # La mise en page est liée au CPU : chaque rapport est généré dans un processus
+        # séparé, démarré en spawn (pas de connexion à la base héritée) puis initialisé
+        # par django.setup(). Une archive ZIP de rapports d'intervention répartit en plus
+        # ses rapports manquants sur EXPORT_ZIP_PROCESSUS processus (rapports_en_parallele).
+        with ProcessPoolExecutor(max_workers=nb_processus,
+                                 mp_context=multiprocessing.get_context('spawn'),
+                                 initializer=django.setup) as pool:
+            en_cours = {}
+            while True:
+                if time.monotonic() >= prochaine_purge:
+                    nb_supprimes = purger_exports()
+                    if nb_supprimes:
+                        self.stdout.write(f"{nb_supprimes} export(s) expiré(s) supprimé(s)")
+                    prochaine_purge = time.monotonic() + INTERVALLE_PURGE
+
+                while len(en_cours) < nb_processus:
+                    job = prochain_export()
+                    if job is None:
+                        break
+                    self.stdout.write(f"Export #{job.pk} ({job.get_type_export_display()}) en cours")
+                    en_cours[pool.submit(executer_export_par_id, job.pk)] = job.pk
+
+                if not en_cours:
+                    if options['une_fois']:
+                        break
+                    time.sleep(options['intervalle'])
+                    continue
+
+                termines, _ = wait(en_cours, timeout=options['intervalle'], return_when=FIRST_COMPLETED)
+                for future in termines:
+                    job = ExportJob.objects.get(pk=en_cours.pop(future))
+                    if future.exception() is not None:
+                        # Processus tué : l'export reste EN_COURS et sera repris après DELAI_ABANDON
+                        self.stderr.write(f"Export #{job.pk} interrompu : {future.exception()}")
+                    elif job.statut == 'TERMINE':
+                        self.stdout.write(self.style.SUCCESS(f"Export #{job.pk} terminé : {job.fichier.name}"))
+                    else:
+                        self.stderr.write(f"Export #{job.pk} en échec : {job.message}")
@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from maintenance.images import prochaine_image, traiter_image
+
+
+class Command(BaseCommand):
+    help = "Worker des images jointes : génère la miniature et l'aperçu des images ajoutées"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--une-fois', action='store_true',
+                            help="Traiter les images en attente puis s'arrêter")
+        parser.add_argument('--intervalle', type=float, default=5,
+                            help="Secondes d'attente quand la file est vide (défaut : 5)")
+
+    def handle(self, *args, **options):
+        while True:
+            fichier = prochaine_image()
+            if fichier is None:
+                if options['une_fois']:
+                    break
+                time.sleep(options['intervalle'])
+                continue
+
+            if traiter_image(fichier):
+                self.stdout.write(f"Fichier #{fichier.pk} ({fichier.fichier.name}) : miniatures générées")
+            else:
+                self.stderr.write(f"Fichier #{fichier.pk} ({fichier.fichier.name}) : image illisible")
@@ -0,0 +1,34 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from maintenance.importation import prochain_import, executer_import
+
+
+class Command(BaseCommand):
+    help = "Worker des imports CSV d'équipements : traite les imports en attente et reprend les imports interrompus"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--une-fois', action='store_true',
+                            help="Traiter les imports en attente puis s'arrêter")
+        parser.add_argument('--intervalle', type=float, default=5,
+                            help="Secondes d'attente quand la file est vide (défaut : 5)")
+
+    def handle(self, *args, **options):
+        while True:
+            job = prochain_import()
+            if job is None:
+                if options['une_fois']:
+                    break
+                time.sleep(options['intervalle'])
+                continue
+
+            self.stdout.write(f"Import #{job.pk} ({job.nom_fichier}) : reprise à la ligne {job.lignes_traitees}")
+            job = executer_import(job)
+            if job.statut == 'TERMINE':
+                self.stdout.write(self.style.SUCCESS(
+                    f"{'Simulation' if job.simulation else 'Import'} #{job.pk} terminé : {job.nb_crees} créés, "
+                    f"{job.nb_mis_a_jour} mis à jour, {job.nb_inchanges} inchangés, {job.nb_erreurs} erreurs"
+                ))
+            else:
+                self.stderr.write(f"Import #{job.pk} en échec : {job.message}")
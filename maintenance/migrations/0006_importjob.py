@@ -0,0 +1,54 @@
+# Generated by Django 5.0 on 2026-10-17 21:43
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('maintenance', '0005_alter_logaction_action'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fichier', models.FileField(upload_to='imports/%Y/%m/', verbose_name='Fichier CSV')),
+                ('nom_fichier', models.CharField(max_length=255, verbose_name='Nom du fichier')),
+                ('statut', models.CharField(choices=[('EN_ATTENTE', 'En attente'), ('EN_COURS', 'En cours'), ('TERMINE', 'Terminé'), ('ECHEC', 'Échec')], default='EN_ATTENTE', max_length=20)),
+                ('date_creation', models.DateTimeField(auto_now_add=True)),
+                ('date_debut', models.DateTimeField(blank=True, null=True)),
+                ('date_fin', models.DateTimeField(blank=True, null=True)),
+                ('date_maj', models.DateTimeField(auto_now=True)),
+                ('lignes_total', models.PositiveIntegerField(default=0)),
+                ('lignes_traitees', models.PositiveIntegerField(default=0)),
+                ('nb_crees', models.PositiveIntegerField(default=0)),
+                ('nb_mis_a_jour', models.PositiveIntegerField(default=0)),
+                ('nb_erreurs', models.PositiveIntegerField(default=0)),
+                ('message', models.TextField(blank=True)),
+                ('cree_par', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='imports', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Import CSV',
+                'verbose_name_plural': 'Imports CSV',
+                'ordering': ['-date_creation'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ImportJobErreur',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ligne', models.PositiveIntegerField()),
+                ('message', models.TextField()),
+                ('job', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='erreurs', to='maintenance.importjob')),
+            ],
+            options={
+                'verbose_name': "Erreur d'import",
+                'verbose_name_plural': "Erreurs d'import",
+                'ordering': ['ligne'],
+            },
+        ),
+    ]
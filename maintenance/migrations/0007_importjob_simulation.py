@@ -0,0 +1,33 @@
+# Generated by Django 5.0 on 2026-10-17 21:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('maintenance', '0006_importjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importjob',
+            name='nb_avertissements',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='importjob',
+            name='nb_inchanges',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='importjob',
+            name='simulation',
+            field=models.BooleanField(default=False, verbose_name='Simulation (aucune écriture)'),
+        ),
+        migrations.AddField(
+            model_name='importjoberreur',
+            name='niveau',
+            field=models.CharField(choices=[('ERREUR', 'Erreur'), ('AVERTISSEMENT', 'Avertissement')], default='ERREUR', max_length=20),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.0 on 2026-10-17 21:46
+
+import hashlib
+
+from django.db import migrations, models
+
+
+def empreinte_equipement(nom, marque, date_acquisition, description_technique, bureau_id, categorie_id):
+    # Copie de models.empreinte_equipement telle qu'à cette migration (le code de l'app peut évoluer)
+    valeurs = [nom, marque, date_acquisition, description_technique, bureau_id, categorie_id]
+    texte = '\x1f'.join('' if v is None else str(v).strip() for v in valeurs)
+    return hashlib.sha256(texte.encode('utf-8')).hexdigest()
+
+
+def calculer_empreintes(apps, schema_editor):
+    Equipement = apps.get_model('maintenance', 'Equipement')
+    lot = []
+    for equipement in Equipement.objects.all().iterator(chunk_size=2000):
+        equipement.empreinte = empreinte_equipement(
+            equipement.nom, equipement.marque, equipement.date_acquisition,
+            equipement.description_technique, equipement.bureau_id, equipement.categorie_id,
+        )
+        lot.append(equipement)
+        if len(lot) >= 2000:
+            Equipement.objects.bulk_update(lot, ['empreinte'])
+            lot = []
+    if lot:
+        Equipement.objects.bulk_update(lot, ['empreinte'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('maintenance', '0007_importjob_simulation'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='equipement',
+            name='empreinte',
+            field=models.CharField(blank=True, editable=False, max_length=64),
+        ),
+        migrations.RunPython(calculer_empreintes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,69 @@
+# Generated by Django 5.0 on 2026-10-17 21:58
+
+from collections import Counter
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+# Copie de statistiques.calculer_compteurs telle qu'à cette migration (le code de l'app peut évoluer)
+def calculer_compteurs(demandes, equipements):
+    compteurs = Counter()
+    lignes = demandes.values_list(
+        'statut', 'technicien_id', 'equipement__marque', 'equipement__bureau__direction_id'
+    ).annotate(nb=Count('pk')).order_by()
+    for statut, technicien_id, marque, direction_id, nb in lignes:
+        cles = [('GLOBAL', 0, 'demandes', ''), ('GLOBAL', 0, 'statut', statut), ('GLOBAL', 0, 'pannes_marque', marque)]
+        if direction_id:
+            cles += [('DIRECTION', direction_id, 'demandes', ''), ('DIRECTION', direction_id, 'statut', statut)]
+        if technicien_id:
+            cles += [('TECHNICIEN', technicien_id, 'demandes', ''), ('TECHNICIEN', technicien_id, 'statut', statut)]
+        for cle in cles:
+            compteurs[cle] += nb
+    for direction_id, nb in equipements.values_list('bureau__direction_id').annotate(nb=Count('pk')).order_by():
+        compteurs[('GLOBAL', 0, 'equipements', '')] += nb
+        if direction_id:
+            compteurs[('DIRECTION', direction_id, 'equipements', '')] += nb
+    return compteurs
+
+
+def remplir_compteurs(apps, schema_editor):
+    DemandeMaintenance = apps.get_model('maintenance', 'DemandeMaintenance')
+    Equipement = apps.get_model('maintenance', 'Equipement')
+    CompteurStatistique = apps.get_model('maintenance', 'CompteurStatistique')
+    compteurs = calculer_compteurs(DemandeMaintenance.objects.all(), Equipement.objects.all())
+    CompteurStatistique.objects.bulk_create([
+        CompteurStatistique(portee=portee, objet_id=objet_id, indicateur=indicateur,
+                            valeur=valeur or '', nombre=nombre)
+        for (portee, objet_id, indicateur, valeur), nombre in compteurs.items()
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('maintenance', '0010_exportjob_types'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CompteurStatistique',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('portee', models.CharField(choices=[('GLOBAL', 'Global'), ('DIRECTION', 'Direction'), ('TECHNICIEN', 'Technicien')], max_length=20)),
+                ('objet_id', models.PositiveIntegerField(default=0)),
+                ('indicateur', models.CharField(max_length=30)),
+                ('valeur', models.CharField(blank=True, max_length=100)),
+                ('nombre', models.IntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Compteur statistique',
+                'verbose_name_plural': 'Compteurs statistiques',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='compteurstatistique',
+            constraint=models.UniqueConstraint(fields=('portee', 'objet_id', 'indicateur', 'valeur'), name='compteur_statistique_unique'),
+        ),
+        migrations.RunPython(remplir_compteurs, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.0 on 2026-10-17 22:02
+
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import Count, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def remplir_totaux(apps, schema_editor):
+    Intervention = apps.get_model('maintenance', 'Intervention')
+    PieceRechange = apps.get_model('maintenance', 'PieceRechange')
+    FichierIntervention = apps.get_model('maintenance', 'FichierIntervention')
+    montant = models.DecimalField(max_digits=12, decimal_places=2)
+    pieces = PieceRechange.objects.filter(intervention=OuterRef('pk')).order_by().values(
+        'intervention').annotate(total=Sum(F('prix_unitaire') * F('quantite'), output_field=montant)).values('total')
+    fichiers = FichierIntervention.objects.filter(intervention=OuterRef('pk')).order_by().values(
+        'intervention').annotate(nb=Count('pk')).values('nb')
+    Intervention.objects.update(
+        cout_total=Coalesce(Subquery(pieces, output_field=montant), Value(Decimal('0.00')), output_field=montant),
+        nb_fichiers=Coalesce(Subquery(fichiers, output_field=models.IntegerField()), 0),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('maintenance', '0011_compteurstatistique'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='intervention',
+            name='cout_total',
+            field=models.DecimalField(db_index=True, decimal_places=2, default=Decimal('0.00'), editable=False, max_digits=12),
+        ),
+        migrations.AddField(
+            model_name='intervention',
+            name='nb_fichiers',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(remplir_totaux, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 5.0 on 2026-10-17 22:10
+
+from django.db import migrations, models
+
+
+def analyser_tables(apps, schema_editor):
+    # Statistiques du planificateur périmées après l'ajout d'index (SQLite les garde
+    # telles quelles jusqu'au prochain ANALYZE et peut ignorer les nouveaux index)
+    if schema_editor.connection.vendor in ('sqlite', 'postgresql'):
+        schema_editor.execute('ANALYZE')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('maintenance', '0012_intervention_totaux'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='demandemaintenance',
+            index=models.Index(fields=['-date_creation'], name='demande_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='demandemaintenance',
+            index=models.Index(fields=['statut', '-date_creation'], name='demande_statut_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='demandemaintenance',
+            index=models.Index(fields=['urgence', '-date_creation'], name='demande_urgence_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='demandemaintenance',
+            index=models.Index(condition=models.Q(('technicien__isnull', False)), fields=['technicien', '-date_creation'], name='demande_technicien_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='demandemaintenance',
+            index=models.Index(fields=['employe', '-date_creation'], name='demande_employe_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='intervention',
+            index=models.Index(fields=['-date_intervention'], name='intervention_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='intervention',
+            index=models.Index(fields=['type_reparation', '-date_intervention'], name='intervention_type_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='logaction',
+            index=models.Index(fields=['-date_action'], name='log_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='logaction',
+            index=models.Index(fields=['utilisateur', '-date_action'], name='log_utilisateur_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='logaction',
+            index=models.Index(fields=['action', '-date_action'], name='log_action_date_idx'),
+        ),
+        migrations.RunPython(analyser_tables, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,94 @@
+# Generated by Django 5.0 on 2026-10-17 22:15
+
+from django.db import migrations, models
+
+
+# Copies de recherche.py telles qu'à cette migration (le code de l'app peut évoluer)
+TABLE_FTS5 = 'maintenance_recherche_fts'
+
+SQL_FTS5_CREATION = [
+    f"""CREATE VIRTUAL TABLE {TABLE_FTS5} USING fts5(
+        contenu, content='maintenance_entreerecherche', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )""",
+    f"""CREATE TRIGGER {TABLE_FTS5}_ai AFTER INSERT ON maintenance_entreerecherche BEGIN
+        INSERT INTO {TABLE_FTS5}(rowid, contenu) VALUES (new.id, new.contenu);
+    END""",
+    f"""CREATE TRIGGER {TABLE_FTS5}_ad AFTER DELETE ON maintenance_entreerecherche BEGIN
+        INSERT INTO {TABLE_FTS5}({TABLE_FTS5}, rowid, contenu) VALUES ('delete', old.id, old.contenu);
+    END""",
+    f"""CREATE TRIGGER {TABLE_FTS5}_au AFTER UPDATE ON maintenance_entreerecherche BEGIN
+        INSERT INTO {TABLE_FTS5}({TABLE_FTS5}, rowid, contenu) VALUES ('delete', old.id, old.contenu);
+        INSERT INTO {TABLE_FTS5}(rowid, contenu) VALUES (new.id, new.contenu);
+    END""",
+]
+
+SQL_FTS5_SUPPRESSION = [
+    f"DROP TRIGGER IF EXISTS {TABLE_FTS5}_ai",
+    f"DROP TRIGGER IF EXISTS {TABLE_FTS5}_ad",
+    f"DROP TRIGGER IF EXISTS {TABLE_FTS5}_au",
+    f"DROP TABLE IF EXISTS {TABLE_FTS5}",
+]
+
+# type_objet -> (modèle, texte indexé)
+CONTENUS = {
+    'LOG': ('LogAction', lambda log: log.details),
+    'DEMANDE': ('DemandeMaintenance', lambda demande: f"{demande.equipement_id} {demande.description}"),
+    'INTERVENTION': ('Intervention', lambda intervention: intervention.details),
+    'EQUIPEMENT': ('Equipement', lambda equipement: ' '.join(filter(None, [
+        equipement.code_equipement, equipement.nom, equipement.marque, equipement.description_technique]))),
+}
+
+
+def creer_index_fts5(apps, schema_editor):
+    # Index plein texte propre à SQLite ; les autres bases utilisent MoteurRecherche (LIKE)
+    if schema_editor.connection.vendor == 'sqlite':
+        for sql in SQL_FTS5_CREATION:
+            schema_editor.execute(sql)
+
+
+def supprimer_index_fts5(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        for sql in SQL_FTS5_SUPPRESSION:
+            schema_editor.execute(sql)
+
+
+def remplir_index(apps, schema_editor, taille_lot=2000):
+    EntreeRecherche = apps.get_model('maintenance', 'EntreeRecherche')
+    for type_objet, (nom_modele, contenu) in CONTENUS.items():
+        lot = []
+        for objet in apps.get_model('maintenance', nom_modele).objects.order_by().iterator(chunk_size=taille_lot):
+            lot.append(EntreeRecherche(type_objet=type_objet, objet_id=str(objet.pk), contenu=contenu(objet)))
+            if len(lot) >= taille_lot:
+                EntreeRecherche.objects.bulk_create(lot)
+                lot = []
+        EntreeRecherche.objects.bulk_create(lot)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('maintenance', '0013_index_filtres'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EntreeRecherche',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('type_objet', models.CharField(choices=[('LOG', 'Log'), ('DEMANDE', 'Demande'), ('INTERVENTION', 'Intervention'), ('EQUIPEMENT', 'Équipement')], max_length=20)),
+                ('objet_id', models.CharField(max_length=50)),
+                ('contenu', models.TextField()),
+            ],
+            options={
+                'verbose_name': 'Entrée de recherche',
+                'verbose_name_plural': 'Entrées de recherche',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='entreerecherche',
+            constraint=models.UniqueConstraint(fields=('type_objet', 'objet_id'), name='entree_recherche_unique'),
+        ),
+        migrations.RunPython(creer_index_fts5, supprimer_index_fts5),
+        migrations.RunPython(remplir_index, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.0 on 2026-10-17 22:19
+
+from django.db import migrations, models
+
+
+# Copie de models.squelette_code telle qu'à cette migration (le code de l'app peut évoluer)
+CONFUSIONS_CODE = str.maketrans('OQILZSGB', '00112568')
+
+
+def squelette_code(code):
+    return ''.join(c for c in (code or '').upper() if c.isalnum()).translate(CONFUSIONS_CODE)
+
+
+def remplir_squelettes(apps, schema_editor):
+    Equipement = apps.get_model('maintenance', 'Equipement')
+    lot = []
+    for equipement in Equipement.objects.only('code_equipement').iterator(chunk_size=2000):
+        equipement.code_squelette = squelette_code(equipement.code_equipement)
+        lot.append(equipement)
+        if len(lot) >= 2000:
+            Equipement.objects.bulk_update(lot, ['code_squelette'])
+            lot = []
+    Equipement.objects.bulk_update(lot, ['code_squelette'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('maintenance', '0014_recherche'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='equipement',
+            name='code_squelette',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=50),
+        ),
+        migrations.RunPython(remplir_squelettes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.0 on 2026-10-17 22:24
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('maintenance', '0015_equipement_code_squelette'),
+    ]
+
+    # auto_now_add -> default : même colonne en base. SQLite reconstruirait toute la table
+    # pour un AlterField, le changement ne porte donc que sur l'état des modèles.
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AlterField(
+                    model_name='logaction',
+                    name='date_action',
+                    field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+                ),
+            ],
+        ),
+    ]
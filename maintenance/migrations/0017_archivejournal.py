@@ -0,0 +1,29 @@
+# Generated by Django 5.0 on 2026-10-17 22:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('maintenance', '0016_date_action_horodatee_a_l_action'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchiveJournal',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('mois', models.DateField(unique=True)),
+                ('fichier', models.CharField(max_length=255)),
+                ('nb_entrees', models.PositiveIntegerField(default=0)),
+                ('taille', models.PositiveBigIntegerField(default=0)),
+                ('date_archivage', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Archive du journal',
+                'verbose_name_plural': 'Archives du journal',
+                'ordering': ['-mois'],
+            },
+        ),
+    ]
@@ -0,0 +1,66 @@
+# Generated by Django 5.0 on 2026-10-17 22:34
+
+from collections import Counter
+
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import Trunc
+from django.utils import timezone
+
+
+# Copie de statistiques.calculer_activite telle qu'à cette migration (le code de l'app peut évoluer)
+CHAMPS_ACTIVITE = ('periode', 'debut', 'action', 'id_utilisateur', 'role')
+
+
+def calculer_activite(logs):
+    activite = Counter()
+    lignes = logs.annotate(heure=Trunc('date_action', 'hour')).values_list(
+        'heure', 'action', 'utilisateur_id', 'utilisateur__role'
+    ).annotate(nb=Count('pk')).order_by()
+    for heure, action, utilisateur_id, role, nb in lignes:
+        heure = timezone.localtime(heure).replace(minute=0, second=0, microsecond=0)
+        jour = heure.replace(hour=0)
+        activite[('HEURE', heure, action, utilisateur_id or 0, role or '')] += nb
+        activite[('JOUR', jour, action, utilisateur_id or 0, role or '')] += nb
+    return activite
+
+
+def remplir_activite(apps, schema_editor):
+    # Mois déjà archivés : `manage.py reconstruire_activite` les relit dans leurs fichiers
+    LogAction = apps.get_model('maintenance', 'LogAction')
+    ActiviteJournal = apps.get_model('maintenance', 'ActiviteJournal')
+    ActiviteJournal.objects.bulk_create([
+        ActiviteJournal(nombre=nombre, **dict(zip(CHAMPS_ACTIVITE, cle)))
+        for cle, nombre in calculer_activite(LogAction.objects.all()).items()
+    ], batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('maintenance', '0017_archivejournal'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ActiviteJournal',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('periode', models.CharField(choices=[('HEURE', 'Heure'), ('JOUR', 'Jour')], max_length=10)),
+                ('debut', models.DateTimeField()),
+                ('action', models.CharField(choices=[('DEMANDE_CREATION', 'Création de demande'), ('DEMANDE_MODIFICATION', 'Modification de demande'), ('DEMANDE_SUPPRESSION', 'Suppression de demande'), ('DEMANDE_VALIDATION', 'Validation de réparation'), ('DEMANDE_REFUS', 'Refus de réparation'), ('INTERVENTION_CREATION', "Création de rapport d'intervention"), ('INTERVENTION_MODIFICATION', 'Modification de rapport'), ('STATUT_CHANGE', 'Changement de statut'), ('FICHIER_UPLOAD', 'Upload de fichier'), ('ASSIGNATION', 'Assignation de technicien'), ('EQUIPEMENT_CREATION', "Création d'équipement"), ('EQUIPEMENT_MODIFICATION', "Modification d'équipement"), ('EQUIPEMENT_SUPPRESSION', "Suppression d'équipement"), ('FICHIER_SUPPRESSION', 'Suppression de fichier'), ('IMPORT_CSV', 'Import CSV'), ('EXPORT_CSV', 'Export CSV'), ('EXPORT_PDF', 'Export PDF'), ('EXPORT_WORD', 'Export Word')], max_length=50)),
+                ('id_utilisateur', models.PositiveIntegerField(default=0)),
+                ('role', models.CharField(blank=True, max_length=20)),
+                ('nombre', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Activité du journal',
+                'verbose_name_plural': 'Activité du journal',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='activitejournal',
+            constraint=models.UniqueConstraint(fields=('periode', 'debut', 'action', 'id_utilisateur', 'role'), name='activite_journal_unique'),
+        ),
+        migrations.RunPython(remplir_activite, migrations.RunPython.noop),
+    ]
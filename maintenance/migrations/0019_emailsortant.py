@@ -0,0 +1,39 @@
+# Generated by Django 5.0 on 2026-10-17 22:36
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('maintenance', '0018_activitejournal'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EmailSortant',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sujet', models.CharField(max_length=255)),
+                ('message', models.TextField()),
+                ('destinataires', models.JSONField(default=list)),
+                ('statut', models.CharField(choices=[('EN_ATTENTE', 'En attente'), ('EN_COURS', "En cours d'envoi"), ('ENVOYE', 'Envoyé'), ('ECHEC', 'Échec définitif')], default='EN_ATTENTE', max_length=20)),
+                ('tentatives', models.PositiveIntegerField(default=0)),
+                ('prochain_essai', models.DateTimeField(default=django.utils.timezone.now)),
+                ('jeton', models.CharField(blank=True, max_length=32)),
+                ('date_reservation', models.DateTimeField(blank=True, null=True)),
+                ('derniere_erreur', models.TextField(blank=True)),
+                ('date_creation', models.DateTimeField(auto_now_add=True)),
+                ('date_envoi', models.DateTimeField(blank=True, null=True)),
+                ('demande', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='emails', to='maintenance.demandemaintenance')),
+            ],
+            options={
+                'verbose_name': 'Email sortant',
+                'verbose_name_plural': 'Emails sortants',
+                'ordering': ['-date_creation'],
+                'indexes': [models.Index(fields=['statut', 'prochain_essai'], name='email_statut_essai_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.0 on 2026-10-17 22:39
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('maintenance', '0019_emailsortant'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Notification',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('evenement', models.CharField(choices=[('ASSIGNEE', 'Demande assignée'), ('TERMINEE', 'Réparation terminée'), ('REFUSEE', 'Réparation refusée')], max_length=20)),
+                ('date_creation', models.DateTimeField(auto_now_add=True)),
+                ('demande', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='notifications', to='maintenance.demandemaintenance')),
+                ('destinataire', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='notifications', to=settings.AUTH_USER_MODEL)),
+                ('email', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='notifications', to='maintenance.emailsortant')),
+            ],
+            options={
+                'verbose_name': 'Notification',
+                'verbose_name_plural': 'Notifications',
+                'ordering': ['date_creation'],
+                'indexes': [models.Index(condition=models.Q(('email__isnull', True)), fields=['destinataire', 'date_creation'], name='notif_attente_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.0 on 2026-10-17 22:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('maintenance', '0020_notification'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='fichierintervention',
+            name='apercu',
+            field=models.FileField(blank=True, editable=False, upload_to='interventions/derives/%Y/%m/'),
+        ),
+        migrations.AddField(
+            model_name='fichierintervention',
+            name='derives_date',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='fichierintervention',
+            name='derives_statut',
+            field=models.CharField(choices=[('AUCUN', 'Aucune (pas une image)'), ('EN_ATTENTE', 'En attente'), ('EN_COURS', 'En cours'), ('TERMINE', 'Générées'), ('ECHEC', 'Échec')], default='AUCUN', editable=False, max_length=20, verbose_name='Miniatures'),
+        ),
+        migrations.AddField(
+            model_name='fichierintervention',
+            name='miniature',
+            field=models.FileField(blank=True, editable=False, upload_to='interventions/derives/%Y/%m/'),
+        ),
+        migrations.AddIndex(
+            model_name='fichierintervention',
+            index=models.Index(condition=models.Q(('derives_statut__in', ['EN_ATTENTE', 'EN_COURS'])), fields=['derives_statut'], name='fichier_derives_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0 on 2026-10-17 23:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('maintenance', '0021_derives_fichier'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='exportjob',
+            name='type_export',
+            field=models.CharField(choices=[('LOGS_PDF', "Logs d'actions (PDF)"), ('DEMANDES_PDF', 'Demandes de maintenance (PDF)'), ('INTERVENTION_PDF', "Rapport d'intervention (PDF)"), ('INTERVENTION_WORD', "Rapport d'intervention (Word)"), ('INTERVENTIONS_ZIP', "Rapports d'intervention (ZIP)")], max_length=30),
+        ),
+    ]
@@ -1,7 +1,11 @@
 from django.db import models
+from django.db.models import Count, F, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
 from django.contrib.auth.models import AbstractUser
 from django.core.validators import MinValueValidator
+from django.utils import timezone
 from decimal import Decimal
+import hashlib
 
 class User(AbstractUser):
     """Utilisateur personnalisé avec rôles"""
@@ -64,6 +68,22 @@ class CategorieEquipement(models.Model):
         return self.nom
 
 
+def empreinte_equipement(nom, marque, date_acquisition, description_technique, bureau_id, categorie_id):
+    """Empreinte SHA-256 des champs normalisés d'un équipement (détection des lignes inchangées à l'import)"""
+    valeurs = [nom, marque, date_acquisition, description_technique, bureau_id, categorie_id]
+    texte = '\x1f'.join('' if v is None else str(v).strip() for v in valeurs)
+    return hashlib.sha256(texte.encode('utf-8')).hexdigest()
+
+
+# Caractères confondus à la saisie ou au scan d'un code (lettre lue pour un chiffre)
+CONFUSIONS_CODE = str.maketrans('OQILZSGB', '00112568')
+
+
+def squelette_code(code):
+    """Forme normalisée d'un code pour tolérer les fautes : majuscules, sans séparateurs, O->0, I/L->1..."""
+    return ''.join(c for c in (code or '').upper() if c.isalnum()).translate(CONFUSIONS_CODE)
+
+
 class Equipement(models.Model):
     """Équipement informatique de l'inventaire"""
     code_equipement = models.CharField(max_length=50, unique=True, primary_key=True)
@@ -73,6 +93,8 @@ class Equipement(models.Model):
     description_technique = models.TextField(blank=True, null=True)
     bureau = models.ForeignKey(Bureau, on_delete=models.SET_NULL, null=True, related_name='equipements')
     categorie = models.ForeignKey(CategorieEquipement, on_delete=models.SET_NULL, null=True, related_name='equipements')
+    empreinte = models.CharField(max_length=64, blank=True, editable=False)
+    code_squelette = models.CharField(max_length=50, blank=True, db_index=True, editable=False)
     
     class Meta:
         verbose_name = 'Équipement'
@@ -82,6 +104,19 @@ class Equipement(models.Model):
     def __str__(self):
         return f"{self.code_equipement} - {self.nom}"
 
+    def calculer_empreinte(self):
+        """Empreinte des valeurs actuelles de l'équipement"""
+        return empreinte_equipement(self.nom, self.marque, self.date_acquisition,
+                                    self.description_technique, self.bureau_id, self.categorie_id)
+
+    def save(self, *args, **kwargs):
+        """Tient l'empreinte et le squelette du code à jour à chaque modification"""
+        self.empreinte = self.calculer_empreinte()
+        self.code_squelette = squelette_code(self.code_equipement)
+        if kwargs.get('update_fields') is not None:
+            kwargs['update_fields'] = set(kwargs['update_fields']) | {'empreinte', 'code_squelette'}
+        super().save(*args, **kwargs)
+
 
 class DemandeMaintenance(models.Model):
     """Demande de maintenance soumise par un employé"""
@@ -99,6 +134,9 @@ class DemandeMaintenance(models.Model):
         ('VALIDEE', 'Validée'),
         ('REFUSEE', 'Refusée'),
     ]
+
+    # Statuts pour lesquels l'équipement est considéré en maintenance
+    STATUTS_ACTIFS = ['EN_ATTENTE', 'ASSIGNEE', 'EN_COURS', 'TERMINEE']
     
     equipement = models.ForeignKey(Equipement, on_delete=models.CASCADE, related_name='demandes')
     employe = models.ForeignKey(User, on_delete=models.CASCADE, related_name='demandes_creees', limit_choices_to={'role': 'EMPLOYE'})
@@ -114,6 +152,17 @@ class DemandeMaintenance(models.Model):
         verbose_name = 'Demande de maintenance'
         verbose_name_plural = 'Demandes de maintenance'
         ordering = ['-date_creation']
+        # Un index par filtre de FiltreDemandeForm et par tableau de bord, suivi du tri
+        # des listes : la base lit la page dans l'ordre de l'index, sans tri.
+        indexes = [
+            models.Index(fields=['-date_creation'], name='demande_date_idx'),
+            models.Index(fields=['statut', '-date_creation'], name='demande_statut_date_idx'),
+            models.Index(fields=['urgence', '-date_creation'], name='demande_urgence_date_idx'),
+            # Partiel : les demandes non assignées n'apparaissent jamais dans un filtre par technicien
+            models.Index(fields=['technicien', '-date_creation'], condition=Q(technicien__isnull=False),
+                         name='demande_technicien_date_idx'),
+            models.Index(fields=['employe', '-date_creation'], name='demande_employe_date_idx'),
+        ]
     
     def __str__(self):
         return f"Demande #{self.pk} - {self.equipement.code_equipement} ({self.get_statut_display()})"
@@ -131,6 +180,33 @@ class DemandeMaintenance(models.Model):
         return self.statut == 'TERMINEE'
 
 
+MONTANT = models.DecimalField(max_digits=12, decimal_places=2)
+
+
+class InterventionQuerySet(models.QuerySet):
+    """Totaux des pièces et des fichiers recalculés par la base (sous-requêtes corrélées)"""
+
+    @staticmethod
+    def _cout_pieces():
+        pieces = PieceRechange.objects.filter(intervention=OuterRef('pk')).order_by().values(
+            'intervention').annotate(total=Sum(F('prix_unitaire') * F('quantite'), output_field=MONTANT)).values('total')
+        return Coalesce(Subquery(pieces, output_field=MONTANT), Value(Decimal('0.00')), output_field=MONTANT)
+
+    @staticmethod
+    def _nb_fichiers():
+        fichiers = FichierIntervention.objects.filter(intervention=OuterRef('pk')).order_by().values(
+            'intervention').annotate(nb=Count('pk')).values('nb')
+        return Coalesce(Subquery(fichiers, output_field=models.IntegerField()), 0)
+
+    def avec_totaux_calcules(self):
+        """Annote cout_total_calcule et nb_fichiers_calcule (pour contrôler les champs stockés)"""
+        return self.annotate(cout_total_calcule=self._cout_pieces(), nb_fichiers_calcule=self._nb_fichiers())
+
+    def recalculer_totaux(self):
+        """Réécrit cout_total et nb_fichiers en une seule requête UPDATE"""
+        return self.update(cout_total=self._cout_pieces(), nb_fichiers=self._nb_fichiers())
+
+
 class Intervention(models.Model):
     """Rapport d'intervention du technicien"""
     TYPE_REPARATION_CHOICES = [
@@ -142,18 +218,37 @@ class Intervention(models.Model):
     details = models.TextField()
     type_reparation = models.CharField(max_length=20, choices=TYPE_REPARATION_CHOICES, default='INTERNE')
     date_intervention = models.DateTimeField(auto_now_add=True)
+    # Totaux dénormalisés, tenus à jour par les signaux des pièces et des fichiers (signals.py)
+    cout_total = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal('0.00'),
+                                     db_index=True, editable=False)
+    nb_fichiers = models.PositiveIntegerField(default=0, editable=False)
+
+    objects = InterventionQuerySet.as_manager()
     
     class Meta:
         verbose_name = 'Intervention'
         verbose_name_plural = 'Interventions'
         ordering = ['-date_intervention']
+        indexes = [
+            models.Index(fields=['-date_intervention'], name='intervention_date_idx'),
+            models.Index(fields=['type_reparation', '-date_intervention'], name='intervention_type_date_idx'),
+        ]
     
     def __str__(self):
         return f"Intervention #{self.pk} - Demande #{self.demande.pk}"
     
+    def save(self, *args, **kwargs):
+        """N'écrase pas les totaux : ils ne sont écrits que par recalculer_totaux()"""
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                f.name for f in self._meta.concrete_fields
+                if not f.primary_key and f.name not in ('cout_total', 'nb_fichiers')
+            ]
+        super().save(*args, **kwargs)
+
     def cout_total_pieces(self):
-        """Calcule le coût total des pièces utilisées"""
-        return sum(piece.cout_total() for piece in self.pieces.all())
+        """Coût total des pièces utilisées (champ dénormalisé cout_total)"""
+        return self.cout_total
 
 
 class PieceRechange(models.Model):
@@ -187,6 +282,8 @@ class FichierIntervention(models.Model):
     ('AUTRE', 'Autre Document'),
     ]
 
+    EXTENSIONS_IMAGES = ['jpg', 'jpeg', 'png', 'gif', 'bmp']
+
     intervention = models.ForeignKey(Intervention, on_delete=models.CASCADE, related_name='fichiers')
     fichier = models.FileField(upload_to='interventions/%Y/%m/', verbose_name='Fichier')
     type_fichier = models.CharField(max_length=20, choices=TYPE_FICHIER_CHOICES, default='AUTRE', verbose_name='Type de fichier')
@@ -195,27 +292,61 @@ class FichierIntervention(models.Model):
     ajoute_par = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, verbose_name='Ajouté par')
     taille = models.PositiveIntegerField(default=0, verbose_name='Taille (bytes)')
 
+    # Versions réduites des images, générées par `manage.py traiter_images` (voir images.py)
+    DERIVES_STATUT_CHOICES = [
+        ('AUCUN', 'Aucune (pas une image)'),
+        ('EN_ATTENTE', 'En attente'),
+        ('EN_COURS', 'En cours'),
+        ('TERMINE', 'Générées'),
+        ('ECHEC', 'Échec'),
+    ]
+    miniature = models.FileField(upload_to='interventions/derives/%Y/%m/', blank=True, editable=False)
+    apercu = models.FileField(upload_to='interventions/derives/%Y/%m/', blank=True, editable=False)
+    derives_statut = models.CharField(max_length=20, choices=DERIVES_STATUT_CHOICES, default='AUCUN',
+                                      editable=False, verbose_name='Miniatures')
+    derives_date = models.DateTimeField(null=True, blank=True, editable=False)  # Réservation par le worker
+
     class Meta:
         verbose_name = 'Fichier d\'intervention'
         verbose_name_plural = 'Fichiers d\'intervention'
         ordering = ['type_fichier', '-date_ajout']
+        indexes = [
+            models.Index(fields=['derives_statut'], condition=Q(derives_statut__in=['EN_ATTENTE', 'EN_COURS']),
+                         name='fichier_derives_idx'),
+        ]
 
     def __str__(self):
         return f"{self.get_type_fichier_display()} - {self.fichier.name}"
 
     def save(self, *args, **kwargs):
-        """Calcule la taille du fichier avant la sauvegarde"""
+        """Calcule la taille du fichier avant la sauvegarde ; une nouvelle image attend ses miniatures"""
         if self.fichier and not self.taille:
             self.taille = self.fichier.size
+        if self._state.adding and self.est_image():
+            self.derives_statut = 'EN_ATTENTE'
         super().save(*args, **kwargs)
 
+    def url_miniature(self):
+        """Image affichée dans les listes : la miniature, ou l'original tant qu'elle n'existe pas"""
+        return (self.miniature or self.fichier).url
+
+    def url_apercu(self):
+        """Image ouverte au clic : l'aperçu moyen, ou l'original"""
+        return (self.apercu or self.fichier).url
+
+    def supprimer_fichiers(self):
+        """Supprime du stockage l'original et ses versions réduites"""
+        for champ in (self.fichier, self.miniature, self.apercu):
+            if champ:
+                champ.delete(save=False)
+
     def extension(self):
         """Retourne l'extension du fichier"""
         return self.fichier.name.split('.')[-1].lower() if self.fichier else ''
 
     def est_image(self):
         """Vérifie si le fichier est une image"""
-        return self.extension() in ['jpg', 'jpeg', 'png', 'gif', 'bmp']
+        return self.extension() in self.EXTENSIONS_IMAGES
 
     def est_pdf(self):
         """Vérifie si le fichier est un PDF"""
@@ -283,13 +414,291 @@ class LogAction(models.Model):
     type_objet = models.CharField(max_length=50, blank=True)
     objet_id = models.PositiveIntegerField(null=True, blank=True)
     details = models.TextField(blank=True)
-    date_action = models.DateTimeField(auto_now_add=True)
+    # Horodatée à l'action, pas à l'écriture différée du journal (journal.py)
+    date_action = models.DateTimeField(default=timezone.now, editable=False)
     adresse_ip = models.GenericIPAddressField(null=True, blank=True)
     
     class Meta:
         verbose_name = 'Log d\'action'
         verbose_name_plural = 'Logs d\'actions'
         ordering = ['-date_action']
+        indexes = [
+            models.Index(fields=['-date_action'], name='log_date_idx'),
+            models.Index(fields=['utilisateur', '-date_action'], name='log_utilisateur_date_idx'),
+            models.Index(fields=['action', '-date_action'], name='log_action_date_idx'),
+        ]
     
     def __str__(self):
-        return f"{self.date_action.strftime('%Y-%m-%d %H:%M')} - {self.utilisateur} - {self.get_action_display()}"
\ No newline at end of file
+        return f"{self.date_action.strftime('%Y-%m-%d %H:%M')} - {self.utilisateur} - {self.get_action_display()}"
+
+
+class ActiviteJournal(models.Model):
+    """Nombre d'actions du journal par heure ou par jour, action et utilisateur (statistiques.py)
+
+    Incrémenté par l'écriture du journal (journal.ecrire_entrees) ; l'en-tête et le
+    graphique de la page des logs le lisent au lieu de compter LogAction. Les mois
+    archivés y restent comptés.
+    """
+    PERIODE_CHOICES = [
+        ('HEURE', 'Heure'),
+        ('JOUR', 'Jour'),
+    ]
+
+    periode = models.CharField(max_length=10, choices=PERIODE_CHOICES)
+    debut = models.DateTimeField()  # Début de l'heure ou du jour (heure locale)
+    action = models.CharField(max_length=50, choices=LogAction.TYPE_ACTION_CHOICES)
+    id_utilisateur = models.PositiveIntegerField(default=0)  # 0 : Système
+    role = models.CharField(max_length=20, blank=True)  # Rôle au moment de l'action
+    nombre = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name = 'Activité du journal'
+        verbose_name_plural = 'Activité du journal'
+        constraints = [
+            models.UniqueConstraint(fields=['periode', 'debut', 'action', 'id_utilisateur', 'role'],
+                                    name='activite_journal_unique'),
+        ]
+
+
+class ArchiveJournal(models.Model):
+    """Mois du journal retiré de LogAction, conservé dans un fichier JSON Lines compressé (journal.py)"""
+    mois = models.DateField(unique=True)  # Premier jour du mois
+    fichier = models.CharField(max_length=255)  # Relatif à JOURNAL_DOSSIER_ARCHIVES
+    nb_entrees = models.PositiveIntegerField(default=0)
+    taille = models.PositiveBigIntegerField(default=0)  # Octets, compressé
+    date_archivage = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = 'Archive du journal'
+        verbose_name_plural = 'Archives du journal'
+        ordering = ['-mois']
+
+    def __str__(self):
+        return f"Archive {self.mois.strftime('%m/%Y')} ({self.nb_entrees} actions)"
+
+
+class ImportJob(models.Model):
+    """Import CSV d'équipements exécuté en arrière-plan (commande traiter_imports)"""
+    STATUT_CHOICES = [
+        ('EN_ATTENTE', 'En attente'),
+        ('EN_COURS', 'En cours'),
+        ('TERMINE', 'Terminé'),
+        ('ECHEC', 'Échec'),
+    ]
+
+    fichier = models.FileField(upload_to='imports/%Y/%m/', verbose_name='Fichier CSV')
+    nom_fichier = models.CharField(max_length=255, verbose_name='Nom du fichier')
+    simulation = models.BooleanField(default=False, verbose_name='Simulation (aucune écriture)')
+    statut = models.CharField(max_length=20, choices=STATUT_CHOICES, default='EN_ATTENTE')
+    cree_par = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='imports')
+    date_creation = models.DateTimeField(auto_now_add=True)
+    date_debut = models.DateTimeField(null=True, blank=True)
+    date_fin = models.DateTimeField(null=True, blank=True)
+    date_maj = models.DateTimeField(auto_now=True)  # Battement de cœur du worker
+    lignes_total = models.PositiveIntegerField(default=0)
+    lignes_traitees = models.PositiveIntegerField(default=0)  # Point de reprise (lignes validées en base)
+    nb_crees = models.PositiveIntegerField(default=0)
+    nb_mis_a_jour = models.PositiveIntegerField(default=0)
+    nb_inchanges = models.PositiveIntegerField(default=0)
+    nb_erreurs = models.PositiveIntegerField(default=0)
+    nb_avertissements = models.PositiveIntegerField(default=0)
+    message = models.TextField(blank=True)
+
+    class Meta:
+        verbose_name = 'Import CSV'
+        verbose_name_plural = 'Imports CSV'
+        ordering = ['-date_creation']
+
+    def __str__(self):
+        return f"Import #{self.pk} - {self.nom_fichier} ({self.get_statut_display()})"
+
+    def progression(self):
+        """Pourcentage de lignes traitées"""
+        if not self.lignes_total:
+            return 100 if self.statut == 'TERMINE' else 0
+        return min(100, int(self.lignes_traitees * 100 / self.lignes_total))
+
+    def est_termine(self):
+        return self.statut in ['TERMINE', 'ECHEC']
+
+
+class ImportJobErreur(models.Model):
+    """Ligne rejetée (ou signalée) lors d'un import CSV"""
+    NIVEAU_CHOICES = [
+        ('ERREUR', 'Erreur'),
+        ('AVERTISSEMENT', 'Avertissement'),
+    ]
+
+    job = models.ForeignKey(ImportJob, on_delete=models.CASCADE, related_name='erreurs')
+    ligne = models.PositiveIntegerField()
+    niveau = models.CharField(max_length=20, choices=NIVEAU_CHOICES, default='ERREUR')
+    message = models.TextField()
+
+    class Meta:
+        verbose_name = 'Erreur d\'import'
+        verbose_name_plural = 'Erreurs d\'import'
+        ordering = ['ligne']
+
+    def __str__(self):
+        return f"Ligne {self.ligne}: {self.message}"
+
+
+class ExportJob(models.Model):
+    """Rapport volumineux généré en arrière-plan (commande traiter_exports)"""
+    TYPE_EXPORT_CHOICES = [
+        ('LOGS_PDF', 'Logs d\'actions (PDF)'),
+        ('DEMANDES_PDF', 'Demandes de maintenance (PDF)'),
+        ('INTERVENTION_PDF', 'Rapport d\'intervention (PDF)'),
+        ('INTERVENTION_WORD', 'Rapport d\'intervention (Word)'),
+        ('INTERVENTIONS_ZIP', 'Rapports d\'intervention (ZIP)'),
+    ]
+
+    STATUT_CHOICES = [
+        ('EN_ATTENTE', 'En attente'),
+        ('EN_COURS', 'En cours'),
+        ('TERMINE', 'Terminé'),
+        ('ECHEC', 'Échec'),
+    ]
+
+    type_export = models.CharField(max_length=30, choices=TYPE_EXPORT_CHOICES)
+    parametres = models.JSONField(default=dict, blank=True)  # Filtres de la page d'origine
+    statut = models.CharField(max_length=20, choices=STATUT_CHOICES, default='EN_ATTENTE')
+    fichier = models.FileField(upload_to='exports/%Y/%m/', blank=True)
+    demande_par = models.ForeignKey(User, on_delete=models.CASCADE, related_name='exports')
+    date_creation = models.DateTimeField(auto_now_add=True)
+    date_debut = models.DateTimeField(null=True, blank=True)
+    date_fin = models.DateTimeField(null=True, blank=True)
+    message = models.TextField(blank=True)
+
+    class Meta:
+        verbose_name = 'Export'
+        verbose_name_plural = 'Exports'
+        ordering = ['-date_creation']
+
+    def __str__(self):
+        return f"Export #{self.pk} - {self.get_type_export_display()} ({self.get_statut_display()})"
+
+    def est_termine(self):
+        return self.statut in ['TERMINE', 'ECHEC']
+
+
+class EmailSortant(models.Model):
+    """Email à envoyer, écrit dans la transaction qui le motive et envoyé par `manage.py envoyer_emails`"""
+    STATUT_CHOICES = [
+        ('EN_ATTENTE', 'En attente'),
+        ('EN_COURS', 'En cours d\'envoi'),
+        ('ENVOYE', 'Envoyé'),
+        ('ECHEC', 'Échec définitif'),
+    ]
+
+    sujet = models.CharField(max_length=255)
+    message = models.TextField()
+    destinataires = models.JSONField(default=list)
+    demande = models.ForeignKey(DemandeMaintenance, on_delete=models.SET_NULL, null=True, blank=True,
+                                related_name='emails')
+    statut = models.CharField(max_length=20, choices=STATUT_CHOICES, default='EN_ATTENTE')
+    tentatives = models.PositiveIntegerField(default=0)
+    prochain_essai = models.DateTimeField(default=timezone.now)
+    jeton = models.CharField(max_length=32, blank=True)  # Worker qui a réservé l'email
+    date_reservation = models.DateTimeField(null=True, blank=True)
+    derniere_erreur = models.TextField(blank=True)
+    date_creation = models.DateTimeField(auto_now_add=True)
+    date_envoi = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = 'Email sortant'
+        verbose_name_plural = 'Emails sortants'
+        ordering = ['-date_creation']
+        indexes = [
+            models.Index(fields=['statut', 'prochain_essai'], name='email_statut_essai_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.sujet} → {', '.join(self.destinataires)} ({self.get_statut_display()})"
+
+
+class Notification(models.Model):
+    """Évènement d'une demande à signaler par email ; en mode résumé, regroupé par destinataire"""
+    EVENEMENT_CHOICES = [
+        ('ASSIGNEE', 'Demande assignée'),
+        ('TERMINEE', 'Réparation terminée'),
+        ('REFUSEE', 'Réparation refusée'),
+    ]
+
+    destinataire = models.ForeignKey(User, on_delete=models.CASCADE, related_name='notifications')
+    demande = models.ForeignKey(DemandeMaintenance, on_delete=models.CASCADE, related_name='notifications')
+    evenement = models.CharField(max_length=20, choices=EVENEMENT_CHOICES)
+    date_creation = models.DateTimeField(auto_now_add=True)
+    # Email (individuel ou résumé) qui l'a signalée ; vide tant qu'elle est en attente
+    email = models.ForeignKey(EmailSortant, on_delete=models.CASCADE, null=True, blank=True,
+                              related_name='notifications')
+
+    class Meta:
+        verbose_name = 'Notification'
+        verbose_name_plural = 'Notifications'
+        ordering = ['date_creation']
+        indexes = [
+            models.Index(fields=['destinataire', 'date_creation'], condition=Q(email__isnull=True),
+                         name='notif_attente_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_evenement_display()} - Demande #{self.demande_id} → {self.destinataire}"
+
+
+class CompteurStatistique(models.Model):
+    """Compteur matérialisé du tableau de bord, tenu à jour par signaux (voir statistiques.py)
+
+    Une ligne par (portée, objet, indicateur, valeur), par exemple
+    (TECHNICIEN, 12, 'statut', 'EN_COURS') -> nombre de demandes en cours du technicien 12.
+    """
+    PORTEE_CHOICES = [
+        ('GLOBAL', 'Global'),
+        ('DIRECTION', 'Direction'),
+        ('TECHNICIEN', 'Technicien'),
+    ]
+
+    portee = models.CharField(max_length=20, choices=PORTEE_CHOICES)
+    objet_id = models.PositiveIntegerField(default=0)  # Direction ou technicien ; 0 pour GLOBAL
+    indicateur = models.CharField(max_length=30)  # demandes, statut, equipements, pannes_marque
+    valeur = models.CharField(max_length=100, blank=True)  # Code de statut, marque...
+    nombre = models.IntegerField(default=0)
+
+    class Meta:
+        verbose_name = 'Compteur statistique'
+        verbose_name_plural = 'Compteurs statistiques'
+        constraints = [
+            models.UniqueConstraint(fields=['portee', 'objet_id', 'indicateur', 'valeur'],
+                                    name='compteur_statistique_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.portee}#{self.objet_id} {self.indicateur} {self.valeur} = {self.nombre}"
+
+
+class EntreeRecherche(models.Model):
+    """Texte indexé d'un objet pour la recherche plein texte (voir recherche.py)
+
+    Alimentée par les signaux ; sur SQLite, la table virtuelle FTS5
+    maintenance_recherche_fts en est l'index, tenu à jour par triggers.
+    """
+    TYPE_OBJET_CHOICES = [
+        ('LOG', 'Log'),
+        ('DEMANDE', 'Demande'),
+        ('INTERVENTION', 'Intervention'),
+        ('EQUIPEMENT', 'Équipement'),
+    ]
+
+    type_objet = models.CharField(max_length=20, choices=TYPE_OBJET_CHOICES)
+    objet_id = models.CharField(max_length=50)  # Clé primaire de l'objet (code pour un équipement)
+    contenu = models.TextField()
+
+    class Meta:
+        verbose_name = 'Entrée de recherche'
+        verbose_name_plural = 'Entrées de recherche'
+        constraints = [
+            models.UniqueConstraint(fields=['type_objet', 'objet_id'], name='entree_recherche_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.type_objet}#{self.objet_id}"
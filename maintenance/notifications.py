@@ -0,0 +1,243 @@
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.db.models import Case, F, Min, Q, Value, When
+from django.utils import timezone
+
+from .models import EmailSortant, DemandeMaintenance, Notification
+
+
+# ============= FILE D'ENVOI DES EMAILS =============
+# Les vues n'appellent plus send_mail : elles écrivent un EmailSortant dans leur
+# transaction (il n'existe que si le changement qui le motive est validé). La commande
+# envoyer_emails les envoie par lots sur une seule connexion SMTP ; un échec est retenté
+# après EMAILS_DELAI_BASE, 2x, 4x... secondes, puis l'email passe en ECHEC au bout de
+# EMAILS_MAX_TENTATIVES (remis en file depuis l'admin).
+
+EMAILS_TAILLE_LOT = getattr(settings, 'EMAILS_TAILLE_LOT', 50)
+EMAILS_MAX_TENTATIVES = getattr(settings, 'EMAILS_MAX_TENTATIVES', 6)
+EMAILS_DELAI_BASE = getattr(settings, 'EMAILS_DELAI_BASE', 60)
+EMAILS_DELAI_MAX = getattr(settings, 'EMAILS_DELAI_MAX', 6 * 3600)
+
+# Email réservé par un worker arrêté avant de l'envoyer : repris après ce délai
+DELAI_ABANDON = timedelta(minutes=10)
+
+# Identifiants par requête (pk__in) : avec les deux paramètres par destinataire du Case
+# de envoyer_resumes, reste sous la limite de 999 paramètres de SQLite
+TAILLE_LOT_IDS = 300
+
+
+def mettre_en_file(sujet, message, destinataires, demande=None):
+    """Ajoute un email à la file d'envoi (dans la transaction en cours)"""
+    return EmailSortant.objects.create(sujet=sujet, message=message, destinataires=destinataires, demande=demande)
+
+
+# ============= NOTIFICATIONS DES DEMANDES =============
+# Par défaut, seule la fin de réparation est signalée, par un email immédiat à l'employé.
+# Avec NOTIFICATIONS_RESUME, chaque évènement (assignation, réparation terminée, réparation
+# refusée) devient une Notification en attente et `manage.py envoyer_resumes` (planifié)
+# envoie un seul email par destinataire au plus toutes les NOTIFICATIONS_FENETRE_HEURES.
+
+NOTIFICATIONS_RESUME = getattr(settings, 'NOTIFICATIONS_RESUME', False)
+NOTIFICATIONS_FENETRE_HEURES = getattr(settings, 'NOTIFICATIONS_FENETRE_HEURES', 24)
+
+SIGNATURE = """
+Cordialement,
+Service Maintenance EP Mostaganem
+"""
+
+
+def destinataire_notification(demande, evenement):
+    """L'employé apprend que sa demande est terminée ; le technicien, qu'elle lui est assignée ou refusée"""
+    return demande.employe_id if evenement == 'TERMINEE' else demande.technicien_id
+
+
+def texte_notification(notification):
+    """Ligne décrivant la notification (corps de l'email, ou ligne du résumé)"""
+    demande = notification.demande
+    code = demande.equipement_id
+    if notification.evenement == 'TERMINEE':
+        return (f"Votre demande de maintenance #{demande.pk} pour l'équipement {code} a été traitée et est "
+                f"maintenant terminée. Merci de vous connecter pour valider ou signaler un problème.")
+    if notification.evenement == 'ASSIGNEE':
+        return (f"La demande #{demande.pk} (équipement {code}, urgence {demande.get_urgence_display().lower()}) "
+                f"vous a été assignée.")
+    return f"L'employé a signalé un problème sur la réparation de la demande #{demande.pk} (équipement {code})."
+
+
+def email_notification(notification):
+    """Email individuel d'une notification (mode immédiat)"""
+    sujet = f"Demande #{notification.demande_id} - {notification.get_evenement_display()}"
+    message = f"""
+Bonjour {notification.destinataire.get_full_name()},
+
+{texte_notification(notification)}
+{SIGNATURE}"""
+    return EmailSortant(sujet=sujet, message=message, destinataires=[notification.destinataire.email],
+                        demande=notification.demande)
+
+
+def email_resume(destinataire, notifications):
+    """Email regroupant les notifications en attente d'un destinataire"""
+    lignes = '\n'.join(f"- {timezone.localtime(notification.date_creation):%d/%m/%Y %H:%M} : "
+                       f"{texte_notification(notification)}" for notification in notifications)
+    message = f"""
+Bonjour {destinataire.get_full_name()},
+
+Voici vos notifications depuis le dernier résumé :
+
+{lignes}
+{SIGNATURE}"""
+    return EmailSortant(sujet=f"Maintenance EP Mostaganem - {len(notifications)} notification(s)",
+                        message=message, destinataires=[destinataire.email])
+
+
+def notifier(demande, evenement):
+    """Enregistre un évènement de la demande (dans la transaction en cours)
+
+    L'email de fin de réparation n'est envoyé qu'une fois par demande. Les assignations et
+    refus ne sont signalés au technicien que dans les résumés.
+    """
+    if evenement != 'TERMINEE' and not NOTIFICATIONS_RESUME:
+        return None
+    destinataire_id = destinataire_notification(demande, evenement)
+    if destinataire_id is None:
+        return None
+    if evenement == 'TERMINEE':
+        if demande.email_envoye:
+            return None
+        if demande.notifications.filter(evenement='TERMINEE').filter(
+                Q(email__isnull=True) | Q(email__statut__in=['EN_ATTENTE', 'EN_COURS'])).exists():
+            return None  # Statut repassé à TERMINEE avant l'envoi de la première notification
+    notification = Notification(destinataire_id=destinataire_id, demande=demande, evenement=evenement)
+    if not NOTIFICATIONS_RESUME:
+        # Sans adresse, rien à envoyer (en mode résumé, vérifié par envoyer_resumes)
+        if not notification.destinataire.email:
+            return None
+        notification.email = email_notification(notification)
+        notification.email.save()
+    notification.save()
+    return notification
+
+
+def envoyer_resumes(fenetre_heures=None, tous=False):
+    """Met en file un résumé par destinataire dont la plus ancienne notification a dépassé la fenêtre
+
+    Nombre de requêtes fixe quel que soit le volume : notifications (avec destinataires,
+    demandes et équipements), insertion des emails, rattachement des notifications.
+    Retourne le nombre de résumés mis en file.
+    """
+    fenetre_heures = NOTIFICATIONS_FENETRE_HEURES if fenetre_heures is None else fenetre_heures
+    en_attente = Notification.objects.filter(email__isnull=True)
+    if not tous:
+        limite = timezone.now() - timedelta(hours=fenetre_heures)
+        en_attente = en_attente.filter(destinataire__in=en_attente.values('destinataire').annotate(
+            premiere=Min('date_creation')).filter(premiere__lte=limite).values('destinataire'))
+
+    with transaction.atomic():
+        par_destinataire = {}
+        for notification in en_attente.select_related('destinataire', 'demande').select_for_update().order_by(
+                'destinataire_id', 'date_creation'):
+            par_destinataire.setdefault(notification.destinataire, []).append(notification)
+        if not par_destinataire:
+            return 0
+
+        sans_adresse = [n.pk for destinataire, liste in par_destinataire.items() if not destinataire.email
+                        for n in liste]
+        for debut in range(0, len(sans_adresse), TAILLE_LOT_IDS):
+            Notification.objects.filter(pk__in=sans_adresse[debut:debut + TAILLE_LOT_IDS]).delete()
+        resumes = {destinataire.pk: email_resume(destinataire, notifications)
+                   for destinataire, notifications in par_destinataire.items() if destinataire.email}
+        if not resumes:
+            return 0
+        EmailSortant.objects.bulk_create(resumes.values())
+        a_rattacher = [n for notifications in par_destinataire.values() for n in notifications
+                       if n.destinataire_id in resumes]
+        for debut in range(0, len(a_rattacher), TAILLE_LOT_IDS):
+            lot = a_rattacher[debut:debut + TAILLE_LOT_IDS]
+            emails = {n.destinataire_id: resumes[n.destinataire_id].pk for n in lot}
+            Notification.objects.filter(email__isnull=True, pk__in=[n.pk for n in lot]).update(
+                email=Case(*[When(destinataire_id=pk, then=Value(email_id)) for pk, email_id in emails.items()]))
+    return len(resumes)
+
+
+# ============= ENVOI =============
+
+def delai_nouvel_essai(tentatives):
+    """Attente avant la tentative suivante : EMAILS_DELAI_BASE doublé à chaque échec, plafonné"""
+    return timedelta(seconds=min(EMAILS_DELAI_BASE * 2 ** (tentatives - 1), EMAILS_DELAI_MAX))
+
+
+def reserver_emails(taille_lot=EMAILS_TAILLE_LOT):
+    """Réserve un lot d'emails à envoyer (dus, ou abandonnés par un worker arrêté)
+
+    Un seul UPDATE marque le lot avec le jeton du worker : deux workers ne peuvent pas
+    réserver le même email.
+    """
+    maintenant = timezone.now()
+    a_envoyer = Q(statut='EN_ATTENTE', prochain_essai__lte=maintenant) | Q(
+        statut='EN_COURS', date_reservation__lt=maintenant - DELAI_ABANDON)
+    candidats = list(EmailSortant.objects.filter(a_envoyer).order_by('prochain_essai').values_list(
+        'pk', flat=True)[:taille_lot])
+    if not candidats:
+        return []
+    jeton = uuid.uuid4().hex
+    EmailSortant.objects.filter(a_envoyer, pk__in=candidats).update(
+        statut='EN_COURS', jeton=jeton, date_reservation=maintenant)
+    return list(EmailSortant.objects.filter(statut='EN_COURS', jeton=jeton).order_by('prochain_essai'))
+
+
+def envoyer_lot(emails):
+    """Envoie des emails réservés sur une seule connexion ; retourne (envoyés, échecs)"""
+    envoyes, echecs = [], []
+    connexion = get_connection()
+    try:
+        connexion.open()
+        for email in emails:
+            try:
+                EmailMessage(email.sujet, email.message, settings.DEFAULT_FROM_EMAIL, email.destinataires,
+                             connection=connexion).send()
+            except Exception as e:
+                echecs.append((email, e))
+            else:
+                envoyes.append(email)
+    except Exception as e:
+        # Serveur injoignable : tout le reste du lot est à retenter
+        traites = {email.pk for email in envoyes} | {email.pk for email, _ in echecs}
+        echecs += [(email, e) for email in emails if email.pk not in traites]
+    finally:
+        connexion.close()
+
+    maintenant = timezone.now()
+    for debut in range(0, len(envoyes), TAILLE_LOT_IDS):
+        lot = envoyes[debut:debut + TAILLE_LOT_IDS]
+        EmailSortant.objects.filter(pk__in=[email.pk for email in lot]).update(
+            statut='ENVOYE', tentatives=F('tentatives') + 1, date_envoi=maintenant, derniere_erreur='')
+        DemandeMaintenance.objects.filter(
+            notifications__email__in=lot, notifications__evenement='TERMINEE'
+        ).update(email_envoye=True)
+    for email, erreur in echecs:
+        email.tentatives += 1
+        email.derniere_erreur = f"{type(erreur).__name__}: {erreur}"
+        if email.tentatives >= EMAILS_MAX_TENTATIVES:
+            email.statut = 'ECHEC'
+        else:
+            email.statut = 'EN_ATTENTE'
+            email.prochain_essai = maintenant + delai_nouvel_essai(email.tentatives)
+        email.save(update_fields=['tentatives', 'derniere_erreur', 'statut', 'prochain_essai'])
+    return len(envoyes), len(echecs)
+
+
+def traiter_emails(taille_lot=EMAILS_TAILLE_LOT):
+    """Envoie tous les emails dus, lot par lot ; retourne (envoyés, échecs)"""
+    total_envoyes = total_echecs = 0
+    while True:
+        emails = reserver_emails(taille_lot)
+        if not emails:
+            return total_envoyes, total_echecs
+        envoyes, echecs = envoyer_lot(emails)
+        total_envoyes += envoyes
+        total_echecs += echecs
@@ -0,0 +1,119 @@
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+
+# ============= PAGINATION PAR CURSEUR =============
+# Remplace Paginator (OFFSET + COUNT) sur les grandes listes : chaque page est lue
+# dans l'index (date, id) à partir de la dernière ligne affichée, en temps constant
+# quelle que soit la profondeur. Les liens restent stables quand des lignes sont
+# ajoutées en tête de liste.
+
+class PageCurseur:
+    """Page de résultats avec les liens vers les pages voisines
+
+    Itérable comme une Page de Paginator ; les gabarits utilisent url_premiere,
+    url_precedente, url_suivante et url_derniere.
+    """
+
+    def __init__(self, object_list, parametres, champ, precedente, suivante):
+        self.object_list = object_list
+        self.parametres = parametres
+        self.champ = champ
+        self._precedente = precedente
+        self._suivante = suivante
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __bool__(self):
+        return bool(self.object_list)
+
+    def has_previous(self):
+        return self._precedente
+
+    def has_next(self):
+        return self._suivante
+
+    def has_other_pages(self):
+        return self._precedente or self._suivante
+
+    def _url(self, **curseur):
+        parametres = self.parametres.copy()
+        for cle in ('apres', 'avant', 'page'):
+            parametres.pop(cle, None)
+        parametres.update(curseur)
+        return '?' + parametres.urlencode()
+
+    def url_premiere(self):
+        return self._url()
+
+    def url_derniere(self):
+        return self._url(avant='fin')
+
+    def url_precedente(self):
+        return self._url(avant=encoder_curseur(self.object_list[0], self.champ))
+
+    def url_suivante(self):
+        return self._url(apres=encoder_curseur(self.object_list[-1], self.champ))
+
+
+def encoder_curseur(objet, champ):
+    """Curseur "<date ISO>_<pk>" d'une ligne"""
+    return f"{getattr(objet, champ).isoformat()}_{objet.pk}"
+
+
+def decoder_curseur(queryset, champ, curseur):
+    """(valeur, pk) d'un curseur, None s'il est absent ou invalide"""
+    valeur, _, pk = (curseur or '').rpartition('_')
+    try:
+        return queryset.model._meta.get_field(champ).to_python(valeur), int(pk)
+    except (ValidationError, ValueError):
+        return None
+
+
+def paginer_par_curseur(request, queryset, champ, par_page=20):
+    """Page de queryset triée par (champ, pk) décroissants, selon ?apres= / ?avant=
+
+    champ doit être indexé (un index sur champ seul suffit : l'identifiant y est inclus).
+    La borne champ <= valeur est répétée hors du OU pour que la base parte du curseur
+    dans l'index au lieu de le parcourir depuis le début.
+    Un curseur invalide ou ne menant à aucune ligne ramène à la première page.
+    """
+    parametres = request.GET.copy()
+    avant = parametres.get('avant')
+    curseur_apres = decoder_curseur(queryset, champ, parametres.get('apres'))
+    curseur_avant = decoder_curseur(queryset, champ, avant)
+
+    if avant == 'fin' or curseur_avant:
+        # Page précédente : lecture à l'envers depuis le curseur, puis remise dans l'ordre
+        lignes = queryset.order_by(champ, 'pk')
+        if curseur_avant:
+            valeur, pk = curseur_avant
+            lignes = lignes.filter(Q(**{f'{champ}__gt': valeur}) | Q(pk__gt=pk), **{f'{champ}__gte': valeur})
+        lignes = list(lignes[:par_page + 1])
+        if lignes:
+            precedente = len(lignes) > par_page
+            return PageCurseur(lignes[:par_page][::-1], parametres, champ, precedente, avant != 'fin')
+
+    elif curseur_apres:
+        valeur, pk = curseur_apres
+        lignes = queryset.order_by(f'-{champ}', '-pk')
+        lignes = lignes.filter(Q(**{f'{champ}__lt': valeur}) | Q(pk__lt=pk), **{f'{champ}__lte': valeur})
+        lignes = list(lignes[:par_page + 1])
+        if lignes:
+            return PageCurseur(lignes[:par_page], parametres, champ, True, len(lignes) > par_page)
+
+    lignes = list(queryset.order_by(f'-{champ}', '-pk')[:par_page + 1])
+    return PageCurseur(lignes[:par_page], parametres, champ, False, len(lignes) > par_page)
+
+
+def estimer_total(queryset, plafond=10000):
+    """Nombre de lignes compté jusqu'à plafond seulement : (nombre, plafond_atteint)
+
+    Le COUNT s'arrête après plafond + 1 lignes au lieu de parcourir toute la table.
+    """
+    nombre = queryset.order_by().values('pk')[:plafond + 1].count()
+    return min(nombre, plafond), nombre > plafond
@@ -0,0 +1,788 @@
+import hashlib
+import multiprocessing
+import os
+import shutil
+import tempfile
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from itertools import chain
+from datetime import datetime, time, timedelta
+
+import django
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db.models import Q, Prefetch
+from django.db.models.functions import Left
+from django.utils import timezone
+from docx import Document
+from docx.enum.text import WD_ALIGN_PARAGRAPH
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4, landscape
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.lib.units import cm
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, Frame, PageTemplate
+
+from .forms import FiltreLogForm, FiltreDemandeForm, FiltreInterventionForm
+from .importation import par_lots
+from .models import ExportJob, LogAction, DemandeMaintenance, Intervention, PieceRechange
+from .recherche import moteur_recherche, mots_recherche, sans_accents
+
+
+# Au-delà de ce nombre de lignes, un export est généré en arrière-plan au lieu d'être renvoyé directement
+EXPORT_INLINE_MAX_LIGNES = getattr(settings, 'EXPORT_INLINE_MAX_LIGNES', 2000)
+
+# Lignes par tableau : un tableau par page garde une mise en page linéaire
+LOGS_PDF_LIGNES_PAR_PAGE = 30
+DEMANDES_PDF_LIGNES_PAR_PAGE = 25
+
+# Un export EN_COURS depuis ce délai est considéré comme abandonné par son worker
+DELAI_ABANDON = timedelta(minutes=30)
+
+# Les fichiers d'export sont supprimés après ce délai
+EXPORTS_CONSERVATION = timedelta(days=getattr(settings, 'EXPORTS_CONSERVATION_JOURS', 7))
+
+# Rapports d'intervention déjà générés (un dossier par intervention, sur le stockage des médias)
+DOSSIER_RAPPORTS_INTERVENTION = 'rapports/interventions'
+
+# À incrémenter quand la mise en page des rapports d'intervention change
+VERSION_RAPPORT_INTERVENTION = 1
+
+# Rapports absents du cache qu'une archive ZIP peut générer pendant la requête ;
+# au-delà, l'archive est construite par traiter_exports
+EXPORT_ZIP_INLINE_MAX_RAPPORTS = getattr(settings, 'EXPORT_ZIP_INLINE_MAX_RAPPORTS', 5)
+
+# Processus qui génèrent en parallèle les rapports manquants d'une archive ZIP construite
+# par traiter_exports (1 : génération dans le processus de l'export, sans pool)
+EXPORT_ZIP_PROCESSUS = getattr(settings, 'EXPORT_ZIP_PROCESSUS', 2)
+
+
+# ============= FILTRES =============
+
+def filtrer_logs(logs, form):
+    """Applique tous les champs de FiltreLogForm à un queryset de LogAction"""
+    if form.is_valid():
+        if form.cleaned_data.get('utilisateur'):
+            logs = logs.filter(utilisateur=form.cleaned_data['utilisateur'])
+        if form.cleaned_data.get('action'):
+            logs = logs.filter(action=form.cleaned_data['action'])
+        if form.cleaned_data.get('date_debut'):
+            logs = logs.filter(date_action__gte=form.cleaned_data['date_debut'])
+        if form.cleaned_data.get('date_fin'):
+            date_fin = datetime.combine(form.cleaned_data['date_fin'], time.max)
+            logs = logs.filter(date_action__lte=date_fin)
+        if form.cleaned_data.get('recherche'):
+            logs = moteur_recherche().filtrer(logs, 'LOG', form.cleaned_data['recherche'])
+    return logs
+
+
+def filtrer_logs_archives(lignes, form):
+    """Applique FiltreLogForm aux lignes d'un mois archivé (journal.lignes_archive)"""
+    if form.is_valid():
+        donnees = form.cleaned_data
+        if donnees.get('utilisateur'):
+            lignes = [ligne for ligne in lignes if ligne['utilisateur_id'] == donnees['utilisateur'].pk]
+        if donnees.get('action'):
+            lignes = [ligne for ligne in lignes if ligne['action'] == donnees['action']]
+        if donnees.get('date_debut'):
+            date_debut = timezone.make_aware(datetime.combine(donnees['date_debut'], time.min))
+            lignes = [ligne for ligne in lignes if ligne['date_action'] >= date_debut]
+        if donnees.get('date_fin'):
+            date_fin = timezone.make_aware(datetime.combine(donnees['date_fin'], time.max))
+            lignes = [ligne for ligne in lignes if ligne['date_action'] <= date_fin]
+        if donnees.get('recherche'):
+            mots = [sans_accents(mot) for mot in mots_recherche(donnees['recherche'])]
+            lignes = [ligne for ligne in lignes if all(mot in sans_accents(ligne['details']) for mot in mots)]
+    return lignes
+
+
+def filtrer_demandes(demandes, form):
+    """Applique tous les champs de FiltreDemandeForm à un queryset de DemandeMaintenance"""
+    if form.is_valid():
+        if form.cleaned_data.get('statut'):
+            demandes = demandes.filter(statut=form.cleaned_data['statut'])
+        if form.cleaned_data.get('urgence'):
+            demandes = demandes.filter(urgence=form.cleaned_data['urgence'])
+        if form.cleaned_data.get('technicien'):
+            demandes = demandes.filter(technicien=form.cleaned_data['technicien'])
+        if form.cleaned_data.get('date_debut'):
+            demandes = demandes.filter(date_creation__gte=form.cleaned_data['date_debut'])
+        if form.cleaned_data.get('date_fin'):
+            date_fin = datetime.combine(form.cleaned_data['date_fin'], time.max)
+            demandes = demandes.filter(date_creation__lte=date_fin)
+        if form.cleaned_data.get('code_equipement'):
+            demandes = demandes.filter(equipement__code_equipement__icontains=form.cleaned_data['code_equipement'])
+        if form.cleaned_data.get('categorie'):
+            demandes = demandes.filter(equipement__categorie=form.cleaned_data['categorie'])
+    return demandes
+
+
+def filtrer_interventions(interventions, form):
+    """Applique tous les champs de FiltreInterventionForm à un queryset d'Intervention"""
+    if form.is_valid():
+        if form.cleaned_data.get('technicien'):
+            interventions = interventions.filter(demande__technicien=form.cleaned_data['technicien'])
+        if form.cleaned_data.get('code_equipement'):
+            interventions = interventions.filter(demande__equipement__code_equipement__icontains=form.cleaned_data['code_equipement'])
+        if form.cleaned_data.get('type_reparation'):
+            interventions = interventions.filter(type_reparation=form.cleaned_data['type_reparation'])
+        if form.cleaned_data.get('date_debut'):
+            interventions = interventions.filter(date_intervention__gte=form.cleaned_data['date_debut'])
+        if form.cleaned_data.get('date_fin'):
+            date_fin = datetime.combine(form.cleaned_data['date_fin'], time.max)
+            interventions = interventions.filter(date_intervention__lte=date_fin)
+        if form.cleaned_data.get('cout_min') is not None:
+            interventions = interventions.filter(cout_total__gte=form.cleaned_data['cout_min'])
+        if form.cleaned_data.get('cout_max') is not None:
+            interventions = interventions.filter(cout_total__lte=form.cleaned_data['cout_max'])
+    return interventions
+
+
+# ============= MISE EN PAGE PROGRESSIVE =============
+
+class DocumentProgressif(SimpleDocTemplate):
+    """SimpleDocTemplate alimenté par un itérable (générateur) au lieu d'une liste
+
+    build() veut tous les éléments du document en mémoire avant de commencer ; construire()
+    met en page chaque élément dès qu'il est produit (handle_flowable), puis l'oublie :
+    seul le tableau de la page en cours est gardé, quel que soit le nombre de lignes.
+    """
+
+    def construire(self, elements):
+        # Mêmes modèles de page que SimpleDocTemplate.build()
+        self._calc()
+        cadre = Frame(self.leftMargin, self.bottomMargin, self.width, self.height, id='normal')
+        self.addPageTemplates([PageTemplate(id='First', frames=cadre, pagesize=self.pagesize),
+                               PageTemplate(id='Later', frames=cadre, pagesize=self.pagesize)])
+        self._startBuild()
+        self.canv._doctemplate = self
+        try:
+            for element in elements:
+                # handle_flowable remet en tête de liste ce qui n'a pas tenu sur la page
+                en_attente = [element]
+                while en_attente:
+                    self.clean_hanging()
+                    self.handle_flowable(en_attente)
+        finally:
+            del self.canv._doctemplate
+        self._endBuild()
+
+
+# ============= RAPPORT PDF DES LOGS =============
+
+STYLE_TABLE_LOGS = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+    ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, 0), 9),
+    ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+    ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+    ('GRID', (0, 0), (-1, -1), 1, colors.black),
+    ('FONTSIZE', (0, 1), (-1, -1), 8),
+])
+
+
+def generer_pdf_logs(logs, sortie):
+    """Écrit le rapport PDF d'un queryset de logs dans le fichier sortie
+
+    Les lignes sont lues par blocs (values_list) et découpées en un tableau
+    par page, avec l'en-tête répété : le coût de mise en page reste
+    proportionnel au nombre de lignes au lieu d'un unique tableau géant
+    redécoupé à chaque saut de page. Les tableaux sont produits au fil de la
+    mise en page (DocumentProgressif) : la mémoire ne dépend pas du volume.
+    """
+    doc = DocumentProgressif(sortie, pagesize=landscape(A4))
+    styles = getSampleStyleSheet()
+    introduction = [
+        Paragraph("RAPPORT DES LOGS D'ACTIONS", styles['Title']),
+        Spacer(1, 20),
+        Paragraph(f"Généré le {timezone.now().strftime('%d/%m/%Y à %H:%M')}", styles['Normal']),
+        Spacer(1, 20),
+    ]
+
+    actions = dict(LogAction.TYPE_ACTION_CHOICES)
+    valeurs = logs.annotate(details_courts=Left('details', 61)).values_list(
+        'date_action', 'utilisateur_id', 'utilisateur__first_name', 'utilisateur__last_name',
+        'action', 'details_courts',
+    )
+    lignes = (
+        [
+            date_action.strftime('%d/%m/%Y %H:%M'),
+            f"{prenom or ''} {nom or ''}".strip() if utilisateur_id else 'Système',
+            actions.get(action, action),
+            (details[:60] + '...') if len(details) > 60 else details,
+        ]
+        for date_action, utilisateur_id, prenom, nom, action, details in valeurs.iterator(chunk_size=2000)
+    )
+
+    entete = ['Date', 'Utilisateur', 'Action', 'Détails']
+    tables = (
+        Table([entete] + page, colWidths=[4*cm, 5*cm, 6*cm, 10*cm], repeatRows=1, style=STYLE_TABLE_LOGS)
+        for page in par_lots(lignes, LOGS_PDF_LIGNES_PAR_PAGE)
+    )
+    doc.construire(chain(introduction, tables))
+
+
+# ============= RAPPORT PDF DES DEMANDES =============
+
+STYLE_TABLE_DEMANDES = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+    ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, 0), 10),
+    ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+    ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+    ('GRID', (0, 0), (-1, -1), 1, colors.black),
+])
+
+
+def generer_pdf_demandes(demandes, sortie):
+    """Écrit le rapport PDF d'un queryset de demandes dans le fichier sortie (un tableau par page, au fil de l'eau)"""
+    doc = DocumentProgressif(sortie, pagesize=landscape(A4))
+    styles = getSampleStyleSheet()
+    introduction = [
+        Paragraph("Rapport des Demandes de Maintenance", styles['Title']),
+        Spacer(1, 20),
+    ]
+
+    urgences = dict(DemandeMaintenance.URGENCE_CHOICES)
+    statuts = dict(DemandeMaintenance.STATUT_CHOICES)
+    valeurs = demandes.values_list(
+        'pk', 'date_creation', 'equipement_id',
+        'employe__first_name', 'employe__last_name',
+        'technicien_id', 'technicien__first_name', 'technicien__last_name',
+        'urgence', 'statut',
+    )
+    lignes = (
+        [
+            str(pk),
+            date_creation.strftime('%Y-%m-%d'),
+            code_equipement,
+            f"{employe_prenom} {employe_nom}".strip(),
+            f"{technicien_prenom} {technicien_nom}".strip() if technicien_id else 'N/A',
+            urgences.get(urgence, urgence),
+            statuts.get(statut, statut),
+        ]
+        for (pk, date_creation, code_equipement, employe_prenom, employe_nom, technicien_id,
+             technicien_prenom, technicien_nom, urgence, statut) in valeurs.iterator(chunk_size=2000)
+    )
+
+    entete = ['ID', 'Date', 'Équipement', 'Employé', 'Technicien', 'Urgence', 'Statut']
+    tables = (
+        Table([entete] + page, colWidths=[1.5*cm, 2.5*cm, 3.5*cm, 4.5*cm, 4.5*cm, 3*cm, 3.5*cm], repeatRows=1,
+              style=STYLE_TABLE_DEMANDES)
+        for page in par_lots(lignes, DEMANDES_PDF_LIGNES_PAR_PAGE)
+    )
+    doc.construire(chain(introduction, tables))
+
+
+# ============= RAPPORTS D'INTERVENTION =============
+
+def interventions_pour_rapport():
+    """Interventions avec tout ce qu'affiche le rapport technique (jointures + pièces préchargées)"""
+    return Intervention.objects.select_related(
+        'demande__employe', 'demande__technicien',
+        'demande__equipement__categorie', 'demande__equipement__bureau',
+    ).prefetch_related(Prefetch('pieces', queryset=PieceRechange.objects.order_by('pk')))
+
+
+def generer_pdf_intervention(intervention, sortie):
+    """Écrit le rapport technique PDF d'une intervention dans le fichier sortie"""
+    doc = SimpleDocTemplate(sortie, pagesize=A4, rightMargin=2*cm, leftMargin=2*cm, topMargin=2*cm, bottomMargin=2*cm)
+    elements = []
+    styles = getSampleStyleSheet()
+    demande = intervention.demande
+    equipement = demande.equipement
+    pieces = list(intervention.pieces.all())
+
+    # Titre
+    title_style = ParagraphStyle(
+        'CustomTitle',
+        parent=styles['Heading1'],
+        fontSize=18,
+        textColor=colors.HexColor('#0d6efd'),
+        spaceAfter=20,
+        spaceBefore=20,
+        alignment=1  # Center
+    )
+    header_style = ParagraphStyle(
+        'CustomTitle',
+        parent=styles['Heading3'],
+        spaceAfter=20,
+        alignment=1  # Center
+    )
+
+    elements.append(Paragraph("REPUBLIQUE ALGERIENNE DEMOCRATIQUE POPULAIRE", header_style))
+    elements.append(Paragraph("MINISTERE DES TRANSPORTS", styles['Heading4']))
+    elements.append(Paragraph("GROUPE SERVICES PORTUAIRES « SERPORT SPA»", styles['Heading4']))
+    elements.append(Paragraph("ENTREPRISE PORTUAIRE DE MOSTAGANEM", styles['Heading4']))
+    elements.append(Paragraph("RAPPORT TECHNIQUE", title_style))
+    elements.append(Paragraph(f"Intervention #{intervention.pk}", styles['Heading2']))
+    elements.append(Spacer(1, 10))
+
+    # Informations générales
+    data = [
+        ['Date d\'intervention:', intervention.date_intervention.strftime('%d/%m/%Y à %H:%M')],
+        ['Type de réparation:', intervention.get_type_reparation_display()],
+        ['Demande associée:', f"#{demande.pk}"],
+        ['Demandeur:', demande.employe.get_full_name()],
+        ['Technicien:', demande.technicien.get_full_name()],
+    ]
+
+    table = Table(data, colWidths=[5*cm, 12*cm])
+    table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (0, -1), colors.lightgrey),
+        ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
+        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+        ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, -1), 10),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 12),
+        ('GRID', (0, 0), (-1, -1), 1, colors.black),
+    ]))
+    elements.append(table)
+    elements.append(Spacer(1, 10))
+
+    # Équipement
+    elements.append(Paragraph("ÉQUIPEMENT CONCERNÉ", styles['Heading3']))
+    data_eq = [
+        ['Code:', equipement.code_equipement],
+        ['Nom:', equipement.nom],
+        ['Marque:', equipement.marque],
+        ['Catégorie:', equipement.categorie.nom if equipement.categorie else '-'],
+        ['Bureau:', equipement.bureau.nom if equipement.bureau else '-'],
+    ]
+    table_eq = Table(data_eq, colWidths=[5*cm, 12*cm])
+    table_eq.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (0, -1), colors.lightblue),
+        ('GRID', (0, 0), (-1, -1), 1, colors.black),
+        ('FONTSIZE', (0, 0), (-1, -1), 10),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 12),
+    ]))
+    elements.append(table_eq)
+    elements.append(Spacer(1, 10))
+
+    # Détails intervention
+    elements.append(Paragraph("DÉTAILS DE L'INTERVENTION", styles['Heading3']))
+    details_style = ParagraphStyle('Details', parent=styles['BodyText'], fontSize=10, leading=14)
+    elements.append(Paragraph(intervention.details.replace('\n', '<br/>'), details_style))
+    elements.append(Spacer(1, 10))
+
+    # Pièces
+    if pieces:
+        elements.append(Paragraph("PIÈCES DE RECHANGE UTILISÉES", styles['Heading3']))
+        pieces_data = [['Nom', 'Prix Unitaire', 'Quantité', 'Total']]
+        for piece in pieces:
+            pieces_data.append([
+                piece.nom,
+                f"{piece.prix_unitaire} DA",
+                str(piece.quantite),
+                f"{piece.cout_total()} DA"
+            ])
+        pieces_data.append(['', '', 'TOTAL:', f"{intervention.cout_total_pieces()} DA"])
+
+        table_pieces = Table(pieces_data, colWidths=[8*cm, 3*cm, 3*cm, 3*cm])
+        table_pieces.setStyle(TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('GRID', (0, 0), (-1, -1), 1, colors.black),
+            ('BACKGROUND', (0, -1), (-1, -1), colors.lightgreen),
+            ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
+        ]))
+        elements.append(table_pieces)
+        elements.append(Spacer(1, 10))
+
+    data = [["VISA DE L'INFORMATICIEN", "VISA DE RESPONSABLE DE LA CELLULE"]]
+    # On définit la largeur des colonnes (ex: 250 points chacune)
+    t = Table(data, colWidths=[250, 250])
+
+    t.setStyle(TableStyle([
+        ('ALIGN', (0, 0), (0, 0), 'LEFT'),
+        ('ALIGN', (1, 0), (1, 0), 'RIGHT'),
+        ('FONTNAME', (0, 0), (-1, -1), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, -1), 10),
+    ]))
+
+    elements.append(t)
+
+    doc.build(elements)
+
+
+def generer_word_intervention(intervention, sortie):
+    """Écrit le rapport technique Word d'une intervention dans le fichier sortie"""
+    demande = intervention.demande
+    equipement = demande.equipement
+    pieces = list(intervention.pieces.all())
+
+    document = Document()
+
+    # --- EN-TÊTE ---
+    # République (Centré)
+    header_rep = document.add_paragraph("REPUBLIQUE ALGERIENNE DEMOCRATIQUE POPULAIRE")
+    header_rep.alignment = WD_ALIGN_PARAGRAPH.CENTER
+    header_rep.runs[0].bold = True
+
+    # Ministères et Entreprise (Aligné à gauche)
+    header_min = document.add_paragraph("MINISTERE DES TRANSPORTS\n"
+                                        "GROUPE SERVICES PORTUAIRES « SERPORT SPA»\n"
+                                        "ENTREPRISE PORTUAIRE DE MOSTAGANEM")
+    header_min.alignment = WD_ALIGN_PARAGRAPH.LEFT
+
+    # Titre
+    title = document.add_heading(f'RAPPORT TECHNIQUE D\'INTERVENTION #{intervention.pk}', level=1)
+    title.alignment = WD_ALIGN_PARAGRAPH.CENTER
+
+    # Informations
+    document.add_heading('Informations Générales', level=1)
+    table = document.add_table(rows=5, cols=2)
+    table.style = 'Light Grid Accent 1'
+
+    table.rows[0].cells[0].text = 'Date d\'intervention:'
+    table.rows[0].cells[1].text = intervention.date_intervention.strftime('%d/%m/%Y à %H:%M')
+    table.rows[1].cells[0].text = 'Type de réparation:'
+    table.rows[1].cells[1].text = intervention.get_type_reparation_display()
+    table.rows[2].cells[0].text = 'Demande:'
+    table.rows[2].cells[1].text = f"#{demande.pk}"
+    table.rows[3].cells[0].text = 'Demandeur:'
+    table.rows[3].cells[1].text = demande.employe.get_full_name()
+    table.rows[4].cells[0].text = 'Technicien:'
+    table.rows[4].cells[1].text = demande.technicien.get_full_name()
+
+    # Équipement
+    document.add_heading('Équipement Concerné', level=1)
+    eq_table = document.add_table(rows=5, cols=2)
+    eq_table.style = 'Light Grid Accent 1'
+    eq_table.rows[0].cells[0].text = 'Code:'
+    eq_table.rows[0].cells[1].text = equipement.code_equipement
+    eq_table.rows[1].cells[0].text = 'Nom:'
+    eq_table.rows[1].cells[1].text = equipement.nom
+    eq_table.rows[2].cells[0].text = 'Marque:'
+    eq_table.rows[2].cells[1].text = equipement.marque
+    eq_table.rows[3].cells[0].text = 'Catégorie:'
+    eq_table.rows[3].cells[1].text = equipement.categorie.nom if equipement.categorie else '-'
+    eq_table.rows[4].cells[0].text = 'Bureau:'
+    eq_table.rows[4].cells[1].text = equipement.bureau.nom if equipement.bureau else '-'
+
+    # Détails
+    document.add_heading('Détails de l\'Intervention', level=1)
+    document.add_paragraph(intervention.details)
+
+    # Pièces
+    if pieces:
+        document.add_heading('Pièces de Rechange', level=1)
+        pieces_table = document.add_table(rows=len(pieces)+2, cols=4)
+        pieces_table.style = 'Light Grid Accent 1'
+
+        pieces_table.rows[0].cells[0].text = 'Nom'
+        pieces_table.rows[0].cells[1].text = 'Prix Unitaire'
+        pieces_table.rows[0].cells[2].text = 'Quantité'
+        pieces_table.rows[0].cells[3].text = 'Total'
+
+        for i, piece in enumerate(pieces, 1):
+            pieces_table.rows[i].cells[0].text = piece.nom
+            pieces_table.rows[i].cells[1].text = f"{piece.prix_unitaire} DA"
+            pieces_table.rows[i].cells[2].text = str(piece.quantite)
+            pieces_table.rows[i].cells[3].text = f"{piece.cout_total()} DA"
+
+        last_row = pieces_table.rows[-1]
+        last_row.cells[2].text = 'TOTAL:'
+        last_row.cells[3].text = f"{intervention.cout_total_pieces()} DA"
+
+    # --- VISAS (En bas du document) ---
+    document.add_paragraph("\n") # Espacement avant les signatures
+    visa_table = document.add_table(rows=1, cols=2)
+    visa_table.autofit = True
+    visa_table.style = None
+    # Visa Informaticien (Gauche)
+    v_info = visa_table.rows[0].cells[0].paragraphs[0]
+    v_info.text = "VISA DE L'INFORMATICIEN"
+    v_info.alignment = WD_ALIGN_PARAGRAPH.LEFT
+    v_info.runs[0].bold = True
+
+    # Visa Responsable (Droite)
+    v_resp = visa_table.rows[0].cells[1].paragraphs[0]
+    v_resp.text = "VISA DE RESPONSABLE DE LA CELLULE"
+    v_resp.alignment = WD_ALIGN_PARAGRAPH.RIGHT
+    v_resp.runs[0].bold = True
+
+    document.save(sortie)
+
+
+# ============= CACHE DES RAPPORTS D'INTERVENTION =============
+# Un rapport généré est conservé sous une clé calculée à partir de tout ce qu'il affiche :
+# tant que l'intervention, ses pièces et l'équipement ne changent pas, le fichier est
+# servi tel quel. Les signaux (signals.py) suppriment les fichiers devenus obsolètes.
+
+RAPPORTS_INTERVENTION = {
+    'INTERVENTION_PDF': (generer_pdf_intervention, 'pdf'),
+    'INTERVENTION_WORD': (generer_word_intervention, 'docx'),
+}
+
+# Rapport en cours d'écriture dans le cache
+SUFFIXE_TEMPORAIRE = '.tmp'
+
+
+def cle_rapport_intervention(intervention):
+    """Empreinte du contenu d'un rapport (intervention chargée par interventions_pour_rapport)"""
+    demande = intervention.demande
+    equipement = demande.equipement
+    valeurs = [
+        VERSION_RAPPORT_INTERVENTION,
+        intervention.pk, intervention.details, intervention.type_reparation,
+        intervention.date_intervention.isoformat(),
+        demande.pk, demande.employe.get_full_name(),
+        demande.technicien.get_full_name() if demande.technicien else '',
+        equipement.code_equipement, equipement.nom, equipement.marque,
+        equipement.categorie.nom if equipement.categorie else '',
+        equipement.bureau.nom if equipement.bureau else '',
+    ]
+    for piece in intervention.pieces.all():
+        valeurs += [piece.pk, piece.nom, piece.prix_unitaire, piece.quantite]
+    return hashlib.sha256('\x1f'.join(str(v) for v in valeurs).encode('utf-8')).hexdigest()
+
+
+def chemin_rapport_intervention(intervention, type_export):
+    extension = RAPPORTS_INTERVENTION[type_export][1]
+    return f"{DOSSIER_RAPPORTS_INTERVENTION}/{intervention.pk}/{cle_rapport_intervention(intervention)}.{extension}"
+
+
+def enregistrer_rapport(chemin, generateur, intervention):
+    """Génère un rapport directement dans le cache, sous son nom définitif
+
+    Le rapport est écrit dans un fichier temporaire du même dossier puis renommé
+    (os.replace, atomique) : deux requêtes qui génèrent le même rapport en même temps
+    écrivent le même contenu sous le même nom, sans copie suffixée ni fichier à moitié
+    écrit visible.
+    """
+    destination = default_storage.path(chemin)
+    os.makedirs(os.path.dirname(destination), exist_ok=True)
+    with tempfile.NamedTemporaryFile(dir=os.path.dirname(destination), suffix=SUFFIXE_TEMPORAIRE,
+                                     delete=False) as sortie:
+        try:
+            generateur(intervention, sortie)
+        except Exception:
+            sortie.close()
+            os.remove(sortie.name)
+            raise
+    if settings.FILE_UPLOAD_PERMISSIONS is not None:
+        os.chmod(sortie.name, settings.FILE_UPLOAD_PERMISSIONS)
+    os.replace(sortie.name, destination)
+
+
+def rapport_intervention(intervention, type_export):
+    """Chemin (stockage des médias) du rapport d'une intervention, généré s'il n'est pas en cache"""
+    chemin = chemin_rapport_intervention(intervention, type_export)
+    if not default_storage.exists(chemin):
+        enregistrer_rapport(chemin, RAPPORTS_INTERVENTION[type_export][0], intervention)
+    return chemin
+
+
+def invalider_rapports_intervention(intervention_id):
+    """Supprime les rapports en cache d'une intervention"""
+    dossier = f"{DOSSIER_RAPPORTS_INTERVENTION}/{intervention_id}"
+    try:
+        _, fichiers = default_storage.listdir(dossier)
+    except FileNotFoundError:
+        return
+    for nom in fichiers:
+        # Un rapport en cours d'écriture est renommé par enregistrer_rapport (sous une ancienne clé)
+        if not nom.endswith(SUFFIXE_TEMPORAIRE):
+            default_storage.delete(f"{dossier}/{nom}")
+
+
+# ============= ARCHIVE ZIP DES RAPPORTS D'INTERVENTION =============
+
+class TamponZip:
+    """Flux en écriture seule pour zipfile : accumule les octets écrits jusqu'au prochain vider()"""
+    def __init__(self):
+        self.morceaux = []
+
+    def write(self, data):
+        self.morceaux.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def vider(self):
+        contenu = b''.join(self.morceaux)
+        self.morceaux = []
+        return contenu
+
+
+def nb_rapports_a_generer(interventions):
+    """Nombre de rapports PDF absents du cache parmi les interventions"""
+    return sum(not default_storage.exists(chemin_rapport_intervention(i, 'INTERVENTION_PDF')) for i in interventions)
+
+
+def ajouter_rapport(archive, intervention_id, chemin):
+    """Copie un rapport en cache dans l'archive ZIP, par blocs"""
+    with default_storage.open(chemin, 'rb') as rapport, \
+            archive.open(f"intervention_{intervention_id}.pdf", 'w') as entree:
+        shutil.copyfileobj(rapport, entree)
+
+
+def zip_rapports_interventions(interventions):
+    """Génère, morceau par morceau, une archive ZIP des rapports PDF des interventions
+
+    interventions doit être une liste chargée par interventions_pour_rapport() : aucune
+    requête n'est faite ici. Utilisé pendant la requête, quand au plus
+    EXPORT_ZIP_INLINE_MAX_RAPPORTS rapports manquent : ils sont générés un par un (pas de
+    pool de processus par requête) et enregistrés dans le cache ; chaque rapport est
+    ajouté à l'archive et envoyé dès qu'il est prêt.
+    """
+    tampon = TamponZip()
+    with zipfile.ZipFile(tampon, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for intervention in interventions:
+            ajouter_rapport(archive, intervention.pk, rapport_intervention(intervention, 'INTERVENTION_PDF'))
+            yield tampon.vider()
+    yield tampon.vider()
+
+
+def generer_rapport_par_id(pk):
+    """Point d'entrée des processus du pool : génère le rapport PDF en cache, retourne son chemin"""
+    return rapport_intervention(interventions_pour_rapport().get(pk=pk), 'INTERVENTION_PDF')
+
+
+def rapports_en_parallele(interventions):
+    """(id, chemin en cache) des rapports PDF des interventions, à mesure qu'ils sont prêts
+
+    Les rapports déjà en cache d'abord ; les autres sont répartis sur EXPORT_ZIP_PROCESSUS
+    processus (démarrés en spawn, sans connexion héritée) et rendus dans l'ordre où ils se
+    terminent. Seul l'identifiant traverse la frontière : chaque processus écrit le cache.
+    """
+    chemins = {i.pk: chemin_rapport_intervention(i, 'INTERVENTION_PDF') for i in interventions}
+    a_generer = [i for i in interventions if not default_storage.exists(chemins[i.pk])]
+    manquants = {i.pk for i in a_generer}
+    for pk, chemin in chemins.items():
+        if pk not in manquants:
+            yield pk, chemin
+
+    if EXPORT_ZIP_PROCESSUS <= 1 or len(a_generer) <= 1:
+        for intervention in a_generer:
+            yield intervention.pk, rapport_intervention(intervention, 'INTERVENTION_PDF')
+        return
+    with ProcessPoolExecutor(max_workers=min(EXPORT_ZIP_PROCESSUS, len(a_generer)),
+                             mp_context=multiprocessing.get_context('spawn'),
+                             initializer=django.setup) as pool:
+        futures = {pool.submit(generer_rapport_par_id, intervention.pk): intervention.pk for intervention in a_generer}
+        for future in as_completed(futures):
+            yield futures[future], future.result()
+
+
+# ============= GÉNÉRATEURS D'EXPORT =============
+# Chaque générateur reçoit les paramètres de l'ExportJob et le fichier de sortie,
+# écrit le document et retourne le nom du fichier à proposer au téléchargement.
+
+def exporter_logs_pdf(parametres, sortie):
+    """parametres = filtres GET de la page des logs"""
+    form = FiltreLogForm(parametres)
+    logs = filtrer_logs(LogAction.objects.order_by('-date_action'), form)
+    generer_pdf_logs(logs, sortie)
+    return f"logs_{datetime.now().strftime('%Y%m%d_%H%M')}.pdf"
+
+
+def exporter_demandes_pdf(parametres, sortie):
+    """parametres = filtres GET de la liste des demandes"""
+    form = FiltreDemandeForm(parametres)
+    demandes = filtrer_demandes(DemandeMaintenance.objects.order_by('-date_creation'), form)
+    generer_pdf_demandes(demandes, sortie)
+    return f"demandes_{datetime.now().strftime('%Y%m%d_%H%M')}.pdf"
+
+
+def exporter_interventions_zip(parametres, sortie):
+    """parametres = filtres GET de la liste des interventions
+
+    Les rapports manquants sont générés en parallèle (rapports_en_parallele) et ajoutés à
+    l'archive dès que chacun est prêt ; le fichier n'est téléchargeable qu'une fois l'export
+    terminé, comme les autres exports en arrière-plan.
+    """
+    form = FiltreInterventionForm(parametres)
+    interventions = list(filtrer_interventions(interventions_pour_rapport(), form).order_by('date_intervention'))
+    with zipfile.ZipFile(sortie, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for intervention_id, chemin in rapports_en_parallele(interventions):
+            ajouter_rapport(archive, intervention_id, chemin)
+    return f"interventions_{datetime.now().strftime('%Y%m%d_%H%M')}.zip"
+
+
+def exporter_intervention(type_export, parametres, sortie):
+    """parametres = {'intervention': pk} ; le rapport passe par le cache des rapports d'intervention"""
+    intervention = interventions_pour_rapport().get(pk=parametres['intervention'])
+    with default_storage.open(rapport_intervention(intervention, type_export), 'rb') as rapport:
+        shutil.copyfileobj(rapport, sortie)
+    return f"intervention_{intervention.pk}.{RAPPORTS_INTERVENTION[type_export][1]}"
+
+
+def exporter_intervention_pdf(parametres, sortie):
+    return exporter_intervention('INTERVENTION_PDF', parametres, sortie)
+
+
+def exporter_intervention_word(parametres, sortie):
+    return exporter_intervention('INTERVENTION_WORD', parametres, sortie)
+
+
+GENERATEURS = {
+    'LOGS_PDF': exporter_logs_pdf,
+    'DEMANDES_PDF': exporter_demandes_pdf,
+    'INTERVENTION_PDF': exporter_intervention_pdf,
+    'INTERVENTION_WORD': exporter_intervention_word,
+    'INTERVENTIONS_ZIP': exporter_interventions_zip,
+}
+
+
+# ============= EXPORTS EN ARRIÈRE-PLAN =============
+
+def prochain_export():
+    """Réserve le prochain export à générer (en attente, ou abandonné par un worker arrêté)"""
+    limite = timezone.now() - DELAI_ABANDON
+    candidats = ExportJob.objects.filter(
+        Q(statut='EN_ATTENTE') | Q(statut='EN_COURS', date_debut__lt=limite)
+    ).order_by('date_creation')
+
+    for job in candidats[:10]:
+        # Réservation atomique : un seul worker gagne
+        reserve = ExportJob.objects.filter(
+            pk=job.pk, statut=job.statut, date_debut=job.date_debut
+        ).update(statut='EN_COURS', date_debut=timezone.now())
+        if reserve:
+            job.refresh_from_db()
+            return job
+    return None
+
+
+def executer_export(job):
+    """Génère le fichier d'un export et l'enregistre sur le stockage des médias"""
+    try:
+        with tempfile.TemporaryFile() as sortie:
+            nom_fichier = GENERATEURS[job.type_export](job.parametres, sortie)
+            sortie.seek(0)
+            job.fichier.save(nom_fichier, File(sortie), save=False)
+    except Exception as e:
+        job.statut = 'ECHEC'
+        job.message = f"Erreur lors de la génération: {str(e)}"
+    else:
+        job.statut = 'TERMINE'
+    job.date_fin = timezone.now()
+    job.save()
+    return job
+
+
+def executer_export_par_id(pk):
+    """Point d'entrée des processus du pool : seul l'identifiant traverse la frontière"""
+    executer_export(ExportJob.objects.get(pk=pk))
+
+
+def purger_exports():
+    """Supprime les exports terminés plus anciens que EXPORTS_CONSERVATION, fichiers compris"""
+    limite = timezone.now() - EXPORTS_CONSERVATION
+    anciens = ExportJob.objects.filter(statut__in=['TERMINE', 'ECHEC'], date_creation__lt=limite)
+    nb_supprimes = 0
+    for job in anciens.iterator():
+        if job.fichier:
+            job.fichier.delete(save=False)
+        job.delete()
+        nb_supprimes += 1
+    return nb_supprimes
@@ -0,0 +1,266 @@
+import re
+import unicodedata
+from difflib import get_close_matches
+
+from django.conf import settings
+from django.db import connection, models, transaction
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Cast
+from django.utils.module_loading import import_string
+
+from .models import EntreeRecherche, LogAction, DemandeMaintenance, Intervention, Equipement, squelette_code
+
+
+# ============= CONTENU INDEXÉ =============
+# Chaque objet recherchable a une ligne EntreeRecherche (type, id, texte), écrite par
+# les signaux (signals.py) et par l'import CSV. Le moteur choisi interroge cette table.
+
+def contenu_log(log):
+    return log.details
+
+
+def contenu_demande(demande):
+    return f"{demande.equipement_id} {demande.description}"
+
+
+def contenu_intervention(intervention):
+    return intervention.details
+
+
+def contenu_equipement(equipement):
+    return ' '.join(filter(None, [equipement.code_equipement, equipement.nom, equipement.marque,
+                                  equipement.description_technique]))
+
+
+# type_objet -> fonction produisant le texte indexé
+CONTENUS = {
+    'LOG': contenu_log,
+    'DEMANDE': contenu_demande,
+    'INTERVENTION': contenu_intervention,
+    'EQUIPEMENT': contenu_equipement,
+}
+
+# Modèle -> type_objet (résolu par les signaux)
+TYPES_PAR_MODELE = {
+    LogAction: 'LOG',
+    DemandeMaintenance: 'DEMANDE',
+    Intervention: 'INTERVENTION',
+    Equipement: 'EQUIPEMENT',
+}
+
+
+def indexer(type_objet, objets, nouveaux=False):
+    """Écrit (ou réécrit) le texte indexé des objets ; nouveaux=True évite le DELETE préalable"""
+    entrees = [
+        EntreeRecherche(type_objet=type_objet, objet_id=str(objet.pk), contenu=CONTENUS[type_objet](objet))
+        for objet in objets
+    ]
+    # Sans point de sauvegarde : dans la transaction de l'enregistrement indexé s'il y en a une
+    with transaction.atomic(savepoint=False):
+        if not nouveaux:
+            desindexer(type_objet, [entree.objet_id for entree in entrees])
+        EntreeRecherche.objects.bulk_create(entrees, batch_size=1000)
+
+
+def desindexer(type_objet, objet_ids):
+    EntreeRecherche.objects.filter(type_objet=type_objet, objet_id__in=[str(pk) for pk in objet_ids]).delete()
+
+
+def reconstruire_index(taille_lot=2000):
+    """Réindexe tous les objets"""
+    total = 0
+    with transaction.atomic():
+        EntreeRecherche.objects.all().delete()
+        for modele, type_objet in TYPES_PAR_MODELE.items():
+            lot = []
+            for objet in modele.objects.order_by().iterator(chunk_size=taille_lot):
+                lot.append(EntreeRecherche(type_objet=type_objet, objet_id=str(objet.pk),
+                                           contenu=CONTENUS[type_objet](objet)))
+                if len(lot) >= taille_lot:
+                    EntreeRecherche.objects.bulk_create(lot)
+                    total += len(lot)
+                    lot = []
+            EntreeRecherche.objects.bulk_create(lot)
+            total += len(lot)
+    return total
+
+
+# ============= MOTEURS =============
+
+def mots_recherche(requete):
+    """Mots de la requête (lettres, chiffres), sans ponctuation ni opérateurs"""
+    return re.findall(r'\w+', requete or '')
+
+
+def sans_accents(texte):
+    """Texte en minuscules sans accents, pour comparer hors base comme le fait FTS5"""
+    if texte.isascii():
+        return texte.lower()
+    return ''.join(c for c in unicodedata.normalize('NFKD', texte.lower()) if not unicodedata.combining(c))
+
+
+class MoteurRecherche:
+    """Moteur par défaut, pour toutes les bases : LIKE sur chaque mot, sans classement
+
+    Un moteur propre à une base (voir MoteurFTS5) redéfinit entrees() et rechercher() ;
+    RECHERCHE_MOTEUR (chemin de la classe) force le choix.
+    """
+
+    def entrees(self, requete, type_objet):
+        """EntreeRecherche du type contenant tous les mots de la requête"""
+        mots = mots_recherche(requete)
+        entrees = EntreeRecherche.objects.filter(type_objet=type_objet)
+        if not mots:
+            return entrees.none()
+        for mot in mots:
+            entrees = entrees.filter(contenu__icontains=mot)
+        return entrees
+
+    def rechercher(self, requete, type_objet, limite=20):
+        """Identifiants (chaînes) des objets trouvés, les plus pertinents d'abord"""
+        return list(self.entrees(requete, type_objet).order_by('-pk').values_list('objet_id', flat=True)[:limite])
+
+    def filtrer(self, queryset, type_objet, requete):
+        """Restreint un queryset aux objets trouvés, sans changer son tri"""
+        entrees = self.entrees(requete, type_objet)
+        if isinstance(queryset.model._meta.pk, models.CharField):
+            return queryset.filter(pk__in=entrees.values('objet_id'))
+        return queryset.filter(pk__in=entrees.values(id_objet=Cast('objet_id', models.IntegerField())))
+
+
+TABLE_FTS5 = 'maintenance_recherche_fts'
+
+# Index FTS5 "external content" sur maintenance_entreerecherche, synchronisé par triggers
+SQL_FTS5_CREATION = [
+    f"""CREATE VIRTUAL TABLE {TABLE_FTS5} USING fts5(
+        contenu, content='maintenance_entreerecherche', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )""",
+    f"""CREATE TRIGGER {TABLE_FTS5}_ai AFTER INSERT ON maintenance_entreerecherche BEGIN
+        INSERT INTO {TABLE_FTS5}(rowid, contenu) VALUES (new.id, new.contenu);
+    END""",
+    f"""CREATE TRIGGER {TABLE_FTS5}_ad AFTER DELETE ON maintenance_entreerecherche BEGIN
+        INSERT INTO {TABLE_FTS5}({TABLE_FTS5}, rowid, contenu) VALUES ('delete', old.id, old.contenu);
+    END""",
+    f"""CREATE TRIGGER {TABLE_FTS5}_au AFTER UPDATE ON maintenance_entreerecherche BEGIN
+        INSERT INTO {TABLE_FTS5}({TABLE_FTS5}, rowid, contenu) VALUES ('delete', old.id, old.contenu);
+        INSERT INTO {TABLE_FTS5}(rowid, contenu) VALUES (new.id, new.contenu);
+    END""",
+]
+
+SQL_FTS5_SUPPRESSION = [
+    f"DROP TRIGGER IF EXISTS {TABLE_FTS5}_ai",
+    f"DROP TRIGGER IF EXISTS {TABLE_FTS5}_ad",
+    f"DROP TRIGGER IF EXISTS {TABLE_FTS5}_au",
+    f"DROP TABLE IF EXISTS {TABLE_FTS5}",
+]
+
+
+class MoteurFTS5(MoteurRecherche):
+    """SQLite : index FTS5, préfixes (« impri » trouve « imprimante »), accents ignorés, classement BM25"""
+
+    # CROSS JOIN fixe l'ordre sous SQLite : l'index FTS5 mène, puis accès aux entrées par id.
+    # Sinon, faute de statistiques, SQLite peut parcourir tout un type_objet et réévaluer
+    # le MATCH pour chaque ligne.
+    JOINTURE = 'CROSS JOIN maintenance_entreerecherche e ON e.id = f.rowid'
+
+    @staticmethod
+    def expression(requete):
+        # Chaque mot entre guillemets (neutralise la syntaxe FTS5) et en préfixe ; ET implicite
+        return ' '.join(f'"{mot}"*' for mot in mots_recherche(requete))
+
+    def entrees(self, requete, type_objet):
+        expression = self.expression(requete)
+        if not expression:
+            return EntreeRecherche.objects.none()
+        return EntreeRecherche.objects.filter(pk__in=RawSQL(
+            f"""SELECT e.id FROM {TABLE_FTS5} f {self.JOINTURE}
+                WHERE f.{TABLE_FTS5} MATCH %s AND e.type_objet = %s""",
+            [expression, type_objet],
+        ))
+
+    def rechercher(self, requete, type_objet, limite=20):
+        expression = self.expression(requete)
+        if not expression:
+            return []
+        with connection.cursor() as curseur:
+            curseur.execute(
+                f"""SELECT e.objet_id FROM {TABLE_FTS5} f {self.JOINTURE}
+                    WHERE f.{TABLE_FTS5} MATCH %s AND e.type_objet = %s
+                    ORDER BY f.rank LIMIT %s""",
+                [expression, type_objet, limite],
+            )
+            return [objet_id for objet_id, in curseur.fetchall()]
+
+
+def moteur_recherche():
+    """Moteur configuré par RECHERCHE_MOTEUR, sinon FTS5 sur SQLite et LIKE ailleurs"""
+    chemin = getattr(settings, 'RECHERCHE_MOTEUR', None)
+    if chemin:
+        return import_string(chemin)()
+    return MoteurFTS5() if connection.vendor == 'sqlite' else MoteurRecherche()
+
+
+def rechercher_objets(requete, modele, limite=20, queryset=None):
+    """Objets d'un modèle trouvés par la requête, dans l'ordre de pertinence"""
+    ids = moteur_recherche().rechercher(requete, TYPES_PAR_MODELE[modele], limite)
+    queryset = modele.objects.all() if queryset is None else queryset
+    if not isinstance(modele._meta.pk, models.CharField):
+        ids = [int(pk) for pk in ids]
+    objets = queryset.in_bulk(ids)
+    return [objets[pk] for pk in ids if pk in objets]
+
+
+# ============= AUTOCOMPLÉTION DES CODES D'ÉQUIPEMENT =============
+# Requêtes par plage (>= préfixe, < préfixe suivant) : elles utilisent l'index de la clé
+# primaire ou de code_squelette, contrairement à icontains / startswith (LIKE).
+
+# Codes comparés un à un (distance d'édition) quand aucun préfixe ne correspond
+MAX_CANDIDATS_PROCHES = 2000
+
+
+def borne_prefixe(prefixe):
+    """Plus petite chaîne supérieure à toutes celles qui commencent par prefixe"""
+    return prefixe[:-1] + chr(ord(prefixe[-1]) + 1)
+
+
+def suggerer_codes(saisie, direction=None, limite=10):
+    """Codes d'équipement proposés pour une saisie, limités à une direction si fournie
+
+    Les équipements sans bureau restent proposés : le formulaire de demande les accepte
+    quelle que soit la direction de l'employé.
+
+    Par ordre de priorité : codes commençant par la saisie, puis codes dont le
+    squelette commence par celui de la saisie ("PC-0O1" -> "PC-001"), puis codes
+    proches (une faute de frappe) parmi ceux qui partagent les deux premiers caractères.
+    Retourne [{'code': ..., 'nom': ..., 'exact': bool}].
+    """
+    saisie = (saisie or '').strip().upper()
+    if not saisie:
+        return []
+    equipements = Equipement.objects.order_by('code_equipement')
+    if direction is not None:
+        equipements = equipements.filter(Q(bureau__direction=direction) | Q(bureau__isnull=True))
+
+    trouves = dict(equipements.filter(
+        code_equipement__gte=saisie, code_equipement__lt=borne_prefixe(saisie)
+    ).values_list('code_equipement', 'nom')[:limite])
+    exacts = set(trouves)
+
+    squelette = squelette_code(saisie)
+    if len(trouves) < limite and squelette:
+        trouves.update(equipements.filter(
+            code_squelette__gte=squelette, code_squelette__lt=borne_prefixe(squelette)
+        ).exclude(code_equipement__in=list(trouves)).values_list('code_equipement', 'nom')[:limite - len(trouves)])
+
+    if not trouves and len(squelette) >= 3:
+        candidats = {}  # squelette -> [(code, nom)]
+        for code, nom, squelette_candidat in equipements.filter(
+            code_squelette__gte=squelette[:2], code_squelette__lt=borne_prefixe(squelette[:2])
+        ).values_list('code_equipement', 'nom', 'code_squelette')[:MAX_CANDIDATS_PROCHES]:
+            candidats.setdefault(squelette_candidat, []).append((code, nom))
+        for proche in get_close_matches(squelette, candidats, n=limite, cutoff=0.75):
+            trouves.update(candidats[proche])
+
+    return [{'code': code, 'nom': nom, 'exact': code in exacts} for code, nom in trouves.items()]
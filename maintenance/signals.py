@@ -0,0 +1,122 @@
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete
+from django.dispatch import receiver
+
+from .models import (User, Direction, Bureau, DemandeMaintenance, Equipement, Intervention, PieceRechange,
+                     FichierIntervention, LogAction)
+from .rapports import invalider_rapports_intervention
+from .recherche import TYPES_PAR_MODELE, indexer, desindexer
+from .statistiques import (compter_demande, compter_equipement, compter_bureau, oublier_compteurs, etat_demande,
+                           etat_equipement, etat_demande_supprimee, etat_equipement_supprime)
+
+
+# ============= TOTAUX DES INTERVENTIONS =============
+# Recalcul complet (une requête UPDATE) plutôt qu'incrément : exécuté dans la transaction
+# de la modification, il ne peut pas dériver. reconcilier_interventions répare les
+# écritures faites hors de l'ORM.
+
+@receiver([post_save, post_delete], sender=PieceRechange)
+@receiver([post_save, post_delete], sender=FichierIntervention)
+def recalculer_totaux_intervention(sender, instance, **kwargs):
+    Intervention.objects.filter(pk=instance.intervention_id).recalculer_totaux()
+
+
+# ============= CACHE DES RAPPORTS D'INTERVENTION =============
+# Les rapports en cache sont indexés par leur contenu : un rapport obsolète n'est jamais
+# servi. Ces signaux suppriment simplement les fichiers qui ne seront plus demandés.
+
+@receiver([post_save, post_delete], sender=Intervention)
+def invalider_rapports_sur_intervention(sender, instance, **kwargs):
+    invalider_rapports_intervention(instance.pk)
+
+
+@receiver([post_save, post_delete], sender=PieceRechange)
+def invalider_rapports_sur_piece(sender, instance, **kwargs):
+    invalider_rapports_intervention(instance.intervention_id)
+
+
+@receiver(post_save, sender=Equipement)
+def invalider_rapports_sur_equipement(sender, instance, **kwargs):
+    interventions = Intervention.objects.filter(demande__equipement=instance).values_list('pk', flat=True)
+    for intervention_id in interventions:
+        invalider_rapports_intervention(intervention_id)
+
+
+# ============= COMPTEURS MATÉRIALISÉS =============
+# L'état avant sauvegarde est relu en pre_save pour appliquer la différence en post_save.
+
+@receiver(pre_save, sender=DemandeMaintenance)
+def memoriser_etat_demande(sender, instance, **kwargs):
+    instance._etat_statistiques = etat_demande(instance.pk) if instance.pk else None
+
+
+@receiver(post_save, sender=DemandeMaintenance)
+def compter_demande_enregistree(sender, instance, **kwargs):
+    compter_demande(getattr(instance, '_etat_statistiques', None), etat_demande(instance.pk))
+
+
+@receiver(post_delete, sender=DemandeMaintenance)
+def compter_demande_supprimee(sender, instance, **kwargs):
+    compter_demande(etat_demande_supprimee(instance), None)
+
+
+@receiver(pre_save, sender=Equipement)
+def memoriser_etat_equipement(sender, instance, **kwargs):
+    instance._etat_statistiques = etat_equipement(instance.pk)
+
+
+@receiver(post_save, sender=Equipement)
+def compter_equipement_enregistre(sender, instance, **kwargs):
+    compter_equipement(instance.pk, getattr(instance, '_etat_statistiques', None), etat_equipement(instance.pk))
+
+
+@receiver(post_delete, sender=Equipement)
+def compter_equipement_supprime(sender, instance, **kwargs):
+    compter_equipement(instance.pk, etat_equipement_supprime(instance), None)
+
+
+@receiver(pre_save, sender=Bureau)
+def memoriser_direction_bureau(sender, instance, **kwargs):
+    instance._direction_statistiques = Bureau.objects.filter(pk=instance.pk).values_list(
+        'direction_id', flat=True).first() if instance.pk else None
+
+
+@receiver(post_save, sender=Bureau)
+def compter_bureau_enregistre(sender, instance, created, **kwargs):
+    if not created:
+        compter_bureau(instance.pk, getattr(instance, '_direction_statistiques', None), instance.direction_id)
+
+
+# pre_delete : les équipements du bureau sont encore rattachés (SET_NULL vient ensuite).
+# Une direction supprimée envoie ce signal pour chacun de ses bureaux (CASCADE).
+@receiver(pre_delete, sender=Bureau)
+def compter_bureau_supprime(sender, instance, **kwargs):
+    compter_bureau(instance.pk, instance.direction_id, None)
+
+
+@receiver(post_delete, sender=Direction)
+def oublier_compteurs_direction(sender, instance, **kwargs):
+    oublier_compteurs('DIRECTION', instance.pk)
+
+
+@receiver(post_delete, sender=User)
+def oublier_compteurs_technicien(sender, instance, **kwargs):
+    oublier_compteurs('TECHNICIEN', instance.pk)
+
+
+# ============= INDEX DE RECHERCHE =============
+# L'import CSV (bulk_create / bulk_update, sans signaux) indexe lui-même ses lots.
+
+@receiver(post_save, sender=LogAction)
+@receiver(post_save, sender=DemandeMaintenance)
+@receiver(post_save, sender=Intervention)
+@receiver(post_save, sender=Equipement)
+def indexer_objet(sender, instance, created, **kwargs):
+    indexer(TYPES_PAR_MODELE[sender], [instance], nouveaux=created)
+
+
+@receiver(post_delete, sender=LogAction)
+@receiver(post_delete, sender=DemandeMaintenance)
+@receiver(post_delete, sender=Intervention)
+@receiver(post_delete, sender=Equipement)
+def desindexer_objet(sender, instance, **kwargs):
+    desindexer(TYPES_PAR_MODELE[sender], [instance.pk])
@@ -0,0 +1,35 @@
+// Suggestions de codes d'équipement pour les champs portant data-autocompletion
+// (voir DemandeMaintenanceForm) : liste <datalist> rafraîchie pendant la saisie.
+document.addEventListener('DOMContentLoaded', function () {
+    document.querySelectorAll('input[data-autocompletion]').forEach(function (champ) {
+        const liste = document.getElementById(champ.getAttribute('list'));
+        let minuterie = null;
+        let controleur = null;
+
+        champ.addEventListener('input', function () {
+            clearTimeout(minuterie);
+            const saisie = champ.value.trim();
+            if (!liste || saisie.length < 2) {
+                return;
+            }
+            minuterie = setTimeout(function () {
+                if (controleur) {
+                    controleur.abort();  // Réponse d'une saisie précédente devenue inutile
+                }
+                controleur = new AbortController();
+                fetch(champ.dataset.autocompletion + '?q=' + encodeURIComponent(saisie), {signal: controleur.signal})
+                    .then(function (reponse) { return reponse.json(); })
+                    .then(function (donnees) {
+                        liste.innerHTML = '';
+                        donnees.resultats.forEach(function (equipement) {
+                            const option = document.createElement('option');
+                            option.value = equipement.code;
+                            option.label = equipement.exact ? equipement.nom : equipement.nom + ' (code approchant)';
+                            liste.appendChild(option);
+                        });
+                    })
+                    .catch(function () {});
+            }, 150);
+        });
+    });
+});
@@ -0,0 +1,372 @@
+from collections import Counter
+from datetime import datetime, time, timedelta
+from functools import reduce
+from operator import or_
+
+from django.db import transaction
+from django.db.models import Case, Count, F, IntegerField, Q, Sum, Value, When
+from django.db.models.functions import Trunc
+from django.utils import timezone
+
+from .models import (User, DemandeMaintenance, Intervention, Equipement, Bureau, CompteurStatistique,
+                     ActiviteJournal)
+
+
+# ============= COMPTEURS =============
+# Chaque fonction calcule tous les compteurs d'un queryset (déjà filtré) en une seule
+# requête d'agrégation conditionnelle, au lieu d'un .filter(...).count() par compteur.
+
+def compteurs_demandes(demandes):
+    """Compteurs d'un queryset de DemandeMaintenance
+
+    Retourne {'total': n, 'statut': {code: n}, 'urgence': {code: n}} avec une entrée
+    pour chaque choix possible.
+    """
+    agregats = {'total': Count('pk')}
+    for statut, _ in DemandeMaintenance.STATUT_CHOICES:
+        agregats[f'statut_{statut}'] = Count('pk', filter=Q(statut=statut))
+    for urgence, _ in DemandeMaintenance.URGENCE_CHOICES:
+        agregats[f'urgence_{urgence}'] = Count('pk', filter=Q(urgence=urgence))
+
+    resultat = demandes.order_by().aggregate(**agregats)
+    return {
+        'total': resultat['total'],
+        'statut': {s: resultat[f'statut_{s}'] for s, _ in DemandeMaintenance.STATUT_CHOICES},
+        'urgence': {u: resultat[f'urgence_{u}'] for u, _ in DemandeMaintenance.URGENCE_CHOICES},
+    }
+
+
+def compteurs_interventions(interventions):
+    """Compteurs d'un queryset d'Intervention
+
+    Retourne {'total': n, 'type_reparation': {code: n}, 'avec_fichiers': n}.
+    """
+    agregats = {
+        'total': Count('pk'),
+        'avec_fichiers': Count('pk', filter=Q(nb_fichiers__gt=0)),
+    }
+    for type_reparation, _ in Intervention.TYPE_REPARATION_CHOICES:
+        agregats[f'type_{type_reparation}'] = Count('pk', filter=Q(type_reparation=type_reparation))
+
+    resultat = interventions.order_by().aggregate(**agregats)
+    return {
+        'total': resultat['total'],
+        'avec_fichiers': resultat['avec_fichiers'],
+        'type_reparation': {t: resultat[f'type_{t}'] for t, _ in Intervention.TYPE_REPARATION_CHOICES},
+    }
+
+
+# ============= COMPTEURS MATÉRIALISÉS =============
+# Table CompteurStatistique tenue à jour par les signaux de DemandeMaintenance et
+# d'Equipement (signals.py) : le tableau de bord admin lit quelques lignes au lieu
+# d'agréger toutes les demandes. Les déplacements et suppressions de bureaux, de
+# directions et de techniciens (SET_NULL en cascade, sans signaux sur les lignes
+# touchées) sont reportés par leurs propres signaux. Les écritures en masse qui
+# contournent save() (import CSV) sont rattrapées par reconstruire_statistiques().
+
+def contributions_demande(statut, technicien_id, marque, direction_id):
+    """Clés (portee, objet_id, indicateur, valeur) des compteurs auxquels compte une demande"""
+    cles = [
+        ('GLOBAL', 0, 'demandes', ''),
+        ('GLOBAL', 0, 'statut', statut),
+        ('GLOBAL', 0, 'pannes_marque', marque),
+    ]
+    if direction_id:
+        cles += [('DIRECTION', direction_id, 'demandes', ''), ('DIRECTION', direction_id, 'statut', statut)]
+    if technicien_id:
+        cles += [('TECHNICIEN', technicien_id, 'demandes', ''), ('TECHNICIEN', technicien_id, 'statut', statut)]
+    return cles
+
+
+def contributions_equipement(direction_id):
+    """Clés des compteurs auxquels compte un équipement"""
+    cles = [('GLOBAL', 0, 'equipements', '')]
+    if direction_id:
+        cles.append(('DIRECTION', direction_id, 'equipements', ''))
+    return cles
+
+
+def etat_demande(demande_id):
+    """(statut, technicien_id, marque, direction_id) d'une demande en base, None si absente"""
+    return DemandeMaintenance.objects.filter(pk=demande_id).values_list(
+        'statut', 'technicien_id', 'equipement__marque', 'equipement__bureau__direction_id'
+    ).first()
+
+
+def etat_equipement(code_equipement):
+    """(marque, direction_id) d'un équipement en base, None si absent"""
+    return Equipement.objects.filter(pk=code_equipement).values_list('marque', 'bureau__direction_id').first()
+
+
+def etat_demande_supprimee(demande):
+    """État d'une demande qui vient d'être supprimée (son équipement existe encore en base)"""
+    marque, direction_id = etat_equipement(demande.equipement_id) or ('', None)
+    return (demande.statut, demande.technicien_id, marque, direction_id)
+
+
+def etat_equipement_supprime(equipement):
+    """État d'un équipement qui vient d'être supprimé"""
+    direction_id = Bureau.objects.filter(pk=equipement.bureau_id).values_list('direction_id', flat=True).first()
+    return (equipement.marque, direction_id)
+
+
+def incrementer(modele, champs, deltas):
+    """Ajoute chaque variation {clé: delta} au champ nombre de la ligne de modele identifiée par la clé
+
+    champs nomme les éléments de la clé (contrainte d'unicité de modele). Deux requêtes quel
+    que soit le nombre de clés : les lignes absentes sont créées à zéro (sans erreur si un
+    autre processus vient de les créer), puis un seul UPDATE ajoute à chacune son delta.
+    """
+    deltas = {cle: delta for cle, delta in deltas.items() if delta}
+    if not deltas:
+        return
+
+    modele.objects.bulk_create([modele(**dict(zip(champs, cle))) for cle in deltas], ignore_conflicts=True)
+
+    conditions = [(Q(**dict(zip(champs, cle))), delta) for cle, delta in deltas.items()]
+    modele.objects.filter(reduce(or_, (condition for condition, _ in conditions))).update(
+        nombre=F('nombre') + Case(*[When(condition, then=Value(delta)) for condition, delta in conditions],
+                                  default=Value(0), output_field=IntegerField())
+    )
+
+
+def appliquer_deltas(deltas):
+    """Ajoute chaque variation {(portee, objet_id, indicateur, valeur): delta} à son compteur"""
+    variations = Counter()
+    for (portee, objet_id, indicateur, valeur), delta in deltas.items():
+        variations[(portee, objet_id, indicateur, valeur or '')] += delta
+    incrementer(CompteurStatistique, ('portee', 'objet_id', 'indicateur', 'valeur'), variations)
+
+
+def compter_demande(ancien_etat, nouvel_etat):
+    """Met à jour les compteurs quand une demande passe d'un état à l'autre (None = absente)"""
+    deltas = Counter()
+    if nouvel_etat:
+        deltas.update(contributions_demande(*nouvel_etat))
+    if ancien_etat:
+        deltas.subtract(contributions_demande(*ancien_etat))
+    appliquer_deltas(deltas)
+
+
+def compter_equipement(code_equipement, ancien_etat, nouvel_etat):
+    """Met à jour les compteurs quand un équipement est créé, modifié ou supprimé
+
+    Un changement de marque ou de direction déplace aussi les demandes de l'équipement.
+    """
+    deltas = Counter()
+    if nouvel_etat:
+        deltas.update(contributions_equipement(nouvel_etat[1]))
+    if ancien_etat:
+        deltas.subtract(contributions_equipement(ancien_etat[1]))
+
+    if ancien_etat and nouvel_etat and ancien_etat != nouvel_etat:
+        par_statut = DemandeMaintenance.objects.filter(equipement_id=code_equipement).values_list(
+            'statut').annotate(nb=Count('pk')).order_by()
+        for statut, nb in par_statut:
+            for cle in contributions_demande(statut, None, *nouvel_etat):
+                deltas[cle] += nb
+            for cle in contributions_demande(statut, None, *ancien_etat):
+                deltas[cle] -= nb
+    appliquer_deltas(deltas)
+
+
+def compter_bureau(bureau_id, ancienne_direction_id, nouvelle_direction_id):
+    """Déplace les équipements d'un bureau et leurs demandes d'une direction à l'autre (None = aucune)
+
+    Appelé quand un bureau change de direction, et avant sa suppression (ses équipements
+    passent alors sans bureau par SET_NULL, sans signal).
+    """
+    if ancienne_direction_id == nouvelle_direction_id:
+        return
+    deltas = Counter()
+    nb_equipements = Equipement.objects.filter(bureau_id=bureau_id).count()
+    deltas.update({cle: nb_equipements for cle in contributions_equipement(nouvelle_direction_id)})
+    deltas.subtract({cle: nb_equipements for cle in contributions_equipement(ancienne_direction_id)})
+
+    # Les compteurs globaux s'annulent : seule la portée DIRECTION varie
+    par_statut = DemandeMaintenance.objects.filter(equipement__bureau_id=bureau_id).values_list(
+        'statut').annotate(nb=Count('pk')).order_by()
+    for statut, nb in par_statut:
+        for cle in contributions_demande(statut, None, '', nouvelle_direction_id):
+            deltas[cle] += nb
+        for cle in contributions_demande(statut, None, '', ancienne_direction_id):
+            deltas[cle] -= nb
+    appliquer_deltas(deltas)
+
+
+def oublier_compteurs(portee, objet_id):
+    """Supprime les compteurs d'une direction ou d'un technicien supprimé
+
+    Ses demandes restent comptées ailleurs : celles d'un technicien supprimé passent non
+    assignées (SET_NULL), les équipements d'une direction supprimée ont déjà été retirés
+    de ses compteurs bureau par bureau (compter_bureau).
+    """
+    CompteurStatistique.objects.filter(portee=portee, objet_id=objet_id).delete()
+
+
+def calculer_compteurs(demandes, equipements):
+    """Compteurs recalculés depuis les tables (demandes et équipements passés en querysets)"""
+    compteurs = Counter()
+    lignes = demandes.values_list(
+        'statut', 'technicien_id', 'equipement__marque', 'equipement__bureau__direction_id'
+    ).annotate(nb=Count('pk')).order_by()
+    for statut, technicien_id, marque, direction_id, nb in lignes:
+        for cle in contributions_demande(statut, technicien_id, marque, direction_id):
+            compteurs[cle] += nb
+    for direction_id, nb in equipements.values_list('bureau__direction_id').annotate(nb=Count('pk')).order_by():
+        for cle in contributions_equipement(direction_id):
+            compteurs[cle] += nb
+    return compteurs
+
+
+def reconstruire_statistiques():
+    """Recalcule entièrement la table des compteurs
+
+    La suppression, première écriture de la transaction, prend le verrou d'écriture (SQLite)
+    ou celui des lignes existantes avant le recalcul : un incrément concurrent attend la fin
+    de la reconstruction puis s'applique par-dessus au lieu d'être écrasé.
+    """
+    with transaction.atomic():
+        CompteurStatistique.objects.all().delete()
+        compteurs = calculer_compteurs(DemandeMaintenance.objects.all(), Equipement.objects.all())
+        CompteurStatistique.objects.bulk_create([
+            CompteurStatistique(portee=portee, objet_id=objet_id, indicateur=indicateur,
+                                valeur=valeur or '', nombre=nombre)
+            for (portee, objet_id, indicateur, valeur), nombre in compteurs.items()
+        ])
+    return len(compteurs)
+
+
+def statistiques_portee(portee='GLOBAL', objet_id=0):
+    """Compteurs matérialisés d'une portée : {'demandes': n, 'equipements': n, 'statut': {code: n}}"""
+    resultat = {
+        'demandes': 0,
+        'equipements': 0,
+        'statut': {s: 0 for s, _ in DemandeMaintenance.STATUT_CHOICES},
+    }
+    lignes = CompteurStatistique.objects.filter(
+        portee=portee, objet_id=objet_id, indicateur__in=['demandes', 'equipements', 'statut']
+    ).values_list('indicateur', 'valeur', 'nombre')
+    for indicateur, valeur, nombre in lignes:
+        if indicateur == 'statut':
+            resultat['statut'][valeur] = nombre
+        else:
+            resultat[indicateur] = nombre
+    return resultat
+
+
+def pannes_par_marque(limite=5):
+    """Marques ayant le plus de demandes, lues dans les compteurs matérialisés
+
+    Comme l'ancien agrégat sur Equipement, les marques d'équipements sans demande
+    complètent la liste avec 0 panne.
+    """
+    pannes = [
+        {'marque': valeur, 'nb_pannes': nombre}
+        for valeur, nombre in CompteurStatistique.objects.filter(
+            portee='GLOBAL', objet_id=0, indicateur='pannes_marque', nombre__gt=0
+        ).order_by('-nombre', 'valeur').values_list('valeur', 'nombre')[:limite]
+    ]
+    if len(pannes) < limite:
+        sans_panne = Equipement.objects.exclude(marque__in=[p['marque'] for p in pannes]).order_by(
+            'marque').values_list('marque', flat=True).distinct()[:limite - len(pannes)]
+        pannes += [{'marque': marque, 'nb_pannes': 0} for marque in sans_panne]
+    return pannes
+
+
+# ============= ACTIVITÉ DU JOURNAL =============
+# Table ActiviteJournal : actions comptées par heure et par jour (heure locale), action,
+# utilisateur et rôle, incrémentée à chaque écriture du journal (journal.ecrire_entrees).
+# L'en-tête et le graphique de la page des logs y lisent quelques lignes au lieu de
+# compter LogAction.
+
+CHAMPS_ACTIVITE = ('periode', 'debut', 'action', 'id_utilisateur', 'role')
+
+
+def debut_heure(date):
+    return timezone.localtime(date).replace(minute=0, second=0, microsecond=0)
+
+
+def debut_jour(date):
+    return timezone.localtime(date).replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def cles_activite(date_action, action, utilisateur_id, role):
+    """Clés des lignes ActiviteJournal auxquelles compte une action"""
+    return [
+        ('HEURE', debut_heure(date_action), action, utilisateur_id or 0, role or ''),
+        ('JOUR', debut_jour(date_action), action, utilisateur_id or 0, role or ''),
+    ]
+
+
+def compter_activite(logs):
+    """Ajoute des LogAction (ou lignes d'archive équivalentes) à ActiviteJournal"""
+    roles = dict(User.objects.filter(pk__in={log.utilisateur_id for log in logs if log.utilisateur_id})
+                 .values_list('pk', 'role'))
+    deltas = Counter()
+    for log in logs:
+        deltas.update(cles_activite(log.date_action, log.action, log.utilisateur_id, roles.get(log.utilisateur_id)))
+    incrementer(ActiviteJournal, CHAMPS_ACTIVITE, deltas)
+
+
+def calculer_activite(logs):
+    """Lignes ActiviteJournal recalculées depuis un queryset de LogAction"""
+    activite = Counter()
+    lignes = logs.annotate(heure=Trunc('date_action', 'hour')).values_list(
+        'heure', 'action', 'utilisateur_id', 'utilisateur__role'
+    ).annotate(nb=Count('pk')).order_by()
+    for heure, action, utilisateur_id, role, nb in lignes:
+        for cle in cles_activite(heure, action, utilisateur_id, role):
+            activite[cle] += nb
+    return activite
+
+
+def activite_filtree(periode, utilisateur=None, action=None):
+    lignes = ActiviteJournal.objects.filter(periode=periode)
+    if utilisateur:
+        lignes = lignes.filter(id_utilisateur=utilisateur.pk)
+    if action:
+        lignes = lignes.filter(action=action)
+    return lignes
+
+
+def resume_activite(utilisateur=None, action=None, date_debut=None, date_fin=None):
+    """{'total', 'aujourd_hui', 'cette_semaine'} du journal (archives comprises), en une requête"""
+    aujourd_hui = debut_jour(timezone.now())
+    jours = activite_filtree('JOUR', utilisateur, action)
+    if date_debut:
+        jours = jours.filter(debut__gte=debut_jour(timezone.make_aware(datetime.combine(date_debut, time.min))))
+    if date_fin:
+        jours = jours.filter(debut__lte=debut_jour(timezone.make_aware(datetime.combine(date_fin, time.min))))
+    resultat = jours.aggregate(
+        total=Sum('nombre'),
+        aujourd_hui=Sum('nombre', filter=Q(debut=aujourd_hui)),
+        cette_semaine=Sum('nombre', filter=Q(debut__gte=aujourd_hui - timedelta(days=6))),
+    )
+    return {cle: nombre or 0 for cle, nombre in resultat.items()}
+
+
+def graphique(valeurs):
+    """[(étiquette, nombre)] -> [{'etiquette', 'nombre', 'hauteur' (% du maximum)}] pour un histogramme HTML"""
+    maximum = max([nombre for _, nombre in valeurs] + [1])
+    return [{'etiquette': etiquette, 'nombre': nombre, 'hauteur': round(100 * nombre / maximum)}
+            for etiquette, nombre in valeurs]
+
+
+def activite_par_jour(nb_jours=30, utilisateur=None, action=None):
+    """Actions de chacun des nb_jours derniers jours (jours sans action compris)"""
+    aujourd_hui = debut_jour(timezone.now())
+    jours = [debut_jour(aujourd_hui - timedelta(days=n)) for n in range(nb_jours - 1, -1, -1)]
+    nombres = dict(activite_filtree('JOUR', utilisateur, action).filter(debut__gte=jours[0]).values_list(
+        'debut').annotate(nb=Sum('nombre')).order_by())
+    return graphique([(jour, nombres.get(jour, 0)) for jour in jours])
+
+
+def activite_par_heure(utilisateur=None, action=None):
+    """Actions de chaque heure de la journée en cours"""
+    aujourd_hui = debut_jour(timezone.now())
+    heures = [debut_heure(aujourd_hui + timedelta(hours=n)) for n in range(24)]
+    nombres = dict(activite_filtree('HEURE', utilisateur, action).filter(
+        debut__gte=aujourd_hui, debut__lt=aujourd_hui + timedelta(days=1)
+    ).values_list('debut').annotate(nb=Sum('nombre')).order_by())
+    return graphique([(heure, nombres.get(heure, 0)) for heure in heures])
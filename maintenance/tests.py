@@ -1,3 +1,1725 @@
-from django.test import TestCase
+from concurrent.futures import Future
+from datetime import timedelta
+from decimal import Decimal
+from io import BytesIO, StringIO
+from unittest import mock, skipUnless
+import csv
+import json
+import os
+import re
+import tempfile
+import zipfile
 
-# Create your tests here.
+from django.core import mail
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.mail.backends import locmem
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.http import StreamingHttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+from reportlab.platypus import SimpleDocTemplate
+
+from .models import (User, Direction, Bureau, CategorieEquipement, Equipement,
+                     DemandeMaintenance, Intervention, PieceRechange, FichierIntervention, LogAction,
+                     ImportJob, CompteurStatistique, EntreeRecherche, ArchiveJournal, ActiviteJournal, EmailSortant,
+                     Notification, ExportJob)
+from .statistiques import (compteurs_demandes, compteurs_interventions, calculer_compteurs, reconstruire_statistiques,
+                           statistiques_portee, pannes_par_marque, resume_activite, activite_par_jour)
+from .pagination import paginer_par_curseur, estimer_total
+from .recherche import moteur_recherche, rechercher_objets, suggerer_codes
+from .journal import (JournalActions, journal, nouvelle_entree, lire_reprise, rejouer_reprises, archiver_journal,
+                      archiver_mois, debut_mois, mois_suivant, lignes_archive, ecrire_entrees, reconstruire_activite)
+from .notifications import (mettre_en_file, reserver_emails, traiter_emails, notifier, envoyer_resumes,
+                            EMAILS_MAX_TENTATIVES)
+from .images import traiter_images
+from .importation import (ImportateurEquipements, ValidateurEquipements, lire_csv, detecter_format,
+                          executer_import, prochain_import, par_lots)
+from .views import log_action, reponse_csv_streaming
+from .rapports import (DocumentProgressif, generer_pdf_logs, prochain_export, executer_export, purger_exports,
+                       EXPORTS_CONSERVATION, interventions_pour_rapport, cle_rapport_intervention, rapport_intervention,
+                       generer_pdf_intervention, chemin_rapport_intervention)
+
+
+class DonneesMaintenanceMixin:
+    """Jeu de données commun : une demande par statut (x2) et quelques interventions"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user('admin', password='x', role='ADMIN')
+        cls.technicien = User.objects.create_user('tech', password='x', role='TECHNICIEN')
+        cls.employe = User.objects.create_user('emp', password='x', role='EMPLOYE')
+
+        cls.direction = direction = Direction.objects.create(nom='Direction')
+        cls.bureau = bureau = Bureau.objects.create(nom='Bureau', direction=direction)
+        categorie = CategorieEquipement.objects.create(nom='PC')
+        cls.equipement = Equipement.objects.create(
+            code_equipement='PC-001', nom='PC', marque='HP', date_acquisition='2024-01-01',
+            bureau=bureau, categorie=categorie,
+        )
+
+        statuts = [s for s, _ in DemandeMaintenance.STATUT_CHOICES] * 2
+        for i, statut in enumerate(statuts):
+            demande = DemandeMaintenance.objects.create(
+                equipement=cls.equipement, employe=cls.employe, technicien=cls.technicien,
+                description='Panne', statut=statut, urgence='HAUTE' if i % 2 else 'BASSE',
+            )
+            if statut in ('TERMINEE', 'VALIDEE'):
+                intervention = Intervention.objects.create(
+                    demande=demande, details='Réparé', type_reparation='EXTERNE' if i % 2 else 'INTERNE',
+                )
+                if i % 2:
+                    FichierIntervention.objects.create(intervention=intervention, fichier='rapport.pdf', taille=1)
+
+
+class CompteursTests(DonneesMaintenanceMixin, TestCase):
+
+    def test_compteurs_demandes(self):
+        with self.assertNumQueries(1):
+            compteurs = compteurs_demandes(DemandeMaintenance.objects.all())
+        self.assertEqual(compteurs['total'], 12)
+        self.assertEqual(compteurs['statut'], {s: 2 for s, _ in DemandeMaintenance.STATUT_CHOICES})
+        self.assertEqual(compteurs['urgence'], {'BASSE': 6, 'MOYENNE': 0, 'HAUTE': 6})
+
+    def test_compteurs_demandes_queryset_filtre(self):
+        compteurs = compteurs_demandes(DemandeMaintenance.objects.filter(urgence='HAUTE'))
+        self.assertEqual(compteurs['total'], 6)
+        self.assertEqual(compteurs['urgence']['BASSE'], 0)
+
+    def test_compteurs_interventions(self):
+        with self.assertNumQueries(1):
+            compteurs = compteurs_interventions(Intervention.objects.all())
+        self.assertEqual(compteurs['total'], 4)
+        self.assertEqual(compteurs['type_reparation'], {'INTERNE': 2, 'EXTERNE': 2})
+        self.assertEqual(compteurs['avec_fichiers'], 2)
+
+
+class RequetesTableauxDeBordTests(DonneesMaintenanceMixin, TestCase):
+    """Nombre de requêtes par page : session + utilisateur, puis celles de la vue"""
+
+    def assertRequetes(self, utilisateur, url, nombre):
+        self.client.force_login(utilisateur)
+        with self.assertNumQueries(nombre):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+
+    def test_employe_dashboard(self):
+        # compteurs + liste
+        self.assertRequetes(self.employe, reverse('employe_dashboard'), 4)
+
+    def test_technicien_dashboard(self):
+        # compteurs + liste
+        self.assertRequetes(self.technicien, reverse('technicien_dashboard'), 4)
+
+    def test_admin_dashboard(self):
+        # compteurs matérialisés, techniciens, demandes récentes, pannes par marque
+        # (complétées par les marques sans demande : moins de 5 marques en panne)
+        self.assertRequetes(self.admin, reverse('admin_dashboard'), 7)
+
+    def test_admin_liste_demandes(self):
+        # compteurs, listes du formulaire (catégories, techniciens), page par curseur
+        self.assertRequetes(self.admin, reverse('admin_liste_demandes'), 6)
+
+    def test_admin_liste_interventions(self):
+        # compteurs, pagination, techniciens du formulaire, page annotée
+        self.assertRequetes(self.admin, reverse('admin_liste_interventions'), 6)
+
+
+class CompteursMaterialisesTests(DonneesMaintenanceMixin, TestCase):
+    """Les compteurs tenus à jour par signaux doivent égaler un recalcul complet"""
+
+    def assertCompteursExacts(self):
+        attendus = {cle: n for cle, n in calculer_compteurs(DemandeMaintenance.objects.all(),
+                                                             Equipement.objects.all()).items() if n}
+        obtenus = {
+            (c.portee, c.objet_id, c.indicateur, c.valeur): c.nombre
+            for c in CompteurStatistique.objects.exclude(nombre=0)
+        }
+        self.assertEqual(obtenus, attendus)
+
+    def test_jeu_initial(self):
+        self.assertCompteursExacts()
+        statistiques = statistiques_portee('GLOBAL')
+        self.assertEqual(statistiques['demandes'], 12)
+        self.assertEqual(statistiques['equipements'], 1)
+        self.assertEqual(statistiques['statut']['EN_COURS'], 2)
+        self.assertEqual(statistiques_portee('TECHNICIEN', self.technicien.pk)['demandes'], 12)
+        self.assertEqual(pannes_par_marque(), [{'marque': 'HP', 'nb_pannes': 12}])
+
+    def test_changement_statut_et_technicien(self):
+        demande = DemandeMaintenance.objects.filter(statut='EN_ATTENTE').first()
+        demande.statut = 'EN_COURS'
+        demande.technicien = None
+        demande.save()
+        self.assertCompteursExacts()
+        self.assertEqual(statistiques_portee('TECHNICIEN', self.technicien.pk)['demandes'], 11)
+
+    def test_changement_marque_et_direction_equipement(self):
+        autre_bureau = Bureau.objects.create(nom='Autre', direction=Direction.objects.create(nom='Autre'))
+        self.equipement.marque = 'Dell'
+        self.equipement.bureau = autre_bureau
+        self.equipement.save()
+        self.assertCompteursExacts()
+        self.assertEqual(pannes_par_marque(), [{'marque': 'Dell', 'nb_pannes': 12}])
+        self.assertEqual(statistiques_portee('DIRECTION', self.direction.pk)['demandes'], 0)
+
+    def test_suppressions(self):
+        DemandeMaintenance.objects.filter(statut='REFUSEE').first().delete()
+        self.assertCompteursExacts()
+        self.equipement.delete()  # Supprime aussi ses demandes en cascade
+        self.assertCompteursExacts()
+        self.assertEqual(statistiques_portee('GLOBAL')['demandes'], 0)
+
+    def test_bureau_change_de_direction(self):
+        autre_direction = Direction.objects.create(nom='Autre')
+        self.bureau.direction = autre_direction
+        self.bureau.save()
+        self.assertCompteursExacts()
+        self.assertEqual(statistiques_portee('DIRECTION', autre_direction.pk)['demandes'], 12)
+        self.assertEqual(statistiques_portee('DIRECTION', autre_direction.pk)['equipements'], 1)
+
+    def test_suppression_bureau_direction_technicien(self):
+        self.technicien.delete()  # Ses demandes passent non assignées (SET_NULL)
+        self.assertCompteursExacts()
+        self.assertFalse(CompteurStatistique.objects.filter(portee='TECHNICIEN', objet_id=self.technicien.pk))
+
+        self.bureau.delete()  # L'équipement passe sans bureau (SET_NULL)
+        self.assertCompteursExacts()
+        self.assertEqual(statistiques_portee('GLOBAL')['demandes'], 12)
+
+        equipement = Equipement.objects.get(pk=self.equipement.pk)
+        equipement.bureau = Bureau.objects.create(nom='Nouveau', direction=self.direction)
+        equipement.save()
+        self.assertEqual(statistiques_portee('DIRECTION', self.direction.pk)['demandes'], 12)
+        self.direction.delete()  # Supprime ses bureaux en cascade
+        self.assertCompteursExacts()
+        self.assertFalse(CompteurStatistique.objects.filter(portee='DIRECTION'))
+
+    def test_pannes_par_marque_sans_demande(self):
+        Equipement.objects.create(code_equipement='PC-002', nom='PC', marque='Dell', date_acquisition='2024-01-01')
+        self.assertEqual(pannes_par_marque(), [{'marque': 'HP', 'nb_pannes': 12}, {'marque': 'Dell', 'nb_pannes': 0}])
+        DemandeMaintenance.objects.all().delete()
+        self.assertEqual(pannes_par_marque(), [{'marque': 'Dell', 'nb_pannes': 0}, {'marque': 'HP', 'nb_pannes': 0}])
+        self.assertEqual(pannes_par_marque(limite=1), [{'marque': 'Dell', 'nb_pannes': 0}])
+
+    def test_reconstruction_verrouille_avant_recalcul(self):
+        CompteurStatistique.objects.update(nombre=0)
+        with CaptureQueriesContext(connection) as requetes:
+            reconstruire_statistiques()
+        ordres = [q['sql'].split()[0] for q in requetes.captured_queries
+                  if not q['sql'].startswith(('SAVEPOINT', 'RELEASE'))]
+        self.assertEqual(ordres[0], 'DELETE')
+        self.assertCompteursExacts()
+
+
+class RequetesInterventionsTests(DonneesMaintenanceMixin, TestCase):
+    """Pages des interventions : nombre de requêtes constant quel que soit le nombre de lignes"""
+
+    def ajouter_interventions(self, nombre):
+        for _ in range(nombre):
+            demande = DemandeMaintenance.objects.create(
+                equipement=self.equipement, employe=self.employe, technicien=self.technicien,
+                description='Panne', statut='TERMINEE',
+            )
+            intervention = Intervention.objects.create(demande=demande, details='Réparé')
+            PieceRechange.objects.create(intervention=intervention, nom='RAM', prix_unitaire=Decimal('10.00'), quantite=2)
+            PieceRechange.objects.create(intervention=intervention, nom='Disque', prix_unitaire=Decimal('5.50'), quantite=1)
+            FichierIntervention.objects.create(intervention=intervention, fichier='devis.pdf', taille=1)
+
+    def assertRequetesConstantes(self, url, nombre):
+        self.client.force_login(self.admin)
+        for _ in range(2):
+            with self.assertNumQueries(nombre):
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.ajouter_interventions(3)
+
+    def test_admin_liste_interventions(self):
+        # compteurs, pagination, techniciens du formulaire, page
+        self.assertRequetesConstantes(reverse('admin_liste_interventions'), 6)
+
+    def test_admin_detail_intervention(self):
+        self.ajouter_interventions(1)
+        intervention = Intervention.objects.latest('pk')
+        # intervention, fichiers, pièces
+        self.assertRequetesConstantes(reverse('admin_detail_intervention', args=[intervention.pk]), 5)
+
+    def test_changelist_admin_interventions(self):
+        self.admin.is_staff = self.admin.is_superuser = True
+        self.admin.save()
+        # deux comptages, page, bornes et jours de date_hierarchy
+        self.assertRequetesConstantes(reverse('admin:maintenance_intervention_changelist'), 7)
+
+
+class TotauxInterventionTests(DonneesMaintenanceMixin, TestCase):
+    """cout_total et nb_fichiers suivent les pièces et les fichiers de l'intervention"""
+
+    def setUp(self):
+        self.intervention = Intervention.objects.first()
+        self.piece = PieceRechange.objects.create(
+            intervention=self.intervention, nom='RAM', prix_unitaire=Decimal('10.00'), quantite=2)
+        PieceRechange.objects.create(
+            intervention=self.intervention, nom='Disque', prix_unitaire=Decimal('5.50'), quantite=1)
+
+    def assertTotaux(self, cout_total, nb_fichiers):
+        self.intervention.refresh_from_db()
+        self.assertEqual(self.intervention.cout_total, Decimal(cout_total))
+        self.assertEqual(self.intervention.nb_fichiers, nb_fichiers)
+
+    def test_ajout_modification_suppression(self):
+        nb_fichiers = self.intervention.fichiers.count()
+        self.assertTotaux('25.50', nb_fichiers)
+
+        self.piece.quantite = 3
+        self.piece.save()
+        self.assertTotaux('35.50', nb_fichiers)
+
+        fichier = FichierIntervention.objects.create(intervention=self.intervention, fichier='devis.pdf', taille=1)
+        self.assertTotaux('35.50', nb_fichiers + 1)
+
+        self.piece.delete()
+        fichier.delete()
+        self.assertTotaux('5.50', nb_fichiers)
+
+    def test_enregistrement_intervention_conserve_totaux(self):
+        intervention = Intervention.objects.get(pk=self.intervention.pk)
+        PieceRechange.objects.create(intervention=intervention, nom='Clavier', prix_unitaire=Decimal('4.50'), quantite=1)
+        intervention.details = 'Modifié'
+        intervention.save()  # Instance périmée : ne doit pas écraser le nouveau total
+        self.assertTotaux('30.00', intervention.nb_fichiers)
+
+    def test_reconciliation(self):
+        Intervention.objects.filter(pk=self.intervention.pk).update(cout_total=0, nb_fichiers=7)
+
+        call_command('reconcilier_interventions', '--verifier', stdout=StringIO())
+        self.assertTotaux('0.00', 7)
+
+        sortie = StringIO()
+        call_command('reconcilier_interventions', stdout=sortie)
+        self.assertIn('1 intervention(s) corrigée(s)', sortie.getvalue())
+        self.assertTotaux('25.50', self.intervention.fichiers.count())
+
+    def test_filtre_et_tri_par_cout(self):
+        self.client.force_login(self.admin)
+        response = self.client.get(reverse('admin_liste_interventions'), {'cout_min': '20', 'tri': '-cout_total'})
+        self.assertEqual([i.pk for i in response.context['interventions']], [self.intervention.pk])
+
+
+@skipUnless(connection.vendor == 'sqlite', "Plans d'exécution propres à SQLite")
+class IndexFiltresTests(DonneesMaintenanceMixin, TestCase):
+    """Les requêtes des listes filtrées lisent l'index composite prévu, sans tri temporaire"""
+
+    def assertPlan(self, queryset, index):
+        plan = queryset.explain()
+        self.assertIn(index, plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_liste_demandes(self):
+        demandes = DemandeMaintenance.objects.order_by('-date_creation')
+        self.assertPlan(demandes[:25], 'demande_date_idx')
+        self.assertPlan(demandes.filter(statut='EN_COURS')[:25], 'demande_statut_date_idx')
+        self.assertPlan(demandes.filter(urgence='HAUTE')[:25], 'demande_urgence_date_idx')
+        self.assertPlan(demandes.filter(technicien=self.technicien)[:25], 'demande_technicien_date_idx')
+        self.assertPlan(demandes.filter(employe=self.employe)[:25], 'demande_employe_date_idx')
+
+    def test_listes_interventions_et_logs(self):
+        self.assertPlan(Intervention.objects.filter(type_reparation='INTERNE').order_by('-date_intervention')[:25],
+                        'intervention_type_date_idx')
+        logs = LogAction.objects.order_by('-date_action')
+        self.assertPlan(logs[:50], 'log_date_idx')
+        self.assertPlan(logs.filter(utilisateur=self.admin)[:50], 'log_utilisateur_date_idx')
+        self.assertPlan(logs.filter(action='ASSIGNATION')[:50], 'log_action_date_idx')
+
+
+class PaginationCurseurTests(TestCase):
+    """Parcours complet d'une liste page par page, dans les deux sens"""
+
+    @classmethod
+    def setUpTestData(cls):
+        # Dates en double pour vérifier le départage par identifiant
+        LogAction.objects.bulk_create([LogAction(action='ASSIGNATION', details=str(i)) for i in range(25)])
+        debut = timezone.now()
+        for i, log in enumerate(LogAction.objects.order_by('pk')):
+            LogAction.objects.filter(pk=log.pk).update(date_action=debut + timedelta(minutes=i // 2))
+        cls.attendus = list(LogAction.objects.order_by('-date_action', '-pk').values_list('pk', flat=True))
+
+    def page(self, url='?'):
+        return paginer_par_curseur(RequestFactory().get('/logs/' + url), LogAction.objects.all(), 'date_action', 10)
+
+    def test_parcours_avant_et_arriere(self):
+        pages = [self.page()]
+        while pages[-1].has_next():
+            pages.append(self.page(pages[-1].url_suivante()))
+        self.assertEqual([log.pk for page in pages for log in page], self.attendus)
+        self.assertEqual([len(page) for page in pages], [10, 10, 5])
+        self.assertFalse(pages[0].has_previous())
+
+        precedente = self.page(pages[-1].url_precedente())
+        self.assertEqual([log.pk for log in precedente], self.attendus[10:20])
+        self.assertTrue(precedente.has_next())
+
+        derniere = self.page(pages[0].url_derniere())
+        self.assertEqual([log.pk for log in derniere], self.attendus[15:])
+        self.assertFalse(derniere.has_next())
+
+    def test_parametres_conserves_et_curseur_invalide(self):
+        page = self.page('?action=ASSIGNATION&apres=nimporte_quoi')
+        self.assertEqual([log.pk for log in page], self.attendus[:10])
+        self.assertIn('action=ASSIGNATION', page.url_suivante())
+
+    def test_estimer_total(self):
+        self.assertEqual(estimer_total(LogAction.objects.all()), (25, False))
+        self.assertEqual(estimer_total(LogAction.objects.all(), plafond=20), (20, True))
+
+
+class RechercheTests(DonneesMaintenanceMixin, TestCase):
+    """Index de recherche tenu à jour par signaux, interrogé par le moteur de la base"""
+
+    def setUp(self):
+        self.imprimante = DemandeMaintenance.objects.create(
+            equipement=self.equipement, employe=self.employe, description="L'imprimante réseau du secrétariat bourre",
+        )
+        self.ecran = DemandeMaintenance.objects.create(
+            equipement=self.equipement, employe=self.employe, description="Écran noir, imprimante ok",
+        )
+
+    def trouver(self, requete, modele=DemandeMaintenance):
+        return [objet.pk for objet in rechercher_objets(requete, modele)]
+
+    def test_prefixe_accents_et_mots(self):
+        self.assertCountEqual(self.trouver('imprim'), [self.imprimante.pk, self.ecran.pk])
+        self.assertEqual(self.trouver('reseau secretariat'), [self.imprimante.pk])
+        self.assertEqual(self.trouver('ecran'), [self.ecran.pk])
+        self.assertEqual(self.trouver('"OR*'), [])
+        self.assertEqual(self.trouver('PC-001', Equipement), [self.equipement.pk])
+
+    def test_modification_et_suppression(self):
+        self.imprimante.description = 'Clavier cassé'
+        self.imprimante.save()
+        self.assertEqual(self.trouver('imprimante'), [self.ecran.pk])
+        self.assertEqual(self.trouver('clavier'), [self.imprimante.pk])
+        self.ecran.delete()
+        self.assertEqual(self.trouver('imprimante'), [])
+
+    def test_filtre_logs(self):
+        LogAction.objects.create(action='ASSIGNATION', details='Technicien assigné à la demande réseau')
+        LogAction.objects.create(action='ASSIGNATION', details='Autre chose')
+        logs = moteur_recherche().filtrer(LogAction.objects.all(), 'LOG', 'reseau')
+        self.assertEqual([log.details for log in logs], ['Technicien assigné à la demande réseau'])
+
+    @override_settings(RECHERCHE_MOTEUR='maintenance.recherche.MoteurRecherche')
+    def test_moteur_generique(self):
+        self.assertEqual(self.trouver('réseau secrétariat'), [self.imprimante.pk])
+        self.assertEqual(moteur_recherche().filtrer(Equipement.objects.all(), 'EQUIPEMENT', 'hp').count(), 1)
+
+    def test_page_recherche(self):
+        self.client.force_login(self.admin)
+        response = self.client.get(reverse('admin_recherche'), {'q': 'imprimante'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['nb_resultats'], 2)
+
+    def test_reconstruction(self):
+        EntreeRecherche.objects.all().delete()
+        call_command('reconstruire_recherche', stdout=StringIO())
+        self.assertEqual(self.trouver('bourre'), [self.imprimante.pk])
+
+
+class AutocompletionCodesTests(DonneesMaintenanceMixin, TestCase):
+    """Suggestions de codes : préfixe, fautes de saisie, direction de l'employé"""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        categorie = CategorieEquipement.objects.get()
+        for code in ['PC-002', 'PC-010', 'IMP-001']:
+            Equipement.objects.create(code_equipement=code, nom=code, marque='HP', date_acquisition='2024-01-01',
+                                      bureau=cls.bureau, categorie=categorie)
+        autre_bureau = Bureau.objects.create(nom='Autre', direction=Direction.objects.create(nom='Autre'))
+        Equipement.objects.create(code_equipement='PC-003', nom='PC-003', marque='HP', date_acquisition='2024-01-01',
+                                  bureau=autre_bureau, categorie=categorie)
+        Equipement.objects.create(code_equipement='PC-020', nom='PC-020', marque='HP', date_acquisition='2024-01-01',
+                                  bureau=None, categorie=categorie)
+        cls.employe.direction = cls.direction
+        cls.employe.save()
+
+    def codes(self, saisie, direction=None):
+        return [suggestion['code'] for suggestion in suggerer_codes(saisie, direction)]
+
+    def test_prefixe(self):
+        self.assertEqual(self.codes('pc-00'), ['PC-001', 'PC-002', 'PC-003'])
+        self.assertEqual(self.codes('PC-00', self.direction), ['PC-001', 'PC-002'])
+        self.assertEqual(self.codes('PC-02', self.direction), ['PC-020'])  # Sans bureau : accepté par le formulaire
+        self.assertEqual(self.codes(''), [])
+
+    def test_fautes_de_saisie(self):
+        self.assertEqual(self.codes('PC-0O1'), ['PC-001'])
+        self.assertEqual(self.codes('PC 0I0'), ['PC-010'])
+        self.assertEqual(self.codes('PC-0001', self.direction)[0], 'PC-001')  # Plus proche d'abord
+        self.assertFalse(suggerer_codes('PC-0O1')[0]['exact'])
+
+    def test_vue_limitee_a_la_direction(self):
+        self.client.force_login(self.employe)
+        with self.assertNumQueries(4):  # session, utilisateur, préfixe, squelette
+            response = self.client.get(reverse('autocompletion_equipements'), {'q': 'PC-00'})
+        self.assertEqual([r['code'] for r in response.json()['resultats']], ['PC-001', 'PC-002'])
+
+
+class SoumissionDemandeTests(DonneesMaintenanceMixin, TestCase):
+    """Création d'une demande : validation du code en une requête, nombre de requêtes fixe"""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.employe.direction = cls.direction
+        cls.employe.save()
+        cls.libre = Equipement.objects.create(
+            code_equipement='PC-100', nom='PC', marque='Dell', date_acquisition='2024-01-01',
+            bureau=cls.bureau, categorie=cls.equipement.categorie,
+        )
+
+    def soumettre(self, code):
+        return self.client.post(reverse('employe_creer_demande'), {
+            'code_equipement': code, 'urgence': 'MOYENNE', 'description': 'Écran noir',
+        })
+
+    def test_nombre_de_requetes(self):
+        self.client.force_login(self.employe)
+        # session, utilisateur, équipement (+ direction et demande active), début de transaction,
+        # demande, état pour les compteurs, création + mise à jour des compteurs,
+        # index de la demande, fin de transaction (le log est écrit plus tard par journal.py)
+        with self.assertNumQueries(10):
+            response = self.soumettre('PC-100')
+        self.assertRedirects(response, reverse('employe_dashboard'), fetch_redirect_response=False)
+        demande = DemandeMaintenance.objects.get(equipement=self.libre)
+        self.assertEqual(demande.employe, self.employe)
+        self.assertEqual(statistiques_portee('DIRECTION', self.direction.pk)['statut']['EN_ATTENTE'], 3)
+
+    def test_equipement_deja_en_maintenance(self):
+        self.client.force_login(self.employe)
+        response = self.soumettre('PC-001')
+        active = DemandeMaintenance.objects.filter(
+            equipement=self.equipement, statut__in=DemandeMaintenance.STATUTS_ACTIFS
+        ).latest('date_creation')
+        self.assertContains(response, f"Demande #{active.pk} - {active.get_statut_display()}")
+
+    def test_equipement_hors_direction(self):
+        autre_bureau = Bureau.objects.create(nom='Autre', direction=Direction.objects.create(nom='Autre'))
+        Equipement.objects.create(code_equipement='PC-200', nom='PC', marque='HP', date_acquisition='2024-01-01',
+                                  bureau=autre_bureau, categorie=self.equipement.categorie)
+        self.client.force_login(self.employe)
+        self.assertContains(self.soumettre('PC-200'), 'Équipement hors de votre direction')
+        self.assertContains(self.soumettre('XX-999'), 'Aucun équipement trouvé')
+
+
+@mock.patch.object(JournalActions, 'demarrer')  # Écritures déclenchées par le test, pas par le thread
+class JournalActionsTests(DonneesMaintenanceMixin, TestCase):
+    """Journal différé : file, écriture par lots, fichier de reprise"""
+
+    def setUp(self):
+        self.dossier = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dossier.cleanup)
+        self.journal = JournalActions(self.dossier.name, taille_lot=2)
+
+    def entree(self, details):
+        return nouvelle_entree(self.admin.pk, 'ASSIGNATION', 'DemandeMaintenance', 1, details, '127.0.0.1')
+
+    def test_ecriture_par_lots(self, demarrer):
+        entrees = [self.entree(f'Action réseau {i}') for i in range(3)]
+        for entree in entrees:
+            self.journal.ajouter(entree)
+        demarrer.assert_called()
+        self.assertFalse(LogAction.objects.exists())
+        with open(self.journal.chemin_reprise) as fichier:
+            self.assertEqual(len(fichier.readlines()), 3)
+
+        # 2 lots : point de sauvegarde, logs, index, rôles, activité (création + incrément), libération
+        with self.assertNumQueries(14):
+            self.assertTrue(self.journal.vider())
+        logs = LogAction.objects.order_by('pk')
+        self.assertEqual([log.details for log in logs], [e['details'] for e in entrees])
+        self.assertEqual(logs[0].date_action.isoformat(), entrees[0]['date_action'])
+        self.assertEqual(len(moteur_recherche().rechercher('reseau', 'LOG')), 3)
+        self.assertEqual(os.path.getsize(self.journal.chemin_reprise), 0)
+
+    def test_echec_ecriture_conserve_les_entrees(self, demarrer):
+        self.journal.ajouter(self.entree('Première'))
+        with mock.patch('maintenance.journal.ecrire_entrees', side_effect=RuntimeError), \
+                self.assertLogs('maintenance.journal', 'ERROR'):
+            self.assertFalse(self.journal.vider())
+        self.assertFalse(LogAction.objects.exists())
+        self.assertTrue(self.journal.vider())
+        self.assertEqual(LogAction.objects.get().details, 'Première')
+
+    def test_rejouer_apres_arret_brutal(self, demarrer):
+        premiere, deuxieme, troisieme = (dict(self.entree(d), numero=n) for n, d in enumerate('ABC', start=1))
+        with open(os.path.join(self.dossier.name, 'journal-999-0f1e2d3c.jsonl'), 'w') as fichier:
+            for ligne in [premiere, deuxieme, {'ecrit': 2}, troisieme]:
+                fichier.write(json.dumps(ligne) + '\n')
+            fichier.write('{"utilisateur_id": 1, "act')  # Ligne interrompue par l'arrêt
+        self.assertEqual(rejouer_reprises(self.dossier.name), 1)
+        self.assertEqual(LogAction.objects.get().details, 'C')
+        self.assertEqual(os.listdir(self.dossier.name), [])
+
+    def test_pid_reutilise_ne_reprend_pas_un_fichier(self, demarrer):
+        arrete = JournalActions(self.dossier.name, taille_lot=2)
+        arrete.ajouter(self.entree('Avant arrêt'))
+        self.journal.ajouter(self.entree('Après redémarrage'))  # Même PID
+        self.assertNotEqual(self.journal.chemin_reprise, arrete.chemin_reprise)
+        self.assertTrue(self.journal.vider())
+        self.assertEqual([e['details'] for e in lire_reprise(arrete.chemin_reprise)], ['Avant arrêt'])
+        self.assertEqual(rejouer_reprises(self.dossier.name), 1)
+        self.assertEqual(sorted(LogAction.objects.values_list('details', flat=True)),
+                         ['Après redémarrage', 'Avant arrêt'])
+
+    def test_vue_admin_lit_le_journal_vide(self, demarrer):
+        self.client.force_login(self.admin)
+        with mock.patch.object(journal, 'dossier', self.dossier.name):
+            with self.captureOnCommitCallbacks(execute=True):
+                log_action(self.admin, 'ASSIGNATION', details='Assignation réseau')
+            self.assertFalse(LogAction.objects.exists())
+            response = self.client.get(reverse('admin_liste_logs'))
+        self.assertContains(response, 'Assignation réseau')
+
+    def test_admin_django_lit_le_journal_vide(self, demarrer):
+        self.admin.is_staff = self.admin.is_superuser = True
+        self.admin.save()
+        self.client.force_login(self.admin)
+        with mock.patch.object(journal, 'dossier', self.dossier.name):
+            with self.captureOnCommitCallbacks(execute=True):
+                log_action(self.admin, 'ASSIGNATION', details='Assignation réseau')
+            self.assertFalse(LogAction.objects.exists())
+            response = self.client.get(reverse('admin:maintenance_logaction_changelist'))
+            self.assertContains(response, 'Assignation')
+            log = LogAction.objects.get()
+            self.assertEqual(log.details, 'Assignation réseau')
+            self.assertEqual(self.client.get(reverse('admin:maintenance_logaction_change', args=[log.pk])).status_code, 200)
+
+    def test_admin_django_actions_des_autres_processus(self, demarrer):
+        # Retard borné par JOURNAL_DELAI_MS : visibles dès que le thread de l'autre processus écrit
+        self.admin.is_staff = self.admin.is_superuser = True
+        self.admin.save()
+        self.client.force_login(self.admin)
+        autre_processus = JournalActions(self.dossier.name)
+        autre_processus.ajouter(self.entree('Autre processus'))
+        url = reverse('admin:maintenance_logaction_changelist')
+        with mock.patch.object(journal, 'dossier', self.dossier.name):
+            self.assertEqual(self.client.get(url).context['cl'].result_count, 0)  # Fichier de reprise non relu
+            self.assertTrue(autre_processus.vider())
+            self.assertEqual(self.client.get(url).context['cl'].result_count, 1)
+        self.assertEqual(LogAction.objects.filter(details='Autre processus').count(), 1)
+
+
+class ArchivageJournalTests(DonneesMaintenanceMixin, TestCase):
+    """Archivage des mois anciens du journal et consultation des archives"""
+
+    def setUp(self):
+        dossier = tempfile.TemporaryDirectory()
+        self.addCleanup(dossier.cleanup)
+        patcher = mock.patch('maintenance.journal.JOURNAL_DOSSIER_ARCHIVES', dossier.name)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.dossier = dossier.name
+        self.ancien = timezone.now() - timedelta(days=400)
+
+    def log(self, details, date_action, utilisateur=None):
+        return LogAction.objects.create(action='ASSIGNATION', details=details, date_action=date_action,
+                                        utilisateur=utilisateur or self.admin)
+
+    def test_archivage_par_mois(self):
+        self.log('Câble réseau remplacé', self.ancien)
+        self.log('Autre action', self.ancien)
+        self.log('Mois précédent', self.ancien - timedelta(days=40))
+        recent = self.log('Récent', timezone.now())
+
+        archives = archiver_journal(180)
+        self.assertEqual(sorted(archive.nb_entrees for archive in archives), [1, 2])
+        self.assertEqual(list(LogAction.objects.all()), [recent])
+        self.assertEqual(EntreeRecherche.objects.filter(type_objet='LOG').count(), 1)
+        self.assertEqual(len(os.listdir(self.dossier)), 2)
+        self.assertEqual(archiver_journal(180), [])
+
+        # Une action ancienne arrivée plus tard rejoint l'archive de son mois
+        self.log('Rejouée', self.ancien)
+        archive, = archiver_journal(180)
+        self.assertEqual(archive.nb_entrees, 3)
+        self.assertEqual(ArchiveJournal.objects.count(), 2)
+        self.assertEqual(len(os.listdir(self.dossier)), 2)
+
+    def test_limites_du_mois(self):
+        debut = debut_mois(self.ancien)
+        fin = mois_suivant(debut)
+        self.log('Premier instant', debut)
+        self.log('Dernier instant', fin - timedelta(microseconds=1))
+        suivant = self.log('Mois suivant', fin)
+        precedent = self.log('Mois précédent', debut - timedelta(microseconds=1))
+
+        archive = archiver_mois(debut)
+        self.assertEqual(archive.nb_entrees, 2)
+        self.assertCountEqual(LogAction.objects.all(), [suivant, precedent])
+        self.assertEqual(sorted(ligne['details'] for ligne in lignes_archive(archive)), ['Dernier instant', 'Premier instant'])
+
+    def test_consultation_archive(self):
+        log = self.log('Câble réseau remplacé', self.ancien, self.technicien)
+        self.log('Autre action', self.ancien)
+        archive, = archiver_journal(180)
+
+        self.client.force_login(self.admin)
+        response = self.client.get(reverse('admin_liste_logs'), {'archive': archive.pk, 'recherche': 'cable RESEAU'})
+        self.assertEqual([(l.pk, l.utilisateur) for l in response.context['logs']], [(log.pk, self.technicien)])
+        self.assertContains(response, 'Câble réseau remplacé')
+
+        response = self.client.get(reverse('admin_export_logs_csv'), {'archive': archive.pk})
+        contenu = b''.join(response.streaming_content).decode()
+        self.assertIn('Câble réseau remplacé', contenu)
+        self.assertIn('Autre action', contenu)
+
+
+class ActiviteJournalTests(DonneesMaintenanceMixin, TestCase):
+    """Activité pré-agrégée du journal : incrémentée à l'écriture, lue par la page des logs"""
+
+    def setUp(self):
+        maintenant = timezone.now()
+        entrees = [
+            nouvelle_entree(self.admin.pk, 'ASSIGNATION', details='Aujourd\'hui'),
+            nouvelle_entree(self.admin.pk, 'ASSIGNATION', details='Aujourd\'hui'),
+            nouvelle_entree(self.employe.pk, 'DEMANDE_CREATION', details='Il y a trois jours'),
+            nouvelle_entree(None, 'IMPORT_CSV', details='Il y a un an'),
+        ]
+        entrees[2]['date_action'] = (maintenant - timedelta(days=3)).isoformat()
+        entrees[3]['date_action'] = (maintenant - timedelta(days=365)).isoformat()
+        ecrire_entrees(entrees)
+
+    def lignes(self):
+        return set(ActiviteJournal.objects.values_list('periode', 'debut', 'action', 'id_utilisateur', 'role', 'nombre'))
+
+    def test_incrementee_a_l_ecriture(self):
+        self.assertEqual(resume_activite(), {'total': 4, 'aujourd_hui': 2, 'cette_semaine': 3})
+        self.assertEqual(resume_activite(utilisateur=self.employe), {'total': 1, 'aujourd_hui': 0, 'cette_semaine': 1})
+        self.assertEqual(resume_activite(action='IMPORT_CSV')['total'], 1)
+        jours = activite_par_jour(30)
+        self.assertEqual(len(jours), 30)
+        self.assertEqual((jours[-1]['nombre'], jours[-1]['hauteur']), (2, 100))
+        self.assertEqual((jours[-4]['nombre'], jours[-4]['hauteur']), (1, 50))
+        self.assertEqual(ActiviteJournal.objects.get(periode='JOUR', action='DEMANDE_CREATION').role, 'EMPLOYE')
+
+    def test_reconstruction_archives_comprises(self):
+        attendu = self.lignes()
+        with tempfile.TemporaryDirectory() as dossier, \
+                mock.patch('maintenance.journal.JOURNAL_DOSSIER_ARCHIVES', dossier):
+            archiver_journal(180)
+            self.assertEqual(LogAction.objects.count(), 3)
+            self.assertEqual(self.lignes(), attendu)  # L'archivage ne touche pas l'activité
+            reconstruire_activite()
+        self.assertEqual(self.lignes(), attendu)
+
+    def test_page_des_logs(self):
+        self.client.force_login(self.admin)
+        # session, utilisateur, utilisateurs (filtre), page de logs, résumé, 30 jours, 24 heures, archives (filtre)
+        with self.assertNumQueries(8):
+            response = self.client.get(reverse('admin_liste_logs'))
+        self.assertEqual(response.context['stats'], {'total': 4, 'aujourd_hui': 2, 'cette_semaine': 3})
+        self.assertEqual(response.context['activite_jours'][-1]['nombre'], 2)
+        self.assertEqual(sum(heure['nombre'] for heure in response.context['activite_heures']), 2)
+
+
+class FileEmailsTests(DonneesMaintenanceMixin, TestCase):
+    """Emails mis en file par les vues, envoyés par lots par le worker avec nouvelles tentatives"""
+
+    def setUp(self):
+        self.employe.email = 'emp@example.com'
+        self.employe.save()
+        self.demande = DemandeMaintenance.objects.filter(statut='EN_COURS').first()
+
+    def terminer(self):
+        self.client.force_login(self.technicien)
+        return self.client.post(reverse('technicien_changer_statut', args=[self.demande.pk]), {'statut': 'TERMINEE'})
+
+    def test_mis_en_file_puis_envoye(self):
+        self.terminer()
+        self.assertEqual(len(mail.outbox), 0)  # Rien n'est envoyé pendant la requête
+        email = EmailSortant.objects.get(demande=self.demande)
+        self.assertEqual((email.statut, email.destinataires), ('EN_ATTENTE', ['emp@example.com']))
+        self.terminer()  # Statut renvoyé avant l'envoi : pas de doublon
+        self.assertEqual(EmailSortant.objects.count(), 1)
+
+        self.assertEqual(traiter_emails(), (1, 0))
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].subject, f"Demande #{self.demande.pk} - Réparation terminée")
+        email.refresh_from_db()
+        self.assertEqual((email.statut, email.tentatives), ('ENVOYE', 1))
+        self.demande.refresh_from_db()
+        self.assertTrue(self.demande.email_envoye)
+        self.terminer()
+        self.assertEqual(EmailSortant.objects.count(), 1)
+
+    def test_assignation_et_refus_seulement_en_resume(self):
+        self.technicien.email = 'tech@example.com'
+        self.technicien.save()
+        self.assertIsNone(notifier(self.demande, 'ASSIGNEE'))
+        self.assertIsNone(notifier(self.demande, 'REFUSEE'))
+        self.assertFalse(Notification.objects.exists())
+        self.assertFalse(EmailSortant.objects.exists())
+
+    def test_une_connexion_par_lot(self):
+        for i in range(3):
+            mettre_en_file(f'Sujet {i}', 'Message', ['emp@example.com'])
+        with mock.patch.object(locmem.EmailBackend, 'open', autospec=True) as ouverture:
+            self.assertEqual(traiter_emails(taille_lot=10), (3, 0))
+        self.assertEqual(ouverture.call_count, 1)
+        self.assertEqual(len(mail.outbox), 3)
+
+    def test_nouvelles_tentatives_puis_echec(self):
+        email = mettre_en_file('Sujet', 'Message', ['emp@example.com'])
+        with mock.patch.object(locmem.EmailBackend, 'send_messages', side_effect=OSError('SMTP injoignable')):
+            self.assertEqual(traiter_emails(), (0, 1))
+            email.refresh_from_db()
+            self.assertEqual((email.statut, email.tentatives), ('EN_ATTENTE', 1))
+            self.assertIn('SMTP injoignable', email.derniere_erreur)
+            self.assertGreater(email.prochain_essai, timezone.now() + timedelta(seconds=50))
+            self.assertEqual(reserver_emails(), [])  # Pas encore dû
+
+            for _ in range(EMAILS_MAX_TENTATIVES - 1):
+                EmailSortant.objects.filter(pk=email.pk).update(prochain_essai=timezone.now())
+                traiter_emails()
+        email.refresh_from_db()
+        self.assertEqual((email.statut, email.tentatives), ('ECHEC', EMAILS_MAX_TENTATIVES))
+        self.assertEqual(reserver_emails(), [])
+
+    def test_reservation_abandonnee_reprise(self):
+        email = mettre_en_file('Sujet', 'Message', ['emp@example.com'])
+        self.assertEqual(reserver_emails(), [email])
+        self.assertEqual(reserver_emails(), [])  # Déjà réservé par un autre worker
+        EmailSortant.objects.filter(pk=email.pk).update(date_reservation=timezone.now() - timedelta(hours=1))
+        self.assertEqual(traiter_emails(), (1, 0))
+
+
+@mock.patch('maintenance.notifications.NOTIFICATIONS_RESUME', True)
+class ResumesNotificationsTests(DonneesMaintenanceMixin, TestCase):
+    """Mode résumé : notifications en attente, un email par destinataire et par fenêtre"""
+
+    def setUp(self):
+        User.objects.filter(pk__in=[self.employe.pk, self.technicien.pk]).update(email='x@example.com')
+        self.demandes = list(DemandeMaintenance.objects.filter(statut='EN_COURS'))
+
+    def test_regroupees_par_destinataire(self):
+        self.client.force_login(self.technicien)
+        for demande in self.demandes:
+            self.client.post(reverse('technicien_changer_statut', args=[demande.pk]), {'statut': 'TERMINEE'})
+        notifier(self.demandes[0], 'REFUSEE')
+        self.assertEqual(EmailSortant.objects.count(), 0)
+        self.assertEqual(Notification.objects.filter(email__isnull=True).count(), 3)
+
+        self.assertEqual(envoyer_resumes(), 0)  # Fenêtre de 24 h pas encore écoulée
+        Notification.objects.filter(destinataire=self.employe).update(
+            date_creation=timezone.now() - timedelta(hours=25))
+        self.assertEqual(envoyer_resumes(), 1)
+        resume = EmailSortant.objects.get()
+        self.assertEqual(resume.sujet, 'Maintenance EP Mostaganem - 2 notification(s)')
+        for demande in self.demandes:
+            self.assertIn(f"demande de maintenance #{demande.pk}", resume.message)
+        self.assertEqual(Notification.objects.filter(email=resume).count(), 2)
+
+        self.assertEqual(traiter_emails(), (1, 0))
+        self.assertEqual(DemandeMaintenance.objects.filter(pk__in=[d.pk for d in self.demandes],
+                                                           email_envoye=True).count(), 2)
+        self.assertEqual(envoyer_resumes(tous=True), 1)  # Le technicien
+        self.assertFalse(Notification.objects.filter(email__isnull=True).exists())
+
+    def test_nombre_de_requetes_fixe(self):
+        # point de sauvegarde, notifications (+ destinataires et demandes), emails, rattachement, fin
+        for demande in self.demandes:
+            notifier(demande, 'ASSIGNEE')
+        with self.assertNumQueries(5):
+            envoyer_resumes(tous=True)
+        autre = User.objects.create_user('tech2', password='x', role='TECHNICIEN', email='t@example.com')
+        for demande in DemandeMaintenance.objects.all():
+            demande.technicien = autre if demande.pk % 2 else self.technicien
+            notifier(demande, 'ASSIGNEE')
+        with self.assertNumQueries(5):
+            self.assertEqual(envoyer_resumes(tous=True), 2)
+        self.assertEqual(Notification.objects.filter(email__isnull=True).count(), 0)
+
+    @mock.patch('maintenance.notifications.TAILLE_LOT_IDS', 2)
+    def test_identifiants_par_lots(self):
+        techniciens = [self.technicien] + [
+            User.objects.create_user(f'tech{i}', password='x', role='TECHNICIEN', email=f't{i}@example.com')
+            for i in range(2)
+        ] + [User.objects.create_user('sans_adresse', password='x', role='TECHNICIEN')]
+        for demande in DemandeMaintenance.objects.all()[:5]:
+            for technicien in techniciens:
+                demande.technicien = technicien
+                notifier(demande, 'ASSIGNEE')
+        self.assertEqual(envoyer_resumes(tous=True), 3)
+        for technicien in techniciens[:3]:
+            self.assertEqual(Notification.objects.filter(destinataire=technicien, email__isnull=False).count(), 5)
+        self.assertFalse(Notification.objects.filter(destinataire=techniciens[3]).exists())
+        self.assertEqual(traiter_emails(), (3, 0))
+        self.assertEqual(EmailSortant.objects.filter(statut='ENVOYE').count(), 3)
+
+    def test_destinataire_sans_adresse(self):
+        self.technicien.email = ''
+        self.technicien.save()
+        notifier(self.demandes[0], 'ASSIGNEE')
+        self.assertEqual(envoyer_resumes(tous=True), 0)
+        self.assertFalse(Notification.objects.exists())
+
+
+class MiniaturesImagesTests(DonneesMaintenanceMixin, TestCase):
+    """Images jointes : miniature et aperçu générés par le worker, orientés et sans EXIF"""
+
+    def setUp(self):
+        dossier = tempfile.TemporaryDirectory()
+        self.addCleanup(dossier.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=dossier.name))
+        self.intervention = Intervention.objects.first()
+
+    def photo(self, nom='photo.jpg', largeur=2000, hauteur=1000, orientation=6):
+        """Photo de téléphone : paysage enregistré, à tourner d'un quart de tour (EXIF)"""
+        exif = Image.Exif()
+        exif[0x0112] = orientation
+        sortie = BytesIO()
+        Image.new('RGB', (largeur, hauteur), 'red').save(sortie, 'JPEG', exif=exif.tobytes())
+        return FichierIntervention.objects.create(intervention=self.intervention, type_fichier='PHOTO_AVANT',
+                                                  fichier=SimpleUploadedFile(nom, sortie.getvalue()))
+
+    def test_generees_par_le_worker(self):
+        fichier = self.photo()
+        self.assertEqual(fichier.derives_statut, 'EN_ATTENTE')
+        self.assertEqual(fichier.url_miniature(), fichier.fichier.url)  # Original en attendant
+
+        self.assertEqual(traiter_images(), (1, 0))
+        fichier.refresh_from_db()
+        self.assertEqual(fichier.derives_statut, 'TERMINE')
+        for champ, taille in ((fichier.miniature, (160, 320)), (fichier.apercu, (640, 1280))):
+            with champ.open('rb') as contenu:
+                image = Image.open(contenu)
+                self.assertEqual(image.size, taille)  # Portrait : orientation appliquée
+                self.assertEqual(len(image.getexif()), 0)
+        self.assertLess(fichier.miniature.size, fichier.taille)
+
+        self.client.force_login(self.admin)
+        response = self.client.get(reverse('admin_detail_intervention', args=[self.intervention.pk]))
+        self.assertContains(response, f'src="{fichier.miniature.url}"')
+        self.assertContains(response, f'href="{fichier.apercu.url}"')
+
+    def test_image_illisible_et_documents(self):
+        illisible = FichierIntervention.objects.create(intervention=self.intervention,
+                                                       fichier=SimpleUploadedFile('photo.png', b'pas une image'))
+        document = FichierIntervention.objects.create(intervention=self.intervention,
+                                                      fichier=SimpleUploadedFile('devis.pdf', b'%PDF'))
+        self.assertEqual(document.derives_statut, 'AUCUN')
+        self.assertEqual(traiter_images(), (0, 1))
+        illisible.refresh_from_db()
+        self.assertEqual((illisible.derives_statut, illisible.url_miniature()), ('ECHEC', illisible.fichier.url))
+
+    def test_rattrapage(self):
+        fichier = self.photo(orientation=1)
+        FichierIntervention.objects.filter(pk=fichier.pk).update(derives_statut='AUCUN')  # Ajoutée avant le worker
+        call_command('rattraper_miniatures', stdout=StringIO())
+        fichier.refresh_from_db()
+        self.assertEqual(fichier.derives_statut, 'TERMINE')
+        with fichier.miniature.open('rb') as contenu:
+            self.assertEqual(Image.open(contenu).size, (320, 160))
+
+        call_command('rattraper_miniatures', '--toutes', stdout=StringIO())
+        fichier.refresh_from_db()
+        _, derives = fichier.miniature.storage.listdir(os.path.dirname(fichier.miniature.name))
+        self.assertEqual(len(derives), 2)  # Anciennes versions supprimées avant régénération
+
+
+ENTETE_IMPORT = 'code_equipement,nom,marque,date_acquisition,description_technique,bureau,direction,categorie\n'
+
+
+def fichier_csv(texte, nom='equipements.csv', encodage='utf-8'):
+    return SimpleUploadedFile(nom, texte.encode(encodage))
+
+
+def importer_csv(texte, taille_lot=2):
+    importateur = ImportateurEquipements(taille_lot)
+    importateur.importer(lire_csv(fichier_csv(texte)))
+    return importateur
+
+
+def import_ligne_par_ligne(texte):
+    """Ancien import de la vue (update_or_create ligne par ligne), référence des comparaisons"""
+    reader = csv.DictReader(StringIO(texte))
+    crees = mis_a_jour = 0
+    erreurs = []
+    for row in reader:
+        try:
+            bureau = None
+            if row.get('bureau') and row.get('direction'):
+                direction, _ = Direction.objects.get_or_create(nom=row['direction'])
+                bureau, _ = Bureau.objects.get_or_create(nom=row['bureau'], direction=direction)
+            categorie = None
+            if row.get('categorie'):
+                categorie, _ = CategorieEquipement.objects.get_or_create(nom=row['categorie'])
+            _, cree = Equipement.objects.update_or_create(code_equipement=row['code_equipement'], defaults={
+                'nom': row['nom'], 'marque': row['marque'], 'date_acquisition': row['date_acquisition'],
+                'description_technique': row.get('description_technique', ''), 'bureau': bureau,
+                'categorie': categorie,
+            })
+            if cree:
+                crees += 1
+            else:
+                mis_a_jour += 1
+        except Exception:
+            erreurs.append(reader.line_num)
+    return crees, mis_a_jour, erreurs
+
+
+def etat_equipements():
+    return list(Equipement.objects.order_by('pk').values_list(
+        'pk', 'nom', 'marque', 'date_acquisition', 'description_technique', 'bureau__nom',
+        'bureau__direction__nom', 'categorie__nom'))
+
+
+class Annulation(Exception):
+    pass
+
+
+class ImportateurEquipementsTests(DonneesMaintenanceMixin, TestCase):
+    """Moteur d'import par lots : mêmes résultats que l'ancien import ligne par ligne"""
+
+    CSV = ENTETE_IMPORT + (
+        'PC-001,PC renommé,HP,2024-01-01,,Bureau,Direction,PC\n'         # Existant : mis à jour
+        'PC-500,Imprimante,Canon,2023-05-10,Laser,Accueil,Port,Imprimante\n'
+        'PC-501,Écran,Dell,2023-13-01,,Accueil,Port,\n'                  # Date invalide
+        'PC-502,Routeur\n'                                                # Ligne incomplète
+        'PC-503,Scanner,Epson,2022-02-02,,,,\n'
+        'PC-500,Imprimante,Canon,2023-05-10,Laser,Accueil,Port,Imprimante\n'  # Doublon dans le fichier
+    )
+
+    def test_comme_l_ancien_import(self):
+        with self.assertRaises(Annulation), transaction.atomic():
+            crees, mis_a_jour, erreurs = import_ligne_par_ligne(self.CSV)
+            attendu = etat_equipements()
+            raise Annulation
+
+        importateur = importer_csv(self.CSV)
+        self.assertEqual(importateur.count_created, crees)
+        self.assertEqual(importateur.count_updated + importateur.count_unchanged, mis_a_jour)
+        self.assertEqual([numero for numero, _ in importateur.errors], erreurs)
+        self.assertEqual(erreurs, [4, 5])
+        self.assertEqual(etat_equipements(), attendu)
+
+    def test_referentiels_crees_en_masse(self):
+        texte = ENTETE_IMPORT + ''.join(
+            f'EQ-{i:03},Poste,HP,2024-01-01,,Bureau {i % 3},Direction {i % 2},Catégorie {i % 4}\n' for i in range(12))
+        importer_csv(texte, taille_lot=5)
+        self.assertEqual(Direction.objects.filter(nom__startswith='Direction ').count(), 2)
+        self.assertEqual(Bureau.objects.filter(nom__startswith='Bureau ').count(), 6)
+        self.assertEqual(CategorieEquipement.objects.filter(nom__startswith='Catégorie ').count(), 4)
+        equipement = Equipement.objects.select_related('bureau__direction', 'categorie').get(pk='EQ-007')
+        self.assertEqual((equipement.bureau.nom, equipement.bureau.direction.nom, equipement.categorie.nom),
+                         ('Bureau 1', 'Direction 1', 'Catégorie 3'))
+
+    def test_reimport_met_a_jour(self):
+        importer_csv(self.CSV)
+        importateur = importer_csv(self.CSV.replace('Laser', 'Jet d\'encre'))
+        self.assertEqual((importateur.count_created, importateur.count_updated, importateur.count_unchanged),
+                         (0, 1, 3))
+        self.assertEqual(Equipement.objects.get(pk='PC-500').description_technique, 'Jet d\'encre')
+        self.assertEqual(EntreeRecherche.objects.filter(type_objet='EQUIPEMENT', objet_id='PC-500').count(), 1)
+
+    def test_requetes_fixes_par_lot(self):
+        def requetes(debut, nombre):
+            lignes = [(i + 2, {
+                'code_equipement': f'LOT-{i:04}', 'nom': 'Poste', 'marque': 'HP', 'date_acquisition': '2024-01-01',
+                'description_technique': '', 'bureau': f'B{i}', 'direction': f'D{i}', 'categorie': f'C{i}',
+            }) for i in range(debut, debut + nombre)]
+            with CaptureQueriesContext(connection) as contexte:
+                ImportateurEquipements().traiter_lot(lignes)
+            return len(contexte)
+
+        self.assertEqual(requetes(0, 5), requetes(100, 60))
+
+
+class LectureCsvTests(TestCase):
+    """Lecture du CSV par blocs : encodage et séparateur détectés, décodage incrémental"""
+
+    def lignes(self, fichier):
+        return [(numero, row['code_equipement'], row['nom']) for numero, row in lire_csv(fichier)]
+
+    def test_excel_cp1252_point_virgule(self):
+        fichier = fichier_csv('code_equipement;nom\nPC-1;Écran été\nPC-2;Unité centrale\n', encodage='cp1252')
+        self.assertEqual(detecter_format(fichier), ('cp1252', ';'))
+        self.assertEqual(self.lignes(fichier), [(2, 'PC-1', 'Écran été'), (3, 'PC-2', 'Unité centrale')])
+
+    def test_bom_utf8(self):
+        fichier = SimpleUploadedFile('bom.csv', '\ufeffcode_equipement,nom\nPC-1,Écran\n'.encode('utf-8'))
+        self.assertEqual(detecter_format(fichier), ('utf-8-sig', ','))
+        self.assertEqual(self.lignes(fichier), [(2, 'PC-1', 'Écran')])  # En-tête sans BOM
+
+    def test_caractere_coupe_entre_deux_blocs(self):
+        texte = 'code_equipement,nom\nPC-1,Écran\nPC-2,Clé\n'
+        contenu = texte.encode('utf-8')
+        coupure = contenu.index('É'.encode('utf-8')) + 1  # Au milieu des deux octets de « É »
+        for taille in (coupure, 1):
+            # File (comme le fichier stocké lu par le worker) : chunks() respecte la taille de bloc
+            fichier = File(BytesIO(contenu), name='blocs.csv')
+            fichier.DEFAULT_CHUNK_SIZE = taille
+            self.assertIn(b'\xc3', [bloc[-1:] for bloc in fichier.chunks()])  # Un bloc finit au milieu de « É »
+            self.assertEqual(self.lignes(fichier), [(2, 'PC-1', 'Écran'), (3, 'PC-2', 'Clé')])
+
+    def test_fin_sans_saut_de_ligne(self):
+        fichier = File(BytesIO('code_equipement,nom\r\nPC-1,Écran\r\nPC-2,Clé'.encode('utf-8')), name='crlf.csv')
+        fichier.DEFAULT_CHUNK_SIZE = 4
+        self.assertEqual(self.lignes(fichier), [(2, 'PC-1', 'Écran'), (3, 'PC-2', 'Clé')])
+
+
+class ImportEnArrierePlanTests(DonneesMaintenanceMixin, TestCase):
+    """Import mis en file par la vue, exécuté par traiter_imports, repris après un arrêt"""
+
+    CSV = ENTETE_IMPORT + (
+        'IMP-1,Poste,HP,2024-01-01,,Accueil,Port,PC\n'
+        'IMP-2,Poste,HP,2024-01-01,,Accueil,Port,PC\n'
+        'IMP-3,Poste,HP,2024-01-01,,Accueil,Port,PC\n'
+        'IMP-1,Poste,HP,2024-01-01,,Accueil,Port,PC\n'   # Doublon de la ligne 2, après le point de reprise
+        'IMP-5,Poste,HP,2024-13-01,,Accueil,Port,PC\n'
+    )
+
+    def setUp(self):
+        dossier = tempfile.TemporaryDirectory()
+        self.addCleanup(dossier.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=dossier.name))
+
+    def job(self, simulation=False):
+        return ImportJob.objects.create(fichier=fichier_csv(self.CSV), nom_fichier='equipements.csv',
+                                        simulation=simulation, cree_par=self.admin)
+
+    def interrompre(self, job, classe):
+        """Exécute l'import en tuant le worker pendant le deuxième lot"""
+        original = classe.traiter_lot
+        appels = []
+
+        def traiter_lot(importateur, lot):
+            appels.append(lot)
+            if len(appels) == 2:
+                raise SystemExit  # Arrêt brutal : ni ECHEC ni TERMINE
+            return original(importateur, lot)
+
+        job = prochain_import()
+        with mock.patch.object(classe, 'traiter_lot', traiter_lot), self.assertRaises(SystemExit):
+            executer_import(job, taille_lot=2)
+        job.refresh_from_db()
+        self.assertEqual((job.statut, job.lignes_traitees), ('EN_COURS', 2))
+        # Plus de battement de cœur : le prochain worker le reprend
+        ImportJob.objects.filter(pk=job.pk).update(date_maj=timezone.now() - timedelta(minutes=10))
+        return prochain_import()
+
+    def test_vue_puis_worker(self):
+        self.client.force_login(self.admin)
+        response = self.client.post(reverse('admin_import_equipements_csv'), {'csv_file': fichier_csv(self.CSV)})
+        self.assertRedirects(response, reverse('admin_import_equipements_csv'))
+        job = ImportJob.objects.get()
+        self.assertEqual((job.statut, job.simulation, job.cree_par), ('EN_ATTENTE', False, self.admin))
+        self.assertFalse(Equipement.objects.filter(pk__startswith='IMP-').exists())
+
+        call_command('traiter_imports', '--une-fois', stdout=StringIO())
+        job.refresh_from_db()
+        self.assertEqual((job.statut, job.lignes_total, job.lignes_traitees), ('TERMINE', 5, 5))
+        self.assertEqual((job.nb_crees, job.nb_mis_a_jour, job.nb_inchanges, job.nb_erreurs), (3, 0, 1, 1))
+        self.assertEqual(Equipement.objects.filter(pk__startswith='IMP-').count(), 3)
+        self.assertEqual(list(job.erreurs.values_list('ligne', flat=True)), [6])
+
+    def test_reprise_apres_arret(self):
+        job = self.interrompre(self.job(), ImportateurEquipements)
+        self.assertEqual(job.statut, 'EN_COURS')
+        self.assertEqual(Equipement.objects.filter(pk__startswith='IMP-').count(), 2)  # Premier lot validé
+
+        job = executer_import(job, taille_lot=2)
+        self.assertEqual((job.statut, job.lignes_traitees), ('TERMINE', 5))
+        self.assertEqual((job.nb_crees, job.nb_mis_a_jour, job.nb_inchanges, job.nb_erreurs), (3, 0, 1, 1))
+        self.assertEqual(list(job.erreurs.values_list('ligne', flat=True)), [6])
+
+    def test_reprise_simulation_doublons(self):
+        job = self.interrompre(self.job(simulation=True), ValidateurEquipements)
+        job = executer_import(job, taille_lot=2)
+        self.assertEqual(job.statut, 'TERMINE')
+        self.assertEqual(list(job.erreurs.filter(niveau='ERREUR').values_list('ligne', 'message')), [
+            (5, 'Code IMP-1 en double dans le fichier (déjà ligne 2)'),
+            (6, mock.ANY),
+        ])
+        # Bureau inconnu signalé une seule fois, avant l'arrêt
+        self.assertEqual(job.erreurs.filter(niveau='AVERTISSEMENT').count(), 1)
+        self.assertEqual((job.nb_crees, job.nb_erreurs), (3, 2))
+        self.assertFalse(Equipement.objects.filter(pk__startswith='IMP-').exists())
+
+    def test_progression(self):
+        job = self.job()
+        ImportJob.objects.filter(pk=job.pk).update(statut='EN_COURS', lignes_total=5, lignes_traitees=2, nb_crees=2)
+        self.client.force_login(self.admin)
+        donnees = self.client.get(reverse('admin_import_progression', args=[job.pk])).json()
+        self.assertEqual((donnees['statut'], donnees['termine'], donnees['progression'], donnees['nb_crees']),
+                         ('EN_COURS', False, 40, 2))
+        self.client.force_login(self.employe)
+        self.assertEqual(self.client.get(reverse('admin_import_progression', args=[job.pk])).status_code, 302)
+
+
+class SimulationImportTests(DonneesMaintenanceMixin, TestCase):
+    """Simulation : tout le fichier est validé, rien n'est écrit"""
+
+    def valider(self, texte, taille_lot=2):
+        validateur = ValidateurEquipements(taille_lot)
+        with CaptureQueriesContext(connection) as contexte:
+            validateur.importer(lire_csv(fichier_csv(texte)))
+        ecritures = [q['sql'] for q in contexte.captured_queries
+                     if q['sql'].split(None, 1)[0].upper() in ('INSERT', 'UPDATE', 'DELETE')]
+        self.assertEqual(ecritures, [])
+        return validateur
+
+    def test_rien_n_est_ecrit(self):
+        avant = (etat_equipements(), Direction.objects.count(), Bureau.objects.count(),
+                 CategorieEquipement.objects.count(), EntreeRecherche.objects.count())
+        validateur = self.valider(ENTETE_IMPORT + (
+            'PC-001,PC renommé,HP,2024-01-01,,Bureau,Direction,PC\n'
+            'SIM-1,Poste,HP,2024-01-01,,Nouveau,Direction,Nouvelle\n'
+            'SIM-2,Poste,HP,2024-01-01,,,,\n'
+        ))
+        self.assertEqual((validateur.count_created, validateur.count_updated, validateur.count_unchanged), (2, 1, 0))
+        self.assertEqual(avant, (etat_equipements(), Direction.objects.count(), Bureau.objects.count(),
+                                 CategorieEquipement.objects.count(), EntreeRecherche.objects.count()))
+
+    def test_erreurs_avec_numeros_de_ligne(self):
+        validateur = self.valider(ENTETE_IMPORT + (
+            'SIM-1,Poste,HP,2024-01-01,,Bureau,Direction,PC\n'      # Ligne 2 : connu, valide
+            'SIM-2,Poste,HP,31/12/2024,,Bureau,Direction,PC\n'      # 3 : date invalide
+            'SIM-3,Poste\n'                                          # 4 : colonnes manquantes
+            'SIM-1,Poste,HP,2024-01-01,,Bureau,Direction,PC\n'      # 5 : doublon de la ligne 2
+            'SIM-6,Poste,HP,2024-01-01,,Magasin,Direction,PC\n'     # 6 : bureau inconnu
+            'SIM-7,Poste,HP,2024-01-01,,Magasin,Direction,PC\n'     # 7 : signalé une seule fois
+        ))
+        erreurs = dict(validateur.errors)
+        self.assertEqual(sorted(erreurs), [3, 4, 5])
+        self.assertIn('31/12/2024', erreurs[3])
+        self.assertEqual(erreurs[4], 'Champ obligatoire manquant : marque')
+        self.assertEqual(erreurs[5], 'Code SIM-1 en double dans le fichier (déjà ligne 2)')
+        self.assertEqual(validateur.warnings, [
+            (6, 'Bureau « Magasin » inconnu dans la direction « Direction » (sera créé)'),
+        ])
+        self.assertEqual(validateur.count_created, 3)
+
+    def test_colonnes_obligatoires_absentes(self):
+        validateur = self.valider('code_equipement,nom\nSIM-1,Poste\nSIM-2,Poste\nSIM-3,Poste\n')
+        self.assertEqual(validateur.errors, [(1, 'Colonnes obligatoires absentes : marque, date_acquisition')])
+        self.assertEqual(validateur.count_created, 0)
+
+
+class EmpreinteImportTests(DonneesMaintenanceMixin, TestCase):
+    """Empreinte des équipements : une ligne identique à la base n'est pas réécrite"""
+
+    CSV = ENTETE_IMPORT + ''.join(
+        f'EMP-{i},Poste {i},HP,2024-01-0{i},Config {i},Bureau,Direction,PC\n' for i in range(1, 6))
+
+    def reimporter(self, texte):
+        with CaptureQueriesContext(connection) as contexte:
+            importateur = importer_csv(texte)
+        mises_a_jour = [q['sql'] for q in contexte.captured_queries
+                        if q['sql'].startswith('UPDATE "maintenance_equipement"')]
+        return importateur, mises_a_jour
+
+    def test_fichier_identique(self):
+        importer_csv(self.CSV)
+        importateur, mises_a_jour = self.reimporter(self.CSV)
+        self.assertEqual((importateur.count_created, importateur.count_updated, importateur.count_unchanged), (0, 0, 5))
+        self.assertEqual(mises_a_jour, [])
+
+    def test_un_champ_modifie(self):
+        importer_csv(self.CSV)
+        avant = etat_equipements()
+        importateur, mises_a_jour = self.reimporter(self.CSV.replace('Config 3', 'Config 3 (SSD)'))
+        self.assertEqual((importateur.count_created, importateur.count_updated, importateur.count_unchanged), (0, 1, 4))
+        self.assertEqual(len(mises_a_jour), 1)
+        self.assertTrue(mises_a_jour[0].endswith("""IN ('EMP-3')"""))  # Seule la ligne modifiée
+        modifies = [ligne for ligne in etat_equipements() if ligne not in avant]
+        self.assertEqual([(ligne[0], ligne[4]) for ligne in modifies], [('EMP-3', 'Config 3 (SSD)')])
+
+
+# Lignes telles que les écrivaient les exports CSV avant le streaming (instances, HttpResponse)
+def ancienne_ligne_demande(d):
+    return [str(d.pk), d.date_creation.strftime('%Y-%m-%d %H:%M'), d.equipement.code_equipement,
+            d.employe.get_full_name(), d.technicien.get_full_name() if d.technicien else 'Non assigné',
+            d.get_urgence_display(), d.get_statut_display(), d.description[:100]]
+
+
+def ancienne_ligne_equipement(e):
+    return [e.code_equipement, e.nom, e.marque, e.categorie.nom if e.categorie else '',
+            e.bureau.nom if e.bureau else '', e.bureau.direction.nom if e.bureau else '',
+            e.date_acquisition.strftime('%Y-%m-%d')]
+
+
+def ancienne_ligne_log(log):
+    return [log.date_action.strftime('%Y-%m-%d'), log.date_action.strftime('%H:%M:%S'),
+            log.utilisateur.get_full_name() if log.utilisateur else 'Système',
+            log.utilisateur.get_role_display() if log.utilisateur else '-', log.get_action_display(),
+            log.type_objet or '-', str(log.objet_id or '-'), log.details[:200], log.adresse_ip or '-']
+
+
+class ExportsCsvStreamingTests(DonneesMaintenanceMixin, TestCase):
+    """Exports CSV en streaming : même contenu que les anciennes réponses, filtres compris"""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.admin.first_name, cls.admin.last_name = 'Amel', 'Benali'
+        cls.admin.save()
+        cls.technicien2 = User.objects.create_user('tech2', password='x', role='TECHNICIEN', first_name='Karim')
+        DemandeMaintenance.objects.create(equipement=cls.equipement, employe=cls.employe, description='Écran, "noir"\n' * 20,
+                                          urgence='MOYENNE')
+        DemandeMaintenance.objects.filter(pk=DemandeMaintenance.objects.order_by('pk').first().pk).update(
+            technicien=cls.technicien2)
+        Equipement.objects.create(code_equipement='IMP-001', nom='Imprimante', marque='Canon', date_acquisition='2023-05-02')
+        maintenant = timezone.now()
+        for i, (utilisateur, action) in enumerate([(cls.admin, 'ASSIGNATION'), (cls.admin, 'EXPORT_CSV'),
+                                                   (cls.employe, 'DEMANDE_CREATION'), (None, 'IMPORT_CSV')]):
+            LogAction.objects.create(utilisateur=utilisateur, action=action, type_objet='DemandeMaintenance' if i % 2 else '',
+                                     objet_id=i or None, details=f'Action {i}, ' + 'x' * 300,
+                                     adresse_ip='10.0.0.1' if i % 2 else None,
+                                     date_action=maintenant - timedelta(days=10 * i))
+
+    def exporter(self, nom_url, **filtres):
+        self.client.force_login(self.admin)
+        response = self.client.get(reverse(nom_url), filtres)
+        self.assertIsInstance(response, StreamingHttpResponse)
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        contenu = b''.join(response.streaming_content).decode('utf-8')
+        return response, list(csv.reader(StringIO(contenu)))
+
+    def test_demandes(self):
+        response, lignes = self.exporter('export_demandes_csv')
+        self.assertRegex(response['Content-Disposition'], r'^attachment; filename="demandes_\d{8}\.csv"$')
+        self.assertEqual(lignes[0], ['ID', 'Date', 'Équipement', 'Employé', 'Technicien', 'Urgence', 'Statut', 'Description'])
+        demandes = DemandeMaintenance.objects.order_by('-date_creation')
+        self.assertEqual(lignes[1:], [ancienne_ligne_demande(d) for d in demandes])
+
+    def test_demandes_filtrees(self):
+        _, lignes = self.exporter('export_demandes_csv', statut='TERMINEE', urgence='HAUTE',
+                                  technicien=self.technicien.pk)
+        demandes = DemandeMaintenance.objects.filter(statut='TERMINEE', urgence='HAUTE',
+                                                     technicien=self.technicien).order_by('-date_creation')
+        self.assertEqual(lignes[1:], [ancienne_ligne_demande(d) for d in demandes])
+        self.assertEqual(len(lignes), 3)
+
+    def test_equipements(self):
+        response, lignes = self.exporter('export_equipements_csv')
+        self.assertRegex(response['Content-Disposition'], r'^attachment; filename="equipements_\d{8}\.csv"$')
+        self.assertEqual(lignes[0], ['Code', 'Nom', 'Marque', 'Catégorie', 'Bureau', 'Direction', 'Date Acquisition'])
+        equipements = Equipement.objects.order_by('code_equipement')
+        self.assertEqual(lignes[1:], [ancienne_ligne_equipement(e) for e in equipements])
+        self.assertEqual([ligne[0] for ligne in lignes[1:]], ['IMP-001', 'PC-001'])
+
+    def test_equipements_filtres(self):
+        _, lignes = self.exporter('export_equipements_csv', marque='can')
+        self.assertEqual(lignes[1:], [ancienne_ligne_equipement(Equipement.objects.get(code_equipement='IMP-001'))])
+        _, lignes = self.exporter('export_equipements_csv', bureau=self.bureau.pk)
+        self.assertEqual(lignes[1:], [ancienne_ligne_equipement(Equipement.objects.get(code_equipement='PC-001'))])
+
+    def test_logs(self):
+        response, lignes = self.exporter('admin_export_logs_csv')
+        self.assertRegex(response['Content-Disposition'], r'^attachment; filename="logs_\d{8}_\d{4}\.csv"$')
+        self.assertEqual(lignes[0], ['Date', 'Heure', 'Utilisateur', 'Rôle', 'Action', 'Type Objet', 'ID Objet',
+                                     'Détails', 'IP'])
+        logs = LogAction.objects.order_by('-date_action')
+        self.assertEqual(lignes[1:], [ancienne_ligne_log(log) for log in logs])
+        self.assertEqual(lignes[-1][2:4], ['Système', '-'])
+
+    def test_logs_filtres(self):
+        jour = timezone.localdate() - timedelta(days=10)
+        filtres = [
+            ({'utilisateur': self.admin.pk}, LogAction.objects.filter(utilisateur=self.admin)),
+            ({'action': 'DEMANDE_CREATION'}, LogAction.objects.filter(action='DEMANDE_CREATION')),
+            ({'date_debut': jour.isoformat(), 'date_fin': jour.isoformat()},
+             LogAction.objects.filter(details__startswith='Action 1,')),
+        ]
+        for parametres, attendus in filtres:
+            with self.subTest(**parametres):
+                _, lignes = self.exporter('admin_export_logs_csv', **parametres)
+                self.assertEqual(lignes[1:], [ancienne_ligne_log(log) for log in attendus.order_by('-date_action')])
+                self.assertTrue(lignes[1:])
+
+    def test_envoi_par_blocs(self):
+        lus = []
+
+        def lignes():
+            for i in range(5):
+                lus.append(i)
+                yield [i, f'ligne {i}']
+
+        response = reponse_csv_streaming('test.csv', ['N', 'Texte'], lignes(), lignes_par_bloc=2)
+        self.assertEqual(lus, [])  # Rien n'est lu avant l'envoi
+        blocs = list(response.streaming_content)
+        self.assertEqual(len(blocs), 3)
+        self.assertEqual(b''.join(blocs).decode(), 'N,Texte\r\n' + ''.join(f'{i},ligne {i}\r\n' for i in range(5)))
+
+
+def pages_pdf(contenu):
+    return len(re.findall(rb'/Type /Page\b', contenu))
+
+
+class ExportLogsPdfTests(DonneesMaintenanceMixin, TestCase):
+    """Export PDF des logs : filtres appliqués, mise en page progressive, passage en arrière-plan"""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        maintenant = timezone.now()
+        entrees = [
+            (cls.admin, 'ASSIGNATION', 'Assignation au technicien', 1),
+            (cls.admin, 'EXPORT_CSV', 'Export des équipements', 5),
+            (cls.employe, 'DEMANDE_CREATION', "Panne de l'imprimante", 12),
+            (cls.technicien, 'ASSIGNATION', 'Assignation reprise', 30),
+        ]
+        ecrire_entrees([
+            dict(nouvelle_entree(utilisateur.pk, action, details=details),
+                 date_action=(maintenant - timedelta(days=jours)).isoformat())
+            for utilisateur, action, details, jours in entrees
+        ])
+
+    def logs_exportes(self, **filtres):
+        """Détails des logs passés au générateur PDF par la vue"""
+        self.client.force_login(self.admin)
+        with mock.patch('maintenance.rapports.generer_pdf_logs') as generer:
+            response = self.client.get(reverse('admin_export_logs_pdf'), filtres)
+        self.assertEqual(response.status_code, 200)
+        logs, _ = generer.call_args.args
+        return sorted(log.details for log in logs)
+
+    def test_chaque_filtre_est_applique(self):
+        jour = timezone.localdate()
+        filtres = [
+            ({}, ['Assignation au technicien', 'Assignation reprise', 'Export des équipements', "Panne de l'imprimante"]),
+            ({'utilisateur': self.employe.pk}, ["Panne de l'imprimante"]),
+            ({'action': 'ASSIGNATION'}, ['Assignation au technicien', 'Assignation reprise']),
+            ({'date_debut': (jour - timedelta(days=6)).isoformat()}, ['Assignation au technicien', 'Export des équipements']),
+            ({'date_fin': (jour - timedelta(days=6)).isoformat()}, ['Assignation reprise', "Panne de l'imprimante"]),
+            ({'recherche': 'imprimante'}, ["Panne de l'imprimante"]),
+            ({'action': 'ASSIGNATION', 'date_fin': (jour - timedelta(days=6)).isoformat()}, ['Assignation reprise']),
+        ]
+        for parametres, attendus in filtres:
+            with self.subTest(**parametres):
+                self.assertEqual(self.logs_exportes(**parametres), attendus)
+
+    def test_pdf_directement_sous_le_seuil(self):
+        self.client.force_login(self.admin)
+        response = self.client.get(reverse('admin_export_logs_pdf'), {'action': 'ASSIGNATION'})
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        self.assertTrue(b''.join(response.streaming_content).startswith(b'%PDF'))
+        self.assertFalse(ExportJob.objects.exists())
+
+    def test_arriere_plan_au_dela_du_seuil(self):
+        self.client.force_login(self.admin)
+        with mock.patch('maintenance.views.EXPORT_INLINE_MAX_LIGNES', 1):
+            response = self.client.get(reverse('admin_export_logs_pdf'), {'action': 'ASSIGNATION'})
+        self.assertRedirects(response, reverse('mes_exports'))
+        job = ExportJob.objects.get()
+        self.assertEqual((job.type_export, job.parametres, job.demande_par, job.statut),
+                         ('LOGS_PDF', {'action': 'ASSIGNATION'}, self.admin, 'EN_ATTENTE'))
+
+    def test_mise_en_page_progressive(self):
+        LogAction.objects.bulk_create([LogAction(utilisateur=self.admin, action='ASSIGNATION', details=f'Log {i}')
+                                       for i in range(100)])
+        logs = LogAction.objects.order_by('-date_action')
+        lots_lus, lots_lus_par_page = [], []
+
+        def par_lots_comptes(lignes, taille):
+            for lot in par_lots(lignes, taille):
+                lots_lus.append(lot)
+                yield lot
+
+        def debut_page(doc):
+            lots_lus_par_page.append(len(lots_lus))
+            SimpleDocTemplate.handle_pageBegin(doc)
+
+        sortie = BytesIO()
+        with mock.patch('maintenance.rapports.par_lots', par_lots_comptes), \
+                mock.patch.object(DocumentProgressif, 'handle_pageBegin', debut_page):
+            generer_pdf_logs(logs, sortie)
+        # Les lots sont lus au fil des pages, jamais d'avance : au début de la page n, au plus n lots
+        self.assertEqual(len(lots_lus), 4)
+        self.assertEqual(lots_lus_par_page[:3], [0, 1, 2])
+        self.assertTrue(all(lus <= page for page, lus in enumerate(lots_lus_par_page)))
+
+        # Même document qu'avec SimpleDocTemplate.build() sur la liste complète
+        une_fois = BytesIO()
+        with mock.patch.object(DocumentProgressif, 'construire', lambda doc, elements: doc.build(list(elements))):
+            generer_pdf_logs(logs, une_fois)
+        self.assertEqual(pages_pdf(sortie.getvalue()), pages_pdf(une_fois.getvalue()))
+        self.assertEqual(pages_pdf(sortie.getvalue()), len(lots_lus_par_page))
+
+
+class FileExportsTests(DonneesMaintenanceMixin, TestCase):
+    """Exports en arrière-plan : mise en file, réservation, génération, purge et téléchargement"""
+
+    def setUp(self):
+        dossier = tempfile.TemporaryDirectory()
+        self.addCleanup(dossier.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=dossier.name))
+        self.enterContext(mock.patch('maintenance.views.EXPORT_INLINE_MAX_LIGNES', 1))
+
+    def export(self, statut='EN_ATTENTE', **champs):
+        return ExportJob.objects.create(type_export='DEMANDES_PDF', demande_par=self.admin, statut=statut, **champs)
+
+    def test_mise_en_file_des_demandes(self):
+        self.client.force_login(self.admin)
+        response = self.client.get(reverse('export_demandes_pdf'), {'statut': 'TERMINEE'})
+        self.assertRedirects(response, reverse('mes_exports'))
+        job = ExportJob.objects.get()
+        self.assertEqual((job.type_export, job.parametres, job.demande_par), ('DEMANDES_PDF', {'statut': 'TERMINEE'}, self.admin))
+
+    def test_mise_en_file_d_une_intervention(self):
+        intervention = Intervention.objects.first()
+        PieceRechange.objects.bulk_create([PieceRechange(intervention=intervention, nom=f'Pièce {i}', prix_unitaire=1)
+                                           for i in range(2)])
+        self.client.force_login(self.technicien)
+        for nom_url, type_export in [('export_intervention_pdf', 'INTERVENTION_PDF'),
+                                     ('export_intervention_word', 'INTERVENTION_WORD')]:
+            with self.subTest(type_export):
+                response = self.client.get(reverse(nom_url, args=[intervention.pk]))
+                self.assertRedirects(response, reverse('mes_exports'))
+                job = ExportJob.objects.get(type_export=type_export)
+                self.assertEqual((job.parametres, job.demande_par), ({'intervention': intervention.pk}, self.technicien))
+
+    def test_reservation(self):
+        recent = self.export('EN_COURS', date_debut=timezone.now() - timedelta(minutes=5))
+        abandonne = self.export('EN_COURS', date_debut=timezone.now() - timedelta(minutes=45))
+        en_attente = self.export()
+        self.export('TERMINE')
+
+        reserves = [prochain_export(), prochain_export()]
+        self.assertCountEqual([job.pk for job in reserves], [abandonne.pk, en_attente.pk])
+        self.assertTrue(all(job.statut == 'EN_COURS' and job.date_debut > timezone.now() - timedelta(minutes=1)
+                            for job in reserves))
+        self.assertIsNone(prochain_export())  # Celui en cours depuis 5 minutes n'est pas repris
+        recent.refresh_from_db()
+        self.assertEqual(recent.statut, 'EN_COURS')
+
+    def test_generation(self):
+        self.export(parametres={'statut': 'TERMINEE'})
+        job = executer_export(prochain_export())
+        self.assertEqual(job.statut, 'TERMINE')
+        self.assertRegex(job.fichier.name, r'^exports/\d{4}/\d{2}/demandes_\d{8}_\d{4}.*\.pdf$')
+        with job.fichier.open('rb') as fichier:
+            self.assertEqual(fichier.read(4), b'%PDF')
+
+    def test_generation_en_echec(self):
+        self.export()
+        with mock.patch.dict('maintenance.rapports.GENERATEURS', {'DEMANDES_PDF': mock.Mock(side_effect=ValueError('filtre'))}):
+            job = executer_export(prochain_export())
+        self.assertEqual((job.statut, job.message), ('ECHEC', 'Erreur lors de la génération: filtre'))
+        self.assertFalse(job.fichier)
+
+    def test_purge(self):
+        ancien, recent = self.export(), self.export()
+        executer_export(prochain_export())
+        executer_export(prochain_export())
+        ancien.refresh_from_db()
+        oublie = self.export()  # En attente : jamais purgé
+        ExportJob.objects.filter(pk__in=[ancien.pk, oublie.pk]).update(
+            date_creation=timezone.now() - EXPORTS_CONSERVATION - timedelta(hours=1))
+
+        self.assertEqual(purger_exports(), 1)
+        self.assertCountEqual(ExportJob.objects.values_list('pk', flat=True), [recent.pk, oublie.pk])
+        self.assertFalse(os.path.exists(ancien.fichier.path))
+
+    def test_telechargement_reserve_au_demandeur(self):
+        self.export()
+        job = executer_export(prochain_export())
+        en_attente = self.export()
+        url = reverse('telecharger_export', args=[job.pk])
+
+        self.client.force_login(self.technicien)
+        self.assertEqual(self.client.get(url).status_code, 404)
+        self.assertNotContains(self.client.get(reverse('mes_exports')), url)
+
+        self.client.force_login(self.admin)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(b''.join(response.streaming_content).startswith(b'%PDF'))
+        self.assertContains(self.client.get(reverse('mes_exports')), url)
+        self.assertEqual(self.client.get(reverse('telecharger_export', args=[en_attente.pk])).status_code, 404)
+
+
+class CacheRapportsInterventionTests(DonneesMaintenanceMixin, TestCase):
+    """Rapports d'intervention en cache : clé liée au contenu affiché, pas de régénération sur un succès"""
+
+    def setUp(self):
+        dossier = tempfile.TemporaryDirectory()
+        self.addCleanup(dossier.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=dossier.name))
+        self.intervention = Intervention.objects.first()
+        self.piece = PieceRechange.objects.create(intervention=self.intervention, nom='Disque', prix_unitaire=50)
+
+    def cle(self):
+        return cle_rapport_intervention(interventions_pour_rapport().get(pk=self.intervention.pk))
+
+    def test_cle_suit_le_contenu_affiche(self):
+        modifications = [
+            ('intervention', lambda: Intervention.objects.filter(pk=self.intervention.pk).update(details='Carte mère changée')),
+            ('pièce', lambda: PieceRechange.objects.filter(pk=self.piece.pk).update(prix_unitaire=Decimal('55.00'))),
+            ('nouvelle pièce', lambda: PieceRechange.objects.create(intervention=self.intervention, nom='Câble',
+                                                                     prix_unitaire=2)),
+            ('équipement', lambda: Equipement.objects.filter(pk=self.equipement.pk).update(marque='Dell')),
+            ('technicien', lambda: User.objects.filter(pk=self.technicien.pk).update(last_name='Haddad')),
+            ('employé', lambda: User.objects.filter(pk=self.employe.pk).update(first_name='Nadia')),
+        ]
+        cles = [self.cle()]
+        for nom, modifier in modifications:
+            with self.subTest(nom):
+                modifier()
+                cles.append(self.cle())
+                self.assertNotEqual(cles[-1], cles[-2])
+        self.assertEqual(self.cle(), cles[-1])  # Stable sans modification
+
+    def test_cle_ignore_les_champs_non_affiches(self):
+        cle = self.cle()
+        Equipement.objects.filter(pk=self.equipement.pk).update(description_technique='Nouvelle configuration')
+        User.objects.filter(pk=self.employe.pk).update(email='emp@example.com')
+        self.assertEqual(self.cle(), cle)
+
+    def test_succes_du_cache_sans_regeneration(self):
+        generer = mock.Mock(side_effect=lambda intervention, sortie: sortie.write(b'%PDF rapport'))
+        with mock.patch.dict('maintenance.rapports.RAPPORTS_INTERVENTION', {'INTERVENTION_PDF': (generer, 'pdf')}):
+            chemins = [rapport_intervention(interventions_pour_rapport().get(pk=self.intervention.pk), 'INTERVENTION_PDF')
+                       for _ in range(2)]
+            self.assertEqual(generer.call_count, 1)
+            self.assertEqual(chemins[0], chemins[1])
+
+            # Une pièce modifiée (signal) : le rapport est régénéré sous une nouvelle clé
+            self.piece.quantite = 3
+            self.piece.save()
+            nouveau = rapport_intervention(interventions_pour_rapport().get(pk=self.intervention.pk), 'INTERVENTION_PDF')
+        self.assertEqual(generer.call_count, 2)
+        self.assertNotEqual(nouveau, chemins[0])
+        self.assertFalse(default_storage.exists(chemins[0]))
+
+    def test_vue_servie_depuis_le_cache(self):
+        self.client.force_login(self.admin)
+        url = reverse('export_intervention_pdf', args=[self.intervention.pk])
+        generer = mock.Mock(wraps=generer_pdf_intervention)
+        with mock.patch.dict('maintenance.rapports.RAPPORTS_INTERVENTION', {'INTERVENTION_PDF': (generer, 'pdf')}):
+            contenus = [b''.join(self.client.get(url).streaming_content) for _ in range(2)]
+        self.assertEqual(generer.call_count, 1)
+        self.assertEqual(contenus[0], contenus[1])
+        self.assertTrue(contenus[0].startswith(b'%PDF'))
+
+
+class PoolLocal:
+    """ProcessPoolExecutor exécuté dans le processus du test (les processus spawn ne voient pas la base de test)"""
+    instances = []
+
+    def __init__(self, max_workers, **options):
+        self.max_workers = max_workers
+        self.soumis = []
+        PoolLocal.instances.append(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def submit(self, fonction, *args):
+        self.soumis.append(args)
+        future = Future()
+        future.set_result(fonction(*args))
+        return future
+
+
+class ArchiveZipRapportsTests(DonneesMaintenanceMixin, TestCase):
+    """Archive ZIP des rapports : contenu, requêtes fixes, génération limitée dans la requête"""
+
+    def setUp(self):
+        dossier = tempfile.TemporaryDirectory()
+        self.addCleanup(dossier.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=dossier.name))
+        self.enterContext(mock.patch('maintenance.rapports.ProcessPoolExecutor', PoolLocal))
+        PoolLocal.instances = []
+        self.client.force_login(self.admin)
+
+    def telecharger_zip(self, **filtres):
+        response = self.client.get(reverse('admin_export_interventions_zip'), filtres)
+        self.assertIsInstance(response, StreamingHttpResponse)
+        return zipfile.ZipFile(BytesIO(b''.join(response.streaming_content)))
+
+    def test_contenu(self):
+        archive = self.telecharger_zip()
+        interventions = interventions_pour_rapport().order_by('date_intervention')
+        self.assertEqual(archive.namelist(), [f"intervention_{i.pk}.pdf" for i in interventions])
+        for intervention in interventions:
+            with default_storage.open(chemin_rapport_intervention(intervention, 'INTERVENTION_PDF'), 'rb') as rapport:
+                self.assertEqual(archive.read(f"intervention_{intervention.pk}.pdf"), rapport.read())
+        self.assertIsNone(archive.testzip())
+
+        filtrees = self.telecharger_zip(type_reparation='EXTERNE')
+        self.assertEqual(len(filtrees.namelist()), Intervention.objects.filter(type_reparation='EXTERNE').count())
+
+    def requetes_zip(self):
+        with CaptureQueriesContext(connection) as contexte:
+            self.telecharger_zip()
+        return len(contexte.captured_queries)
+
+    def test_requetes_fixes(self):
+        avant = self.requetes_zip()
+        for demande in DemandeMaintenance.objects.filter(intervention__isnull=True)[:3]:
+            intervention = Intervention.objects.create(demande=demande, details='Réglage')
+            PieceRechange.objects.create(intervention=intervention, nom='Vis', prix_unitaire=1)
+        self.assertEqual(Intervention.objects.count(), 7)
+        self.assertEqual(self.requetes_zip(), avant)
+
+    def test_au_dela_du_seuil_en_arriere_plan(self):
+        with mock.patch('maintenance.views.EXPORT_ZIP_INLINE_MAX_RAPPORTS', 1):
+            response = self.client.get(reverse('admin_export_interventions_zip'), {'type_reparation': 'INTERNE'})
+            self.assertRedirects(response, reverse('mes_exports'))
+            job = ExportJob.objects.get()
+            self.assertEqual((job.type_export, job.parametres), ('INTERVENTIONS_ZIP', {'type_reparation': 'INTERNE'}))
+            self.assertFalse(default_storage.exists('rapports'))  # Rien généré pendant la requête
+
+            job = executer_export(prochain_export())
+            self.assertEqual(job.statut, 'TERMINE')
+            with job.fichier.open('rb') as fichier:
+                self.assertEqual(len(zipfile.ZipFile(fichier).namelist()), 2)
+
+            # Rapports désormais en cache : l'archive est envoyée directement
+            self.assertEqual(len(self.telecharger_zip(type_reparation='INTERNE').namelist()), 2)
+        self.assertEqual(ExportJob.objects.count(), 1)
+
+    def test_rapports_manquants_repartis_sur_le_pool(self):
+        interventions = list(interventions_pour_rapport().order_by('date_intervention'))
+        rapport_intervention(interventions[0], 'INTERVENTION_PDF')  # Déjà en cache
+        with mock.patch('maintenance.rapports.EXPORT_ZIP_PROCESSUS', 2):
+            ExportJob.objects.create(type_export='INTERVENTIONS_ZIP', demande_par=self.admin)
+            job = executer_export(prochain_export())
+        self.assertEqual(job.statut, 'TERMINE')
+
+        pool, = PoolLocal.instances
+        self.assertEqual(pool.max_workers, 2)
+        self.assertCountEqual(pool.soumis, [(i.pk,) for i in interventions[1:]])  # Seulement les manquants
+        with job.fichier.open('rb') as fichier:
+            archive = zipfile.ZipFile(fichier)
+            self.assertCountEqual(archive.namelist(), [f"intervention_{i.pk}.pdf" for i in interventions])
+            for intervention in interventions:
+                with default_storage.open(chemin_rapport_intervention(intervention, 'INTERVENTION_PDF'), 'rb') as rapport:
+                    self.assertEqual(archive.read(f"intervention_{intervention.pk}.pdf"), rapport.read())
+
+    def test_cache_ecrit_sans_copie(self):
+        intervention = interventions_pour_rapport().first()
+        # Deux générations simultanées du même rapport (aucune ne le trouve en cache)
+        with mock.patch('maintenance.rapports.default_storage.exists', return_value=False):
+            chemins = {rapport_intervention(intervention, 'INTERVENTION_PDF') for _ in range(2)}
+        self.assertEqual(chemins, {chemin_rapport_intervention(intervention, 'INTERVENTION_PDF')})
+        _, fichiers = default_storage.listdir(f"rapports/interventions/{intervention.pk}")
+        self.assertEqual(fichiers, [os.path.basename(chemins.pop())])
+
+    def test_echec_de_generation_sans_fichier(self):
+        intervention = interventions_pour_rapport().first()
+        with mock.patch.dict('maintenance.rapports.RAPPORTS_INTERVENTION',
+                             {'INTERVENTION_PDF': (mock.Mock(side_effect=ValueError), 'pdf')}), \
+                self.assertRaises(ValueError):
+            rapport_intervention(intervention, 'INTERVENTION_PDF')
+        self.assertEqual(default_storage.listdir(f"rapports/interventions/{intervention.pk}"), ([], []))
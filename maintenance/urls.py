@@ -16,6 +16,7 @@ urlpatterns = [
     path('employe/demande/<int:pk>/modifier/', views.employe_modifier_demande, name='employe_modifier_demande'),
     path('employe/demande/<int:pk>/supprimer/', views.employe_supprimer_demande, name='employe_supprimer_demande'),
     path('employe/demande/<int:pk>/valider/', views.employe_valider_demande, name='employe_valider_demande'),
+    path('equipements/autocompletion/', views.autocompletion_equipements, name='autocompletion_equipements'),
     
     # ============= ESPACE TECHNICIEN =============
     path('technicien/', views.technicien_dashboard, name='technicien_dashboard'),
@@ -37,6 +38,9 @@ urlpatterns = [
     path('admin-dashboard/equipement/<str:code>/modifier/', views.admin_modifier_equipement, name='admin_modifier_equipement'),
     path('admin-dashboard/equipement/<str:code>/supprimer/', views.admin_supprimer_equipement, name='admin_supprimer_equipement'),
     path('admin-dashboard/equipements/import/', views.admin_import_equipements_csv, name='admin_import_equipements_csv'),
+    path('admin-dashboard/equipements/import/<int:pk>/progression/', views.admin_import_progression, name='admin_import_progression'),
+    path('admin-dashboard/equipements/import/<int:pk>/erreurs/', views.admin_import_erreurs_csv, name='admin_import_erreurs_csv'),
+    path('admin-dashboard/equipements/import/<int:pk>/lancer/', views.admin_import_lancer, name='admin_import_lancer'),
     
     # Exports
     path('admin-dashboard/export/demandes/csv/', views.export_demandes_csv, name='export_demandes_csv'),
@@ -45,6 +49,7 @@ urlpatterns = [
 
     # Consultation des interventions (Admin)
     path('admin-dashboard/interventions/', views.admin_liste_interventions, name='admin_liste_interventions'),
+    path('admin-dashboard/interventions/export/zip/', views.admin_export_interventions_zip, name='admin_export_interventions_zip'),
     path('admin-dashboard/intervention/<int:pk>/', views.admin_detail_intervention, name='admin_detail_intervention'),
     path('admin-dashboard/fichier/<int:pk>/supprimer/', views.admin_supprimer_fichier, name='admin_supprimer_fichier'),
 
@@ -53,7 +58,12 @@ urlpatterns = [
     path('intervention/<int:pk>/export/word/', views.export_intervention_word, name='export_intervention_word'),
 
     # Consultation des logs (Admin)
+    path('admin-dashboard/recherche/', views.admin_recherche, name='admin_recherche'),
     path('admin-dashboard/logs/', views.admin_liste_logs, name='admin_liste_logs'),
     path('admin-dashboard/logs/export/csv/', views.admin_export_logs_csv, name='admin_export_logs_csv'),
     path('admin-dashboard/logs/export/pdf/', views.admin_export_logs_pdf, name='admin_export_logs_pdf'),
+
+    # Exports en arrière-plan
+    path('exports/', views.mes_exports, name='mes_exports'),
+    path('exports/<int:pk>/telecharger/', views.telecharger_export, name='telecharger_export'),
 ]
\ No newline at end of file
@@ -2,34 +2,34 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib.auth import login
 from django.contrib import messages
-from django.http import HttpResponse, JsonResponse
+from django.http import JsonResponse, StreamingHttpResponse, FileResponse
+from django.db import transaction
 from django.db.models import Q, Count
-from django.core.mail import send_mail
-from django.conf import settings
+from django.db.models.functions import Left
+from django.core.files.storage import default_storage
 from django.utils import timezone
 from datetime import datetime
 from django.contrib.auth.views import LoginView
-from docx import Document
-from docx.shared import Inches, Pt, RGBColor
-from docx.enum.text import WD_ALIGN_PARAGRAPH
 import csv
+import os
+import tempfile
 from django.core.paginator import Paginator
-from reportlab.lib.pagesizes import A4
-from reportlab.lib import colors
-from reportlab.lib.units import cm
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, Image
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from io import BytesIO
-from reportlab.lib import colors
-from reportlab.lib.pagesizes import A4, landscape
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-from reportlab.lib.styles import getSampleStyleSheet
-
-from .models import (User, Direction, Bureau, CategorieEquipement, Equipement,
-                     DemandeMaintenance, Intervention, PieceRechange, FichierIntervention, LogAction)
+
+from .models import (User, Equipement,
+                     DemandeMaintenance, Intervention, PieceRechange, FichierIntervention, LogAction,
+                     ImportJob, ImportJobErreur, ExportJob)
 from .forms import (UserRegistrationForm, EquipementForm, DemandeMaintenanceForm,
                     AssignationTechnicienForm, InterventionForm, PieceRechangeFormSet,
                     FiltreDemandeForm, FiltreEquipementForm, FichierInterventionFormSet, FiltreLogForm, FiltreInterventionForm)
+from .rapports import (filtrer_logs, filtrer_logs_archives, filtrer_demandes, filtrer_interventions,
+                       interventions_pour_rapport, GENERATEURS, EXPORT_INLINE_MAX_LIGNES, RAPPORTS_INTERVENTION, rapport_intervention,
+                       zip_rapports_interventions, nb_rapports_a_generer, EXPORT_ZIP_INLINE_MAX_RAPPORTS)
+from .statistiques import (compteurs_demandes, compteurs_interventions, statistiques_portee, pannes_par_marque,
+                           resume_activite, activite_par_jour, activite_par_heure)
+from .pagination import paginer_par_curseur, estimer_total
+from .recherche import rechercher_objets, suggerer_codes
+from .journal import journaliser, vider_journal, lignes_archive, logs_archives
+from .notifications import notifier
 
 
 # ============= HELPERS =============
@@ -43,14 +43,82 @@ def log_action(user, action, type_objet='', objet_id=None, details='', request=N
         else:
             ip_address = request.META.get('REMOTE_ADDR')
     
-    LogAction.objects.create(
-        utilisateur=user,
+    # Écrit en base par lots, hors de la requête (voir journal.py)
+    journaliser(
+        utilisateur_id=user.pk,
         action=action,
         type_objet=type_objet,
         objet_id=objet_id,
         details=details,
         adresse_ip=ip_address
     )
+
+class Echo:
+    """Pseudo-fichier pour csv.writer : write() renvoie la ligne au lieu de la stocker"""
+    def write(self, value):
+        return value
+
+
+def reponse_csv_streaming(nom_fichier, entete, lignes, lignes_par_bloc=500):
+    """Réponse CSV envoyée au fil de l'eau (mémoire constante, premier octet immédiat)"""
+    writer = csv.writer(Echo())
+
+    def generer():
+        bloc = [writer.writerow(entete)]
+        for ligne in lignes:
+            bloc.append(writer.writerow(ligne))
+            if len(bloc) >= lignes_par_bloc:
+                yield ''.join(bloc)
+                bloc = []
+        if bloc:
+            yield ''.join(bloc)
+
+    response = StreamingHttpResponse(generer(), content_type='text/csv')
+    response['Content-Disposition'] = f'attachment; filename="{nom_fichier}"'
+    return response
+
+
+def nom_complet(prenom, nom):
+    """Équivalent de User.get_full_name() sur des valeurs issues de values_list()"""
+    return f"{prenom or ''} {nom or ''}".strip()
+
+
+def mettre_export_en_file(request, type_export, parametres, motif):
+    """Crée l'ExportJob que traiter_exports générera et renvoie vers la page des exports"""
+    job = ExportJob.objects.create(
+        type_export=type_export,
+        parametres=parametres,
+        demande_par=request.user,
+    )
+    messages.info(request, f'{motif} : il est généré en arrière-plan (export #{job.pk}).')
+    return redirect('mes_exports')
+
+
+def reponse_export(request, type_export, parametres, nb_lignes):
+    """Renvoie un export directement s'il est petit, sinon le met en file pour traiter_exports"""
+    if nb_lignes > EXPORT_INLINE_MAX_LIGNES:
+        return mettre_export_en_file(request, type_export, parametres, f'Le rapport contient {nb_lignes} lignes')
+
+    # Fichier temporaire en mémoire, basculé sur disque au-delà de 10 Mo
+    sortie = tempfile.SpooledTemporaryFile(max_size=10 * 1024 * 1024)
+    nom_fichier = GENERATEURS[type_export](parametres, sortie)
+    sortie.seek(0)
+    return FileResponse(sortie, as_attachment=True, filename=nom_fichier)
+
+
+def reponse_rapport_intervention(request, intervention, type_export):
+    """Sert le rapport d'une intervention depuis le cache (généré au besoin s'il est petit)"""
+    if len(intervention.pieces.all()) > EXPORT_INLINE_MAX_LIGNES:
+        return reponse_export(request, type_export, {'intervention': intervention.pk}, len(intervention.pieces.all()))
+
+    chemin = rapport_intervention(intervention, type_export)
+    return FileResponse(
+        default_storage.open(chemin, 'rb'),
+        as_attachment=True,
+        filename=f"intervention_{intervention.pk}.{RAPPORTS_INTERVENTION[type_export][1]}",
+    )
+
+
 def is_admin(user):
     return user.is_authenticated and user.role == 'ADMIN'
 
@@ -61,35 +129,6 @@ def is_employe(user):
     return user.is_authenticated and user.role == 'EMPLOYE'
 
 
-def envoyer_email_notification(demande):
-    """Envoie un email de notification à l'employé"""
-    if not demande.email_envoye and demande.employe.email:
-        try:
-            subject = f"Demande #{demande.pk} - Réparation terminée"
-            message = f"""
-Bonjour {demande.employe.get_full_name()},
-
-Votre demande de maintenance #{demande.pk} pour l'équipement {demande.equipement.code_equipement} 
-a été traitée et est maintenant terminée.
-
-Merci de vous connecter pour valider ou signaler un problème.
-
-Cordialement,
-Service Maintenance EP Mostaganem
-            """
-            send_mail(
-                subject,
-                message,
-                settings.DEFAULT_FROM_EMAIL,
-                [demande.employe.email],
-                fail_silently=False,
-            )
-            demande.email_envoye = True
-            demande.save()
-        except Exception as e:
-            print(f"Erreur envoi email: {e}")
-
-
 # ============= VUES COMMUNES =============
 
 def home(request):
@@ -131,12 +170,13 @@ def employe_dashboard(request):
         'equipement', 'technicien'
     ).order_by('-date_creation')
     
+    compteurs = compteurs_demandes(demandes)
     context = {
         'demandes': demandes,
-        'total': demandes.count(),
-        'en_attente': demandes.filter(statut='EN_ATTENTE').count(),
-        'en_cours': demandes.filter(statut__in=['ASSIGNEE', 'EN_COURS']).count(),
-        'terminees': demandes.filter(statut='TERMINEE').count(),
+        'total': compteurs['total'],
+        'en_attente': compteurs['statut']['EN_ATTENTE'],
+        'en_cours': compteurs['statut']['ASSIGNEE'] + compteurs['statut']['EN_COURS'],
+        'terminees': compteurs['statut']['TERMINEE'],
     }
     return render(request, 'maintenance/employe/dashboard.html', context)
 
@@ -148,17 +188,19 @@ def employe_creer_demande(request):
     if request.method == 'POST':
         form = DemandeMaintenanceForm(request.POST, user=request.user)  # ← AJOUT user=request.user
         if form.is_valid():
-            demande = form.save(commit=False)
-            demande.employe = request.user
-            demande.save()
-            log_action(
-                user=request.user,
-                action='DEMANDE_CREATION',
-                type_objet='DemandeMaintenance',
-                objet_id=demande.pk,
-                details=f"Création demande pour équipement {demande.equipement.code_equipement}",
-                request=request
-            )
+            # Demande, compteurs, index de recherche et log validés ensemble
+            with transaction.atomic():
+                demande = form.save(commit=False)
+                demande.employe = request.user
+                demande.save()
+                log_action(
+                    user=request.user,
+                    action='DEMANDE_CREATION',
+                    type_objet='DemandeMaintenance',
+                    objet_id=demande.pk,
+                    details=f"Création demande pour équipement {demande.equipement.code_equipement}",
+                    request=request
+                )
             messages.success(request, 'Demande de maintenance créée avec succès.')
             return redirect('employe_dashboard')
     else:
@@ -180,15 +222,16 @@ def employe_modifier_demande(request, pk):
     if request.method == 'POST':
         form = DemandeMaintenanceForm(request.POST, instance=demande, user=request.user)  # ← AJOUT user=request.user
         if form.is_valid():
-            form.save()
-            log_action(
-                user=request.user,
-                action='DEMANDE_MODIFICATION',
-                type_objet='DemandeMaintenance',
-                objet_id=demande.pk,
-                details=f"Modification demande #{demande.pk}",
-                request=request
-            )
+            with transaction.atomic():
+                form.save()
+                log_action(
+                    user=request.user,
+                    action='DEMANDE_MODIFICATION',
+                    type_objet='DemandeMaintenance',
+                    objet_id=demande.pk,
+                    details=f"Modification demande #{demande.pk}",
+                    request=request
+                )
             messages.success(request, 'Demande modifiée avec succès.')
             return redirect('employe_dashboard')
     else:
@@ -241,34 +284,45 @@ def employe_valider_demande(request, pk):
     
     if request.method == 'POST':
         action = request.POST.get('action')
-        if action == 'valider':
-            demande.statut = 'VALIDEE'
-            log_action(
-                user=request.user,
-                action='DEMANDE_VALIDATION',
-                type_objet='DemandeMaintenance',
-                objet_id=demande.pk,
-                details=f"Validation réparation demande #{demande.pk}",
-                request=request
-            )
-            messages.success(request, 'Demande validée. Merci pour votre retour.')
-        elif action == 'refuser':
-            demande.statut = 'REFUSEE'
-            log_action(
-                user=request.user,
-                action='DEMANDE_REFUS',
-                type_objet='DemandeMaintenance',
-                objet_id=demande.pk,
-                details=f"Refus réparation demande #{demande.pk}",
-                request=request
-            )
-            messages.warning(request, 'Problème signalé. Un technicien sera informé.')
-        demande.save()
+        with transaction.atomic():
+            if action == 'valider':
+                demande.statut = 'VALIDEE'
+                log_action(
+                    user=request.user,
+                    action='DEMANDE_VALIDATION',
+                    type_objet='DemandeMaintenance',
+                    objet_id=demande.pk,
+                    details=f"Validation réparation demande #{demande.pk}",
+                    request=request
+                )
+                messages.success(request, 'Demande validée. Merci pour votre retour.')
+            elif action == 'refuser':
+                demande.statut = 'REFUSEE'
+                log_action(
+                    user=request.user,
+                    action='DEMANDE_REFUS',
+                    type_objet='DemandeMaintenance',
+                    objet_id=demande.pk,
+                    details=f"Refus réparation demande #{demande.pk}",
+                    request=request
+                )
+                notifier(demande, 'REFUSEE')
+                messages.warning(request, 'Problème signalé. Un technicien sera informé.')
+            demande.save()
         return redirect('employe_dashboard')
     
     return render(request, 'maintenance/employe/valider_demande.html', {'demande': demande})
 
 
+# ============= AUTOCOMPLÉTION DES CODES D'ÉQUIPEMENT =============
+
+@login_required
+def autocompletion_equipements(request):
+    """Suggestions de codes pour le champ code-barres (JSON), limitées à la direction de l'employé"""
+    direction = request.user.direction_id if request.user.role == 'EMPLOYE' else None
+    return JsonResponse({'resultats': suggerer_codes(request.GET.get('q', ''), direction)})
+
+
 # ============= ESPACE TECHNICIEN =============
 
 @login_required
@@ -279,12 +333,13 @@ def technicien_dashboard(request):
         technicien=request.user
     ).select_related('equipement', 'employe').order_by('-date_creation')
     
+    compteurs = compteurs_demandes(demandes)
     context = {
         'demandes': demandes,
-        'total': demandes.count(),
-        'assignees': demandes.filter(statut='ASSIGNEE').count(),
-        'en_cours': demandes.filter(statut='EN_COURS').count(),
-        'terminees': demandes.filter(statut='TERMINEE').count(),
+        'total': compteurs['total'],
+        'assignees': compteurs['statut']['ASSIGNEE'],
+        'en_cours': compteurs['statut']['EN_COURS'],
+        'terminees': compteurs['statut']['TERMINEE'],
     }
     return render(request, 'maintenance/technicien/dashboard.html', context)
 
@@ -318,20 +373,21 @@ def technicien_changer_statut(request, pk):
         nouveau_statut = request.POST.get('statut')
         
         if nouveau_statut in ['ASSIGNEE', 'EN_COURS', 'TERMINEE']:
-            demande.statut = nouveau_statut
-            demande.save()
-            log_action(
-                user=request.user,
-                action='STATUT_CHANGE',
-                type_objet='DemandeMaintenance',
-                objet_id=demande.pk,
-                details=f"Changement statut demande #{demande.pk} → {demande.get_statut_display()}",
-                request=request
-            )
-            
-            # Envoyer email si terminée
-            if nouveau_statut == 'TERMINEE':
-                envoyer_email_notification(demande)
+            with transaction.atomic():
+                demande.statut = nouveau_statut
+                demande.save()
+                log_action(
+                    user=request.user,
+                    action='STATUT_CHANGE',
+                    type_objet='DemandeMaintenance',
+                    objet_id=demande.pk,
+                    details=f"Changement statut demande #{demande.pk} → {demande.get_statut_display()}",
+                    request=request
+                )
+
+                # Employé prévenu par email si terminée (voir notifications.py)
+                if nouveau_statut == 'TERMINEE':
+                    notifier(demande, 'TERMINEE')
             
             messages.success(request, f'Statut changé à : {demande.get_statut_display()}')
         
@@ -371,15 +427,17 @@ def technicien_creer_intervention(request, pk):
             and piece_formset.is_valid()
             and fichier_formset.is_valid()
         ):
-            intervention = form.save(commit=False)
-            intervention.demande = demande
-            intervention.save()
+            # Intervention, pièces, fichiers et totaux dénormalisés enregistrés ensemble
+            with transaction.atomic():
+                intervention = form.save(commit=False)
+                intervention.demande = demande
+                intervention.save()
 
-            piece_formset.instance = intervention
-            piece_formset.save()
+                piece_formset.instance = intervention
+                piece_formset.save()
 
-            fichier_formset.instance = intervention
-            fichier_formset.save()
+                fichier_formset.instance = intervention
+                fichier_formset.save()
 
             log_action(
                 user=request.user,
@@ -419,8 +477,9 @@ def technicien_modifier_intervention(request, pk):
         formset = PieceRechangeFormSet(request.POST, instance=intervention)
         
         if form.is_valid() and formset.is_valid():
-            form.save()
-            formset.save()
+            with transaction.atomic():
+                form.save()
+                formset.save()
 
             log_action(
                 user=request.user,
@@ -451,13 +510,16 @@ def technicien_modifier_intervention(request, pk):
 @user_passes_test(is_admin)
 def admin_dashboard(request):
     """Tableau de bord administrateur avec statistiques"""
-    # Statistiques générales
-    total_demandes = DemandeMaintenance.objects.count()
-    total_equipements = Equipement.objects.count()
+    # Statistiques générales (compteurs matérialisés, voir statistiques.py)
+    statistiques = statistiques_portee('GLOBAL')
+    total_demandes = statistiques['demandes']
+    total_equipements = statistiques['equipements']
     total_techniciens = User.objects.filter(role='TECHNICIEN', is_active=True).count()
     
     # Demandes par statut
-    demandes_par_statut = DemandeMaintenance.objects.values('statut').annotate(count=Count('id'))
+    demandes_par_statut = [
+        {'statut': statut, 'count': nb} for statut, nb in statistiques['statut'].items() if nb
+    ]
     
     # Demandes récentes
     demandes_recentes = DemandeMaintenance.objects.select_related(
@@ -465,9 +527,7 @@ def admin_dashboard(request):
     ).order_by('-date_creation')[:10]
     
     # Pannes par marque (top 5)
-    pannes_par_marque = Equipement.objects.values('marque').annotate(
-        nb_pannes=Count('demandes')
-    ).order_by('-nb_pannes')[:5]
+    top_marques = pannes_par_marque(5)
     
     context = {
         'total_demandes': total_demandes,
@@ -475,7 +535,7 @@ def admin_dashboard(request):
         'total_techniciens': total_techniciens,
         'demandes_par_statut': demandes_par_statut,
         'demandes_recentes': demandes_recentes,
-        'pannes_par_marque': pannes_par_marque,
+        'pannes_par_marque': top_marques,
     }
     return render(request, 'maintenance/admin/dashboard.html', context)
 
@@ -490,35 +550,20 @@ def admin_liste_demandes(request):
     
     # Appliquer les filtres
     form = FiltreDemandeForm(request.GET)
-    if form.is_valid():
-        if form.cleaned_data.get('statut'):
-            demandes = demandes.filter(statut=form.cleaned_data['statut'])
-        if form.cleaned_data.get('urgence'):
-            demandes = demandes.filter(urgence=form.cleaned_data['urgence'])
-        if form.cleaned_data.get('technicien'):
-            demandes = demandes.filter(technicien=form.cleaned_data['technicien'])
-        if form.cleaned_data.get('date_debut'):
-            demandes = demandes.filter(date_creation__gte=form.cleaned_data['date_debut'])
-        if form.cleaned_data.get('date_fin'):
-            demandes = demandes.filter(date_creation__lte=form.cleaned_data['date_fin'])
-        if form.cleaned_data.get('code_equipement'):
-            demandes = demandes.filter(equipement__code_equipement__icontains=form.cleaned_data['code_equipement'])
-        if form.cleaned_data.get('categorie'):
-            demandes = demandes.filter(equipement__categorie=form.cleaned_data['categorie'])
+    demandes = filtrer_demandes(demandes, form)
 
     
-    total_affiche = demandes.count()
+    compteurs = compteurs_demandes(demandes)
+    total_affiche = compteurs['total']
 
-    en_attente = demandes.filter(statut='EN_ATTENTE').count()
-    en_cours = demandes.filter(statut='EN_COURS').count()
-    terminees = demandes.filter(statut='TERMINEE').count()
-    validees = demandes.filter(statut='VALIDEE').count()
-    refusees = demandes.filter(statut='REFUSEE').count()
+    en_attente = compteurs['statut']['EN_ATTENTE']
+    en_cours = compteurs['statut']['EN_COURS']
+    terminees = compteurs['statut']['TERMINEE']
+    validees = compteurs['statut']['VALIDEE']
+    refusees = compteurs['statut']['REFUSEE']
 
-    # Pagination
-    paginator = Paginator(demandes, 10)  # 10 demandes par page
-    page_number = request.GET.get('page')
-    demandes_page = paginator.get_page(page_number)
+    # Pagination par curseur sur (date_creation, id)
+    demandes_page = paginer_par_curseur(request, demandes, 'date_creation', 10)
 
     context = {
         'demandes': demandes_page,
@@ -544,17 +589,19 @@ def admin_assigner_technicien(request, pk):
     if request.method == 'POST':
         form = AssignationTechnicienForm(request.POST, instance=demande)
         if form.is_valid():
-            demande = form.save(commit=False)
-            demande.statut = 'ASSIGNEE'
-            demande.save()
-            log_action(
-                user=request.user,
-                action='ASSIGNATION',
-                type_objet='DemandeMaintenance',
-                objet_id=demande.pk,
-                details=f"Assignation {demande.technicien.get_full_name()} à demande #{demande.pk}",
-                request=request
-            )
+            with transaction.atomic():
+                demande = form.save(commit=False)
+                demande.statut = 'ASSIGNEE'
+                demande.save()
+                log_action(
+                    user=request.user,
+                    action='ASSIGNATION',
+                    type_objet='DemandeMaintenance',
+                    objet_id=demande.pk,
+                    details=f"Assignation {demande.technicien.get_full_name()} à demande #{demande.pk}",
+                    request=request
+                )
+                notifier(demande, 'ASSIGNEE')
             messages.success(request, f'Demande assignée à {demande.technicien.get_full_name()}')
             return redirect('admin_liste_demandes')
     else:
@@ -681,70 +728,95 @@ def admin_import_equipements_csv(request):
             messages.error(request, 'Le fichier doit être au format CSV.')
             return redirect('admin_import_equipements_csv')
         
-        try:
-            import csv
-            from io import StringIO
-            
-            # Lire le fichier CSV
-            decoded_file = csv_file.read().decode('utf-8')
-            io_string = StringIO(decoded_file)
-            reader = csv.DictReader(io_string)
-            
-            count_created = 0
-            count_updated = 0
-            errors = []
-            
-            for row in reader:
-                try:
-                    # Récupérer ou créer le bureau
-                    bureau = None
-                    if row.get('bureau') and row.get('direction'):
-                        direction, _ = Direction.objects.get_or_create(nom=row['direction'])
-                        bureau, _ = Bureau.objects.get_or_create(nom=row['bureau'], direction=direction)
-                    
-                    # Récupérer ou créer la catégorie
-                    categorie = None
-                    if row.get('categorie'):
-                        categorie, _ = CategorieEquipement.objects.get_or_create(nom=row['categorie'])
-                    
-                    # Créer ou mettre à jour l'équipement
-                    equipement, created = Equipement.objects.update_or_create(
-                        code_equipement=row['code_equipement'],
-                        defaults={
-                            'nom': row['nom'],
-                            'marque': row['marque'],
-                            'date_acquisition': row['date_acquisition'],
-                            'description_technique': row.get('description_technique', ''),
-                            'bureau': bureau,
-                            'categorie': categorie,
-                        }
-                    )
-                    
-                    if created:
-                        count_created += 1
-                    else:
-                        count_updated += 1
-                        
-                except Exception as e:
-                    errors.append(f"Ligne {reader.line_num}: {str(e)}")
-            
-            if errors:
-                for error in errors[:5]:  # Montrer max 5 erreurs
-                    messages.warning(request, error)
-            
-            log_action(
-                user=request.user,
-                action='IMPORT_CSV',
-                details=f"Import CSV: {count_created} créés, {count_updated} mis à jour",
-                request=request
-            )
-            messages.success(request, f'{count_created} équipements créés, {count_updated} mis à jour.')
-            return redirect('admin_liste_equipements')
-            
-        except Exception as e:
-            messages.error(request, f'Erreur lors de l\'import: {str(e)}')
-    
-    return render(request, 'maintenance/admin/import_equipements.html')
+        # Le fichier est seulement stocké : l'import est exécuté par la commande traiter_imports
+        simulation = bool(request.POST.get('simulation'))
+        job = ImportJob.objects.create(
+            fichier=csv_file,
+            nom_fichier=csv_file.name,
+            simulation=simulation,
+            cree_par=request.user,
+        )
+        log_action(
+            user=request.user,
+            action='IMPORT_CSV',
+            type_objet='ImportJob',
+            objet_id=job.pk,
+            details=f"{'Simulation' if simulation else 'Import'} CSV mis en file d'attente: {csv_file.name}",
+            request=request
+        )
+        messages.info(request, f'Import #{job.pk} mis en file d\'attente. La progression s\'affiche ci-dessous.')
+        return redirect('admin_import_equipements_csv')
+
+    imports = ImportJob.objects.select_related('cree_par')[:10]
+    return render(request, 'maintenance/admin/import_equipements.html', {'imports': imports})
+
+
+@login_required
+@user_passes_test(is_admin)
+def admin_import_progression(request, pk):
+    """Progression d'un import (interrogée périodiquement par la page d'import)"""
+    job = get_object_or_404(
+        ImportJob.objects.only(
+            'statut', 'lignes_total', 'lignes_traitees', 'nb_crees', 'nb_mis_a_jour',
+            'nb_inchanges', 'nb_erreurs', 'nb_avertissements', 'message'
+        ),
+        pk=pk
+    )
+    return JsonResponse({
+        'statut': job.statut,
+        'statut_display': job.get_statut_display(),
+        'termine': job.est_termine(),
+        'progression': job.progression(),
+        'lignes_total': job.lignes_total,
+        'lignes_traitees': job.lignes_traitees,
+        'nb_crees': job.nb_crees,
+        'nb_mis_a_jour': job.nb_mis_a_jour,
+        'nb_inchanges': job.nb_inchanges,
+        'nb_erreurs': job.nb_erreurs,
+        'nb_avertissements': job.nb_avertissements,
+        'message': job.message,
+    })
+
+
+@login_required
+@user_passes_test(is_admin)
+def admin_import_lancer(request, pk):
+    """Lancer l'import réel d'un fichier déjà vérifié en simulation"""
+    simulation = get_object_or_404(ImportJob, pk=pk, simulation=True, statut='TERMINE')
+
+    if request.method == 'POST':
+        job = ImportJob.objects.create(
+            fichier=simulation.fichier.name,
+            nom_fichier=simulation.nom_fichier,
+            cree_par=request.user,
+        )
+        log_action(
+            user=request.user,
+            action='IMPORT_CSV',
+            type_objet='ImportJob',
+            objet_id=job.pk,
+            details=f"Import CSV mis en file d'attente après simulation #{simulation.pk}: {job.nom_fichier}",
+            request=request
+        )
+        messages.info(request, f'Import #{job.pk} mis en file d\'attente.')
+
+    return redirect('admin_import_equipements_csv')
+
+
+@login_required
+@user_passes_test(is_admin)
+def admin_import_erreurs_csv(request, pk):
+    """Rapport des lignes rejetées ou signalées d'un import (ou d'une simulation)"""
+    job = get_object_or_404(ImportJob, pk=pk)
+    niveaux = dict(ImportJobErreur.NIVEAU_CHOICES)
+
+    lignes = (
+        [ligne, niveaux[niveau], message]
+        for ligne, niveau, message in job.erreurs.values_list('ligne', 'niveau', 'message').iterator(chunk_size=2000)
+    )
+    return reponse_csv_streaming(f"import_{job.pk}_erreurs.csv", ['Ligne', 'Niveau', 'Message'], lignes)
+
+
 # ============= EXPORTS =============
 
 @login_required
@@ -755,38 +827,31 @@ def export_demandes_csv(request):
     
     # Appliquer les mêmes filtres que la liste
     form = FiltreDemandeForm(request.GET)
-    if form.is_valid():
-        if form.cleaned_data.get('statut'):
-            demandes = demandes.filter(statut=form.cleaned_data['statut'])
-        if form.cleaned_data.get('urgence'):
-            demandes = demandes.filter(urgence=form.cleaned_data['urgence'])
-        if form.cleaned_data.get('technicien'):
-            demandes = demandes.filter(technicien=form.cleaned_data['technicien'])
-        if form.cleaned_data.get('date_demande'):
-            demandes = demandes.filter(date_creation__date=form.cleaned_data['date_demande'])
-        if form.cleaned_data.get('code_equipement'):
-            demandes = demandes.filter(equipement__code_equipement__icontains=form.cleaned_data['code_equipement'])
-        if form.cleaned_data.get('categorie'):
-            demandes = demandes.filter(equipement__categorie=form.cleaned_data['categorie'])
-    
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = f'attachment; filename="demandes_{datetime.now().strftime("%Y%m%d")}.csv"'
-    
-    writer = csv.writer(response)
-    writer.writerow(['ID', 'Date', 'Équipement', 'Employé', 'Technicien', 'Urgence', 'Statut', 'Description'])
-    
-    
-    for d in demandes:
-        writer.writerow([
-            d.pk,
-            d.date_creation.strftime('%Y-%m-%d %H:%M'),
-            d.equipement.code_equipement,
-            d.employe.get_full_name(),
-            d.technicien.get_full_name() if d.technicien else 'Non assigné',
-            d.get_urgence_display(),
-            d.get_statut_display(),
-            d.description[:100],
-        ])
+    demandes = filtrer_demandes(demandes, form)
+    
+    # Lignes lues par blocs sous forme de tuples (pas d'instances en cache)
+    urgences = dict(DemandeMaintenance.URGENCE_CHOICES)
+    statuts = dict(DemandeMaintenance.STATUT_CHOICES)
+    valeurs = demandes.annotate(description_courte=Left('description', 100)).values_list(
+        'pk', 'date_creation', 'equipement_id',
+        'employe__first_name', 'employe__last_name',
+        'technicien_id', 'technicien__first_name', 'technicien__last_name',
+        'urgence', 'statut', 'description_courte',
+    )
+    lignes = (
+        [
+            pk,
+            date_creation.strftime('%Y-%m-%d %H:%M'),
+            code_equipement,
+            nom_complet(employe_prenom, employe_nom),
+            nom_complet(technicien_prenom, technicien_nom) if technicien_id else 'Non assigné',
+            urgences.get(urgence, urgence),
+            statuts.get(statut, statut),
+            description,
+        ]
+        for (pk, date_creation, code_equipement, employe_prenom, employe_nom, technicien_id,
+             technicien_prenom, technicien_nom, urgence, statut, description) in valeurs.iterator(chunk_size=2000)
+    )
     
     log_action(
         user=request.user,
@@ -795,71 +860,19 @@ def export_demandes_csv(request):
         request=request
     )
     
-    return response
+    return reponse_csv_streaming(
+        f"demandes_{datetime.now().strftime('%Y%m%d')}.csv",
+        ['ID', 'Date', 'Équipement', 'Employé', 'Technicien', 'Urgence', 'Statut', 'Description'],
+        lignes,
+    )
 
 
 @login_required
 @user_passes_test(is_admin)
 def export_demandes_pdf(request):
-    """Export des demandes en PDF"""
-    demandes = DemandeMaintenance.objects.select_related('equipement', 'employe', 'technicien').order_by('-date_creation')
-    
-    # Appliquer les mêmes filtres que la liste
+    """Export des demandes en PDF (en arrière-plan au-delà de EXPORT_INLINE_MAX_LIGNES lignes)"""
     form = FiltreDemandeForm(request.GET)
-    if form.is_valid():
-        if form.cleaned_data.get('statut'):
-            demandes = demandes.filter(statut=form.cleaned_data['statut'])
-        if form.cleaned_data.get('urgence'):
-            demandes = demandes.filter(urgence=form.cleaned_data['urgence'])
-        if form.cleaned_data.get('technicien'):
-            demandes = demandes.filter(technicien=form.cleaned_data['technicien'])
-        if form.cleaned_data.get('date_demande'):
-            demandes = demandes.filter(date_creation__date=form.cleaned_data['date_demande'])
-        if form.cleaned_data.get('code_equipement'):
-            demandes = demandes.filter(equipement__code_equipement__icontains=form.cleaned_data['code_equipement'])
-        if form.cleaned_data.get('categorie'):
-            demandes = demandes.filter(equipement__categorie=form.cleaned_data['categorie'])
-    
-    buffer = BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=landscape(A4))
-    elements = []
-    
-    styles = getSampleStyleSheet()
-    title = Paragraph("Rapport des Demandes de Maintenance", styles['Title'])
-    elements.append(title)
-    elements.append(Spacer(1, 20))
-    
-    # Données
-    data = [['ID', 'Date', 'Équipement', 'Employé', 'Technicien', 'Urgence', 'Statut']]
-   
-    
-    for d in demandes:
-        data.append([
-            str(d.pk),
-            d.date_creation.strftime('%Y-%m-%d'),
-            d.equipement.code_equipement,
-            d.employe.get_full_name(),
-            d.technicien.get_full_name() if d.technicien else 'N/A',
-            d.get_urgence_display(),
-            d.get_statut_display(),
-        ])
-    
-    table = Table(data)
-    table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 10),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-        ('GRID', (0, 0), (-1, -1), 1, colors.black),
-    ]))
-    
-    elements.append(table)
-    doc.build(elements)
-    
-    buffer.seek(0)
+    demandes = filtrer_demandes(DemandeMaintenance.objects.all(), form)
 
     log_action(
         user=request.user,
@@ -867,7 +880,7 @@ def export_demandes_pdf(request):
         details="Export PDF liste demandes",
         request=request
     )
-    return HttpResponse(buffer, content_type='application/pdf')
+    return reponse_export(request, 'DEMANDES_PDF', request.GET.dict(), demandes.count())
 
 
 @login_required
@@ -886,21 +899,13 @@ def export_equipements_csv(request):
         if form.cleaned_data.get('bureau'):
             equipements = equipements.filter(bureau=form.cleaned_data['bureau'])
     
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = f'attachment; filename="equipements_{datetime.now().strftime("%Y%m%d")}.csv"'
-    
-    writer = csv.writer(response)
-    writer.writerow(['Code', 'Nom', 'Marque', 'Catégorie', 'Bureau', 'Direction', 'Date Acquisition'])
-    for e in equipements:
-        writer.writerow([
-            e.code_equipement,
-            e.nom,
-            e.marque,
-            e.categorie.nom if e.categorie else '',
-            e.bureau.nom if e.bureau else '',
-            e.bureau.direction.nom if e.bureau else '',
-            e.date_acquisition.strftime('%Y-%m-%d'),
-        ])
+    valeurs = equipements.values_list(
+        'code_equipement', 'nom', 'marque', 'categorie__nom', 'bureau__nom', 'bureau__direction__nom', 'date_acquisition'
+    )
+    lignes = (
+        [code, nom, marque, categorie or '', bureau or '', direction or '', date_acquisition.strftime('%Y-%m-%d')]
+        for code, nom, marque, categorie, bureau, direction, date_acquisition in valeurs.iterator(chunk_size=2000)
+    )
     
     log_action(
         user=request.user,
@@ -909,7 +914,11 @@ def export_equipements_csv(request):
         request=request
     )
     
-    return response
+    return reponse_csv_streaming(
+        f"equipements_{datetime.now().strftime('%Y%m%d')}.csv",
+        ['Code', 'Nom', 'Marque', 'Catégorie', 'Bureau', 'Direction', 'Date Acquisition'],
+        lignes,
+    )
 
 
 # ============= CONSULTATION INTERVENTIONS (ADMIN) =============
@@ -919,38 +928,20 @@ def export_equipements_csv(request):
 def admin_liste_interventions(request):
     """Liste de toutes les interventions avec leurs fichiers"""
     interventions = Intervention.objects.select_related(
-        'demande__equipement', 'demande__employe', 'demande__technicien'
-    ).prefetch_related('fichiers', 'pieces').order_by('-date_intervention')
+        'demande__equipement', 'demande__technicien'
+    ).order_by('-date_intervention')
     
     # Appliquer les filtres
     form = FiltreInterventionForm(request.GET)
-    if form.is_valid():
-        if form.cleaned_data.get('technicien'):
-            interventions = interventions.filter(demande__technicien=form.cleaned_data['technicien'])
-        if form.cleaned_data.get('code_equipement'):
-            interventions = interventions.filter(demande__equipement__code_equipement__icontains=form.cleaned_data['code_equipement'])
-        if form.cleaned_data.get('type_reparation'):
-            interventions = interventions.filter(type_reparation=form.cleaned_data['type_reparation'])
-        if form.cleaned_data.get('date_debut'):
-            interventions = interventions.filter(date_intervention__gte=form.cleaned_data['date_debut'])
-        if form.cleaned_data.get('date_fin'):
-            from datetime import datetime, time
-            date_fin = datetime.combine(form.cleaned_data['date_fin'], time.max)
-            interventions = interventions.filter(date_intervention__lte=date_fin)
+    interventions = filtrer_interventions(interventions, form)
+    if form.is_valid() and form.cleaned_data.get('tri'):
+        interventions = interventions.order_by(form.cleaned_data['tri'], '-pk')
     
-    total_interventions = interventions.count()
-
-    reparations_internes = interventions.filter(
-        type_reparation='INTERNE'
-    ).count()
-
-    reparations_externes = interventions.filter(
-        type_reparation='EXTERNE'
-    ).count()
-
-    documents_joints = interventions.filter(
-        fichiers__isnull=False
-    ).distinct().count()
+    compteurs = compteurs_interventions(interventions)
+    total_interventions = compteurs['total']
+    reparations_internes = compteurs['type_reparation']['INTERNE']
+    reparations_externes = compteurs['type_reparation']['EXTERNE']
+    documents_joints = compteurs['avec_fichiers']
 
     # Pagination
     paginator = Paginator(interventions, 10)  
@@ -967,6 +958,34 @@ def admin_liste_interventions(request):
     }
     return render(request, 'maintenance/admin/liste_interventions.html', context)
 
+@login_required
+@user_passes_test(is_admin)
+def admin_export_interventions_zip(request):
+    """Archive ZIP des rapports PDF de toutes les interventions filtrées, envoyée au fil de l'eau"""
+    form = FiltreInterventionForm(request.GET)
+    # Interventions, relations et pièces chargées en deux requêtes, quel que soit leur nombre
+    interventions = list(
+        filtrer_interventions(interventions_pour_rapport(), form).order_by('date_intervention')
+    )
+
+    log_action(
+        user=request.user,
+        action='EXPORT_PDF',
+        details=f"Export ZIP de {len(interventions)} rapports d'intervention",
+        request=request
+    )
+
+    # Trop de rapports à générer pour la requête : l'archive est construite par le worker
+    a_generer = nb_rapports_a_generer(interventions)
+    if a_generer > EXPORT_ZIP_INLINE_MAX_RAPPORTS:
+        return mettre_export_en_file(request, 'INTERVENTIONS_ZIP', request.GET.dict(),
+                                     f"L'archive contient {a_generer} rapports à générer")
+
+    response = StreamingHttpResponse(zip_rapports_interventions(interventions), content_type='application/zip')
+    response['Content-Disposition'] = f'attachment; filename="interventions_{datetime.now().strftime("%Y%m%d_%H%M")}.zip"'
+    return response
+
+
 @login_required
 @user_passes_test(is_admin)
 def admin_detail_intervention(request, pk):
@@ -1004,7 +1023,7 @@ def admin_supprimer_fichier(request, pk):
     intervention_pk = fichier.intervention.pk
     
     if request.method == 'POST':
-        fichier.fichier.delete()  # Supprimer le fichier physique
+        fichier.supprimer_fichiers()  # Supprimer le fichier physique et ses miniatures
         fichier.delete()  # Supprimer l'entrée en base
 
         log_action(
@@ -1026,7 +1045,7 @@ def admin_supprimer_fichier(request, pk):
 def export_intervention_pdf(request, pk):
     """Export d'une intervention en PDF"""
     # Vérifier les permissions
-    intervention = get_object_or_404(Intervention, pk=pk)
+    intervention = get_object_or_404(interventions_pour_rapport(), pk=pk)
     user = request.user
     
     # Admin ou technicien de l'intervention
@@ -1042,139 +1061,13 @@ def export_intervention_pdf(request, pk):
         details=f"Export PDF intervention #{intervention.pk}",
         request=request
     )
-    
-    
-    
-    buffer = BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=A4, rightMargin=2*cm, leftMargin=2*cm, topMargin=2*cm, bottomMargin=2*cm)
-    elements = []
-    styles = getSampleStyleSheet()
-    
-    # Titre
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=18,
-        textColor=colors.HexColor('#0d6efd'),
-        spaceAfter=20,
-        spaceBefore=20,
-        alignment=1  # Center
-    )
-    header_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading3'],
-        spaceAfter=20,
-        alignment=1  # Center
-    )
-    
-    elements.append(Paragraph("REPUBLIQUE ALGERIENNE DEMOCRATIQUE POPULAIRE", header_style))
-    elements.append(Paragraph("MINISTERE DES TRANSPORTS", styles['Heading4']))
-    elements.append(Paragraph("GROUPE SERVICES PORTUAIRES « SERPORT SPA»", styles['Heading4']))
-    elements.append(Paragraph("ENTREPRISE PORTUAIRE DE MOSTAGANEM", styles['Heading4']))
-    elements.append(Paragraph("RAPPORT TECHNIQUE", title_style))
-    elements.append(Paragraph(f"Intervention #{intervention.pk}", styles['Heading2']))
-    elements.append(Spacer(1, 10))
-    
-    # Informations générales
-    data = [
-        ['Date d\'intervention:', intervention.date_intervention.strftime('%d/%m/%Y à %H:%M')],
-        ['Type de réparation:', intervention.get_type_reparation_display()],
-        ['Demande associée:', f"#{intervention.demande.pk}"],
-        ['Demandeur:', intervention.demande.employe.get_full_name()],
-        ['Technicien:', intervention.demande.technicien.get_full_name()],
-    ]
-    
-    table = Table(data, colWidths=[5*cm, 12*cm])
-    table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (0, -1), colors.lightgrey),
-        ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
-        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-        ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, -1), 10),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 12),
-        ('GRID', (0, 0), (-1, -1), 1, colors.black),
-    ]))
-    elements.append(table)
-    elements.append(Spacer(1, 10))
-    
-    # Équipement
-    elements.append(Paragraph("ÉQUIPEMENT CONCERNÉ", styles['Heading3']))
-    data_eq = [
-        ['Code:', intervention.demande.equipement.code_equipement],
-        ['Nom:', intervention.demande.equipement.nom],
-        ['Marque:', intervention.demande.equipement.marque],
-        ['Catégorie:', intervention.demande.equipement.categorie.nom if intervention.demande.equipement.categorie else '-'],
-        ['Bureau:', intervention.demande.equipement.bureau.nom if intervention.demande.equipement.bureau else '-'],
-    ]
-    table_eq = Table(data_eq, colWidths=[5*cm, 12*cm])
-    table_eq.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (0, -1), colors.lightblue),
-        ('GRID', (0, 0), (-1, -1), 1, colors.black),
-        ('FONTSIZE', (0, 0), (-1, -1), 10),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 12),
-    ]))
-    elements.append(table_eq)
-    elements.append(Spacer(1, 10))
-    
-    # Détails intervention
-    elements.append(Paragraph("DÉTAILS DE L'INTERVENTION", styles['Heading3']))
-    details_style = ParagraphStyle('Details', parent=styles['BodyText'], fontSize=10, leading=14)
-    elements.append(Paragraph(intervention.details.replace('\n', '<br/>'), details_style))
-    elements.append(Spacer(1, 10))
-    
-    # Pièces
-    if intervention.pieces.exists():
-        elements.append(Paragraph("PIÈCES DE RECHANGE UTILISÉES", styles['Heading3']))
-        pieces_data = [['Nom', 'Prix Unitaire', 'Quantité', 'Total']]
-        for piece in intervention.pieces.all():
-            pieces_data.append([
-                piece.nom,
-                f"{piece.prix_unitaire} DA",
-                str(piece.quantite),
-                f"{piece.cout_total()} DA"
-            ])
-        pieces_data.append(['', '', 'TOTAL:', f"{intervention.cout_total_pieces()} DA"])
-        
-        table_pieces = Table(pieces_data, colWidths=[8*cm, 3*cm, 3*cm, 3*cm])
-        table_pieces.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black),
-            ('BACKGROUND', (0, -1), (-1, -1), colors.lightgreen),
-            ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
-        ]))
-        elements.append(table_pieces)
-        elements.append(Spacer(1, 10))
-
-
-    data = [["VISA DE L'INFORMATICIEN", "VISA DE RESPONSABLE DE LA CELLULE"]]
-    # On définit la largeur des colonnes (ex: 250 points chacune)
-    t = Table(data, colWidths=[250, 250])
-
-    t.setStyle(TableStyle([
-        ('ALIGN', (0, 0), (0, 0), 'LEFT'),
-        ('ALIGN', (1, 0), (1, 0), 'RIGHT'),
-        ('FONTNAME', (0, 0), (-1, -1), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, -1), 10),
-    ]))
-
-    elements.append(t)
-    
-    
-    doc.build(elements)
-    
-    buffer.seek(0)
-    response = HttpResponse(buffer, content_type='application/pdf')
-    response['Content-Disposition'] = f'attachment; filename="intervention_{intervention.pk}.pdf"'
-    return response
+    return reponse_rapport_intervention(request, intervention, 'INTERVENTION_PDF')
 
 
 @login_required
 def export_intervention_word(request, pk):
     """Export d'une intervention en Word"""
-    intervention = get_object_or_404(Intervention, pk=pk)
+    intervention = get_object_or_404(interventions_pour_rapport(), pk=pk)
     user = request.user
     
     # Vérifier permissions
@@ -1190,108 +1083,31 @@ def export_intervention_word(request, pk):
         details=f"Export Word intervention #{intervention.pk}",
         request=request
     )
-    
-    # Créer document Word
-    document = Document()
+    return reponse_rapport_intervention(request, intervention, 'INTERVENTION_WORD')
 
-    # --- EN-TÊTE ---
-    # République (Centré)
-    header_rep = document.add_paragraph("REPUBLIQUE ALGERIENNE DEMOCRATIQUE POPULAIRE")
-    header_rep.alignment = WD_ALIGN_PARAGRAPH.CENTER
-    header_rep.runs[0].bold = True
 
-    # Ministères et Entreprise (Aligné à gauche)
-    header_min = document.add_paragraph("MINISTERE DES TRANSPORTS\n"
-                                        "GROUPE SERVICES PORTUAIRES « SERPORT SPA»\n"
-                                        "ENTREPRISE PORTUAIRE DE MOSTAGANEM")
-    header_min.alignment = WD_ALIGN_PARAGRAPH.LEFT
+# ============= RECHERCHE GLOBALE (ADMIN) =============
 
-    
-    # Titre
-    title = document.add_heading(f'RAPPORT TECHNIQUE D\'INTERVENTION #{intervention.pk}', level=1)
-    title.alignment = WD_ALIGN_PARAGRAPH.CENTER
-    
-    # Informations
-    document.add_heading('Informations Générales', level=1)
-    table = document.add_table(rows=5, cols=2)
-    table.style = 'Light Grid Accent 1'
-    
-    table.rows[0].cells[0].text = 'Date d\'intervention:'
-    table.rows[0].cells[1].text = intervention.date_intervention.strftime('%d/%m/%Y à %H:%M')
-    table.rows[1].cells[0].text = 'Type de réparation:'
-    table.rows[1].cells[1].text = intervention.get_type_reparation_display()
-    table.rows[2].cells[0].text = 'Demande:'
-    table.rows[2].cells[1].text = f"#{intervention.demande.pk}"
-    table.rows[3].cells[0].text = 'Demandeur:'
-    table.rows[3].cells[1].text = intervention.demande.employe.get_full_name()
-    table.rows[4].cells[0].text = 'Technicien:'
-    table.rows[4].cells[1].text = intervention.demande.technicien.get_full_name()
-    
-    # Équipement
-    document.add_heading('Équipement Concerné', level=1)
-    eq_table = document.add_table(rows=5, cols=2)
-    eq_table.style = 'Light Grid Accent 1'
-    eq_table.rows[0].cells[0].text = 'Code:'
-    eq_table.rows[0].cells[1].text = intervention.demande.equipement.code_equipement
-    eq_table.rows[1].cells[0].text = 'Nom:'
-    eq_table.rows[1].cells[1].text = intervention.demande.equipement.nom
-    eq_table.rows[2].cells[0].text = 'Marque:'
-    eq_table.rows[2].cells[1].text = intervention.demande.equipement.marque
-    eq_table.rows[3].cells[0].text = 'Catégorie:'
-    eq_table.rows[3].cells[1].text = intervention.demande.equipement.categorie.nom if intervention.demande.equipement.categorie else '-'
-    eq_table.rows[4].cells[0].text = 'Bureau:'
-    eq_table.rows[4].cells[1].text = intervention.demande.equipement.bureau.nom if intervention.demande.equipement.bureau else '-'
-    
-    # Détails
-    document.add_heading('Détails de l\'Intervention', level=1)
-    document.add_paragraph(intervention.details)
-    
-    # Pièces
-    if intervention.pieces.exists():
-        document.add_heading('Pièces de Rechange', level=1)
-        pieces_table = document.add_table(rows=intervention.pieces.count()+2, cols=4)
-        pieces_table.style = 'Light Grid Accent 1'
-        
-        pieces_table.rows[0].cells[0].text = 'Nom'
-        pieces_table.rows[0].cells[1].text = 'Prix Unitaire'
-        pieces_table.rows[0].cells[2].text = 'Quantité'
-        pieces_table.rows[0].cells[3].text = 'Total'
-        
-        for i, piece in enumerate(intervention.pieces.all(), 1):
-            pieces_table.rows[i].cells[0].text = piece.nom
-            pieces_table.rows[i].cells[1].text = f"{piece.prix_unitaire} DA"
-            pieces_table.rows[i].cells[2].text = str(piece.quantite)
-            pieces_table.rows[i].cells[3].text = f"{piece.cout_total()} DA"
-        
-        last_row = pieces_table.rows[-1]
-        last_row.cells[2].text = 'TOTAL:'
-        last_row.cells[3].text = f"{intervention.cout_total_pieces()} DA"
-    
-    # --- VISAS (En bas du document) ---
-    document.add_paragraph("\n") # Espacement avant les signatures
-    visa_table = document.add_table(rows=1, cols=2)
-    visa_table.autofit = True
-    visa_table.style = None
-    # Visa Informaticien (Gauche)
-    v_info = visa_table.rows[0].cells[0].paragraphs[0]
-    v_info.text = "VISA DE L'INFORMATICIEN"
-    v_info.alignment = WD_ALIGN_PARAGRAPH.LEFT
-    v_info.runs[0].bold = True
-
-    # Visa Responsable (Droite)
-    v_resp = visa_table.rows[0].cells[1].paragraphs[0]
-    v_resp.text = "VISA DE RESPONSABLE DE LA CELLULE"
-    v_resp.alignment = WD_ALIGN_PARAGRAPH.RIGHT
-    v_resp.runs[0].bold = True
-
-    # Sauvegarder
-    buffer = BytesIO()
-    document.save(buffer)
-    buffer.seek(0)
-    
-    response = HttpResponse(buffer, content_type='application/vnd.openxmlformats-officedocument.wordprocessingml.document')
-    response['Content-Disposition'] = f'attachment; filename="intervention_{intervention.pk}.docx"'
-    return response
+@login_required
+@user_passes_test(is_admin)
+def admin_recherche(request):
+    """Recherche plein texte dans les demandes, interventions et équipements"""
+    requete = request.GET.get('q', '').strip()
+    resultats = {}
+    if requete:
+        resultats = {
+            'demandes': rechercher_objets(requete, DemandeMaintenance, queryset=DemandeMaintenance.objects.select_related(
+                'equipement', 'employe', 'technicien', 'intervention')),
+            'interventions': rechercher_objets(requete, Intervention, queryset=Intervention.objects.select_related(
+                'demande__equipement', 'demande__technicien')),
+            'equipements': rechercher_objets(requete, Equipement, queryset=Equipement.objects.select_related(
+                'bureau__direction', 'categorie')),
+        }
+    return render(request, 'maintenance/admin/recherche.html', {
+        'requete': requete,
+        'resultats': resultats,
+        'nb_resultats': sum(len(objets) for objets in resultats.values()),
+    })
 
 
 # ============= CONSULTATION LOGS (ADMIN) =============
@@ -1300,41 +1116,49 @@ def export_intervention_word(request, pk):
 @user_passes_test(is_admin)
 def admin_liste_logs(request):
     """Liste de tous les logs avec filtres"""
+    vider_journal()  # Inclure les actions encore en file d'écriture
     logs = LogAction.objects.select_related('utilisateur').order_by('-date_action')
     
     # Appliquer les filtres
     form = FiltreLogForm(request.GET)
-    if form.is_valid():
-        if form.cleaned_data.get('utilisateur'):
-            logs = logs.filter(utilisateur=form.cleaned_data['utilisateur'])
-        if form.cleaned_data.get('action'):
-            logs = logs.filter(action=form.cleaned_data['action'])
-        if form.cleaned_data.get('date_debut'):
-            logs = logs.filter(date_action__gte=form.cleaned_data['date_debut'])
-        if form.cleaned_data.get('date_fin'):
-            from datetime import datetime, time
-            date_fin = datetime.combine(form.cleaned_data['date_fin'], time.max)
-            logs = logs.filter(date_action__lte=date_fin)
-        if form.cleaned_data.get('recherche'):
-            logs = logs.filter(details__icontains=form.cleaned_data['recherche'])
-    
-    # Pagination
-    
-    paginator = Paginator(logs, 20) 
-    page_number = request.GET.get('page')
-    logs_page = paginator.get_page(page_number)
-    
-    # Statistiques
-    stats = {
-        'total': logs.count(),
-        'aujourd_hui': logs.filter(date_action__date=timezone.now().date()).count(),
-        'cette_semaine': logs.filter(date_action__gte=timezone.now() - timezone.timedelta(days=7)).count(),
-    }
+    archive = form.cleaned_data.get('archive') if form.is_valid() else None
+    if archive:
+        # Mois archivé : seul son fichier est décompressé, filtré en mémoire
+        lignes = filtrer_logs_archives(lignes_archive(archive), form)
+        logs_page = Paginator(lignes, 20).get_page(request.GET.get('page'))
+        logs_page.object_list = logs_archives(logs_page.object_list)
+        context = {
+            'logs': logs_page,
+            'form': form,
+            'archive': archive,
+            'stats': {'total': len(lignes), 'total_plafonne': False, 'aujourd_hui': 0, 'cette_semaine': 0},
+        }
+        return render(request, 'maintenance/admin/liste_logs.html', context)
+    logs = filtrer_logs(logs, form)
+    
+    # Pagination par curseur sur (date_action, id)
+    logs_page = paginer_par_curseur(request, logs, 'date_action', 20)
+    
+    # Statistiques et graphiques lus dans l'activité pré-agrégée (archives comprises)
+    filtres = form.cleaned_data if form.is_valid() else {}
+    utilisateur, action = filtres.get('utilisateur'), filtres.get('action')
+    if filtres.get('recherche'):
+        # Recherche plein texte : pas d'agrégat, total compté jusqu'à un plafond
+        total, total_plafonne = estimer_total(logs)
+        recents = logs.filter(date_action__gte=timezone.now() - timezone.timedelta(days=7)).order_by().aggregate(
+            cette_semaine=Count('pk'),
+            aujourd_hui=Count('pk', filter=Q(date_action__date=timezone.localdate())),
+        )
+        stats = dict(recents, total=total, total_plafonne=total_plafonne)
+    else:
+        stats = resume_activite(utilisateur, action, filtres.get('date_debut'), filtres.get('date_fin'))
     
     context = {
         'logs': logs_page,
         'form': form,
         'stats': stats,
+        'activite_jours': activite_par_jour(30, utilisateur, action),
+        'activite_heures': activite_par_heure(utilisateur, action),
     }
     return render(request, 'maintenance/admin/liste_logs.html', context)
 
@@ -1343,100 +1167,74 @@ def admin_liste_logs(request):
 @user_passes_test(is_admin)
 def admin_export_logs_csv(request):
     """Export des logs en CSV"""
+    vider_journal()
     logs = LogAction.objects.select_related('utilisateur').order_by('-date_action')
     
     # Appliquer les mêmes filtres que la liste
     form = FiltreLogForm(request.GET)
-    if form.is_valid():
-        if form.cleaned_data.get('utilisateur'):
-            logs = logs.filter(utilisateur=form.cleaned_data['utilisateur'])
-        if form.cleaned_data.get('action'):
-            logs = logs.filter(action=form.cleaned_data['action'])
-        if form.cleaned_data.get('date_debut'):
-            logs = logs.filter(date_action__gte=form.cleaned_data['date_debut'])
-        if form.cleaned_data.get('date_fin'):
-            from datetime import datetime, time
-            date_fin = datetime.combine(form.cleaned_data['date_fin'], time.max)
-            logs = logs.filter(date_action__lte=date_fin)
-    
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = f'attachment; filename="logs_{datetime.now().strftime("%Y%m%d_%H%M")}.csv"'
-    
-    writer = csv.writer(response)
-    writer.writerow(['Date', 'Heure', 'Utilisateur', 'Rôle', 'Action', 'Type Objet', 'ID Objet', 'Détails', 'IP'])
-    
-    for log in logs:
-        writer.writerow([
-            log.date_action.strftime('%Y-%m-%d'),
-            log.date_action.strftime('%H:%M:%S'),
-            log.utilisateur.get_full_name() if log.utilisateur else 'Système',
-            log.utilisateur.get_role_display() if log.utilisateur else '-',
-            log.get_action_display(),
-            log.type_objet or '-',
-            log.objet_id or '-',
-            log.details[:200],
-            log.adresse_ip or '-',
-        ])
+    archive = form.cleaned_data.get('archive') if form.is_valid() else None
+    
+    roles = dict(User.ROLE_CHOICES)
+    actions = dict(LogAction.TYPE_ACTION_CHOICES)
+    if archive:
+        valeurs = [
+            (log.date_action, log.utilisateur_id, log.utilisateur and log.utilisateur.first_name,
+             log.utilisateur and log.utilisateur.last_name, log.utilisateur and log.utilisateur.role,
+             log.action, log.type_objet, log.objet_id, log.details[:200], log.adresse_ip)
+            for log in logs_archives(filtrer_logs_archives(lignes_archive(archive), form))
+        ]
+    else:
+        valeurs = filtrer_logs(logs, form).annotate(details_courts=Left('details', 200)).values_list(
+            'date_action', 'utilisateur_id', 'utilisateur__first_name', 'utilisateur__last_name', 'utilisateur__role',
+            'action', 'type_objet', 'objet_id', 'details_courts', 'adresse_ip',
+        ).iterator(chunk_size=2000)
+    lignes = (
+        [
+            date_action.strftime('%Y-%m-%d'),
+            date_action.strftime('%H:%M:%S'),
+            nom_complet(prenom, nom) if utilisateur_id else 'Système',
+            roles.get(role, role) if utilisateur_id else '-',
+            actions.get(action, action),
+            type_objet or '-',
+            objet_id or '-',
+            details,
+            adresse_ip or '-',
+        ]
+        for (date_action, utilisateur_id, prenom, nom, role, action, type_objet, objet_id,
+             details, adresse_ip) in valeurs
+    )
     
-    return response
+    return reponse_csv_streaming(
+        f"logs_{datetime.now().strftime('%Y%m%d_%H%M')}.csv",
+        ['Date', 'Heure', 'Utilisateur', 'Rôle', 'Action', 'Type Objet', 'ID Objet', 'Détails', 'IP'],
+        lignes,
+    )
 
 
 @login_required
 @user_passes_test(is_admin)
 def admin_export_logs_pdf(request):
-    """Export des logs en PDF"""
-    logs = LogAction.objects.select_related('utilisateur').order_by('-date_action')  # Limite 100 pour PDF
-    
-    # Appliquer les filtres
+    """Export des logs en PDF (en arrière-plan au-delà de EXPORT_INLINE_MAX_LIGNES lignes)"""
+    vider_journal()
     form = FiltreLogForm(request.GET)
-    if form.is_valid():
-        if form.cleaned_data.get('utilisateur'):
-            logs = logs.filter(utilisateur=form.cleaned_data['utilisateur'])[:100]
-        if form.cleaned_data.get('action'):
-            logs = logs.filter(action=form.cleaned_data['action'])[:100]
-    
-    buffer = BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=landscape(A4))
-    elements = []
-    
-    styles = getSampleStyleSheet()
-    title = Paragraph("RAPPORT DES LOGS D'ACTIONS", styles['Title'])
-    elements.append(title)
-    elements.append(Spacer(1, 20))
-    
-    # Info
-    info = Paragraph(f"Généré le {timezone.now().strftime('%d/%m/%Y à %H:%M')}", styles['Normal'])
-    elements.append(info)
-    elements.append(Spacer(1, 20))
-    
-    # Données
-    data = [['Date', 'Utilisateur', 'Action', 'Détails']]
-    
-    for log in logs:
-        data.append([
-            log.date_action.strftime('%d/%m/%Y %H:%M'),
-            log.utilisateur.get_full_name() if log.utilisateur else 'Système',
-            log.get_action_display(),
-            (log.details[:60] + '...') if len(log.details) > 60 else log.details,
-        ])
-    
-    table = Table(data, colWidths=[4*cm, 5*cm, 6*cm, 10*cm])
-    table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 9),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-        ('GRID', (0, 0), (-1, -1), 1, colors.black),
-        ('FONTSIZE', (0, 1), (-1, -1), 8),
-    ]))
-    
-    elements.append(table)
-    doc.build(elements)
-    
-    buffer.seek(0)
-    response = HttpResponse(buffer, content_type='application/pdf')
-    response['Content-Disposition'] = f'attachment; filename="logs_{datetime.now().strftime("%Y%m%d_%H%M")}.pdf"'
-    return response
\ No newline at end of file
+    logs = filtrer_logs(LogAction.objects.all(), form)
+    return reponse_export(request, 'LOGS_PDF', request.GET.dict(), logs.count())
+
+
+# ============= EXPORTS EN ARRIÈRE-PLAN =============
+
+@login_required
+def mes_exports(request):
+    """Exports en attente et terminés de l'utilisateur"""
+    exports = list(ExportJob.objects.filter(demande_par=request.user)[:20])
+    return render(request, 'maintenance/mes_exports.html', {
+        'exports': exports,
+        'en_preparation': any(not export.est_termine() for export in exports),
+    })
+
+
+@login_required
+def telecharger_export(request, pk):
+    """Téléchargement du fichier d'un export terminé"""
+    job = get_object_or_404(ExportJob, pk=pk, demande_par=request.user, statut='TERMINE')
+    return FileResponse(job.fichier.open('rb'), as_attachment=True, filename=os.path.basename(job.fichier.name))